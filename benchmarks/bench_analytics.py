@@ -0,0 +1,43 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from bot import database
+from bot.analytics import compute_season_stats, format_season_report, load_season
+from benchmarks.synthetic import make_members, populate_season
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure season analytics on a synthetic full-season dataset.")
+    parser.add_argument('--members', type=int, default=50, help="clan size (default: 50)")
+    parser.add_argument('--days', type=int, default=30, help="season length in days (default: 30)")
+    parser.add_argument('--repeat', type=int, default=10, help="repetitions per stage (default: 10)")
+    args = parser.parse_args()
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    start_date = date(2024, 8, 1)
+    end_date = start_date + timedelta(days=args.days - 1)
+    populate_season(make_members(args.members), start_date, args.days)
+    conn = database.connect_db()
+
+    events, load_ms = measure(lambda: load_season(conn, start_date, end_date), args.repeat)
+    stats, compute_ms = measure(lambda: compute_season_stats(events), args.repeat)
+    _, report_ms = measure(lambda: list(format_season_report(events, stats)), args.repeat)
+    conn.close()
+
+    print(f"{len(events.change)} events, {events.player_count} players, {events.day_count} days")
+    print(f"load    {load_ms:8.2f} ms")
+    print(f"compute {compute_ms:8.2f} ms")
+    print(f"report  {report_ms:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
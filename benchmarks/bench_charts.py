@@ -0,0 +1,38 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from bot import charts, database
+from benchmarks.synthetic import make_members, populate_season
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure chart render time for a full-season player chart and a daily clan chart.")
+    parser.add_argument('--members', type=int, default=50, help="clan size (default: 50)")
+    parser.add_argument('--days', type=int, default=30, help="season length in days (default: 30)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    database.DB_PATH = os.path.join(workdir, 'bench.db')
+    charts.CHART_CACHE_DIR = os.path.join(workdir, 'charts')
+    members = make_members(args.members)
+    start_date = date(2024, 8, 1)
+    end_date = start_date + timedelta(days=args.days - 1)
+    populate_season(members, start_date, args.days)
+
+    player = members[0]
+    _, cold = timed(charts.render_player_chart, player['tag'], player['name'], start_date, end_date, player['trophies'])
+    _, warm = timed(charts.render_player_chart, player['tag'], player['name'], start_date, end_date, player['trophies'])
+    _, clan_cold = timed(charts.render_clan_chart, members[:15], end_date)
+    _, clan_warm = timed(charts.render_clan_chart, members[:15], end_date)
+
+    print(f"player season chart ({args.days} days): render {cold:.1f} ms, cached {warm:.2f} ms")
+    print(f"clan day chart (15 members): render {clan_cold:.1f} ms, cached {clan_warm:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from bot import database, tracker
+from bot.subscriptions import CLAN, SubscriptionIndex
+from bot.tenants import Tenant
+from benchmarks.synthetic import make_members, mutate_roster
+
+class CountingBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent += 1
+
+# Run polling cycles against an in-process roster and report the cost per cycle
+async def run_cycles(member_count, change_rate, cycles, seed=0):
+    rng = random.Random(seed)
+    roster = make_members(member_count, seed)
+    counters = {member['tag']: (0, 0) for member in roster}
+    bot = CountingBot()
+    tenant = Tenant('#BENCH', chats=[1])
+    subscriptions = SubscriptionIndex()
+    subscriptions.add(1, CLAN, tenant.clan_tag)
+    application = SimpleNamespace(bot=bot, bot_data={'subscriptions': subscriptions})
+
+    lookups = []
+
+    # Player lookups are the cycle's API cost, so the benchmark counts them per cycle
+    def fetch_players(tags):
+        lookups.append(len(tags))
+        return {tag: {'attackWins': counters[tag][0], 'defenseWins': counters[tag][1]} for tag in tags}
+
+    samples = []
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: roster), patch.object(tracker, 'fetch_players', fetch_players):
+        await tracker.check_trophy_differences(application, tenant)  # baseline snapshot
+        lookups.clear()
+        for _ in range(cycles):
+            roster = mutate_roster(roster, change_rate, rng)
+            started = time.perf_counter()
+            await tracker.check_trophy_differences(application, tenant)
+            samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'members': member_count,
+        'mean_ms': statistics.mean(samples),
+        'p95_ms': sorted(samples)[int(0.95 * (len(samples) - 1))],
+        'messages': bot.sent,
+        'lookups': sum(lookups) / cycles,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-cycle cost of tracking the whole clan.")
+    parser.add_argument('--sizes', default='50,1000', help="comma-separated roster sizes (default: 50,1000)")
+    parser.add_argument('--change-rate', type=float, default=0.1, help="share of members changing per cycle (default: 0.1)")
+    parser.add_argument('--cycles', type=int, default=30, help="cycles per roster size (default: 30)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    print(f"{'members':>8} {'mean ms':>9} {'p95 ms':>9} {'messages':>9} {'lookups':>8}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        database.DB_PATH = os.path.join(workdir, f"bench_{size}.db")
+        result = asyncio.run(run_cycles(size, args.change_rate, args.cycles))
+        print(f"{result['members']:>8} {result['mean_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['messages']:>9} {result['lookups']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from bot import database
+from bot.history import day_summaries, format_clan_history, format_player_history, paginate_lines
+from benchmarks.synthetic import make_members, populate_season
+
+# Latency budget for answering a full 30-day, 50-member /history request
+TARGET_MS = 50.0
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /history query latency over a synthetic season.")
+    parser.add_argument('--members', type=int, default=50, help="clan size (default: 50)")
+    parser.add_argument('--days', type=int, default=30, help="history length in days (default: 30)")
+    parser.add_argument('--repeat', type=int, default=20, help="repetitions per query (default: 20)")
+    args = parser.parse_args()
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    members = make_members(args.members)
+    start_date = date(2024, 8, 1)
+    end_date = start_date + timedelta(days=args.days - 1)
+    populate_season(members, start_date, args.days)
+    conn = database.connect_db()
+
+    def player_history():
+        return list(paginate_lines('', format_player_history(day_summaries(conn, start_date, end_date, members[0]['tag']))))
+
+    def clan_history():
+        return list(paginate_lines('', format_clan_history(day_summaries(conn, start_date, end_date))))
+
+    for label, func in (('player', player_history), ('clan', clan_history)):
+        median, worst = measure(func, args.repeat)
+        verdict = 'ok' if median <= TARGET_MS else 'OVER TARGET'
+        print(f"{label:<7} {args.days} days x {args.members} members: median {median:.2f} ms, max {worst:.2f} ms "
+              f"(target {TARGET_MS:.0f} ms: {verdict}), {len(func())} messages")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+from telegram import Bot
+from telegram.request import HTTPXRequest
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.fake_coc_api import FakeCocAPI, make_clans
+
+# Seconds between polls in production; a round slower than this would fall behind
+POLL_INTERVAL_SECONDS = 45
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] if ordered else None
+
+def count_events(tenants):
+    total = 0
+    for tenant in tenants:
+        conn = sqlite3.connect(tenant.db_path)
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'player_events_%'")]
+        total += sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+        conn.close()
+    return total
+
+# Renew the leases like the scheduler's job does, for runs longer than one lease TTL
+async def keep_leases(application, interval):
+    from bot.leader import renew_leases
+    while True:
+        await asyncio.sleep(interval)
+        await renew_leases(application)
+
+# Poll every simulated clan `rounds` times through the real tracker: HTTP requests to the
+# CoC stand-in, SQLite writes per tenant and sends through python-telegram-bot to the fake Bot API.
+# The bot modules are imported here, after main() pointed COC_API_BASE and DB_PATH at the stand-ins.
+async def run_load(args, workdir, clans, coc):
+    from bot.leader import LEASE_RENEW_SECONDS, renew_leases
+    from bot.profiling import STAGES
+    from bot.subscriptions import CLAN, SubscriptionIndex
+    from bot.tenants import TenantRegistry, tenant_from_config
+    from bot.tracker import run_tenant_cycle
+
+    telegram_api = FakeBotAPI()
+    await telegram_api.start()
+    bot = Bot('123456:load', base_url=telegram_api.base_url, request=HTTPXRequest(connection_pool_size=256))
+    await bot.initialize()
+
+    tenants = TenantRegistry([
+        tenant_from_config({'clan_tag': clan.clan_tag, 'chats': [-1000 - index], 'db_path': os.path.join(workdir, f"clan_{index}.db")})
+        for index, clan in enumerate(clans)
+    ])
+    subscriptions = SubscriptionIndex()
+    for tenant in tenants:
+        # Keep every job the run produces, not only the latest ones
+        tenant.cycles = deque()
+        for chat_id in tenant.chats:
+            subscriptions.add(chat_id, CLAN, tenant.clan_tag)
+    application = SimpleNamespace(bot=bot, bot_data={'tenants': tenants, 'subscriptions': subscriptions})
+    # Standalone run: no other replica competes for the clans, so this one takes every lease
+    await renew_leases(application)
+    renewer = asyncio.create_task(keep_leases(application, LEASE_RENEW_SECONDS))
+
+    round_seconds = []
+    try:
+        for round_number in range(args.rounds + 1):
+            started = time.perf_counter()
+            await asyncio.gather(*(run_tenant_cycle(application, tenant) for tenant in tenants))
+            if round_number:  # the first round only takes the baseline snapshot
+                round_seconds.append(time.perf_counter() - started)
+            print(f"round {round_number}/{args.rounds} done", file=sys.stderr)
+    finally:
+        renewer.cancel()
+        await bot.shutdown()
+        await telegram_api.stop()
+        coc.stop()
+
+    cycles = [cycle for tenant in tenants for cycle in list(tenant.cycles)[1:]]
+    durations = [cycle['duration'] for cycle in cycles]
+    stage_totals = {name: sum(cycle['stages'][name] for cycle in cycles) for name in STAGES}
+    wall = sum(round_seconds)
+    return {
+        'clans': args.clans,
+        'members': args.members,
+        'rounds': args.rounds,
+        'war_hour': args.war_hour,
+        'round_p50_s': round(statistics.median(round_seconds), 3),
+        'round_max_s': round(max(round_seconds), 3),
+        'keeps_up': max(round_seconds) < POLL_INTERVAL_SECONDS,
+        'cycle_p50_ms': round(percentile(durations, 50) * 1000, 1),
+        'cycle_p95_ms': round(percentile(durations, 95) * 1000, 1),
+        'cycle_p99_ms': round(percentile(durations, 99) * 1000, 1),
+        'cycles_per_s': round(len(cycles) / wall, 1),
+        'outcomes': dict(Counter(cycle['outcome'] for cycle in cycles)),
+        'stage_share': {name: round(seconds / (sum(stage_totals.values()) or 1), 3) for name, seconds in stage_totals.items()},
+        'api_requests': dict(coc.requests),
+        'messages_sent': len(telegram_api.sent_messages),
+        'events_recorded': count_events(tenants),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the real polling, storage and notification path with simulated clans.")
+    parser.add_argument('--clans', type=int, default=50, help="simulated clans (default: 50)")
+    parser.add_argument('--members', type=int, default=50, help="members per clan (default: 50)")
+    parser.add_argument('--rounds', type=int, default=10, help="polls of every clan after the baseline (default: 10)")
+    parser.add_argument('--activity', type=float, default=0.05, help="chance per poll that an idle member starts playing or is attacked (default: 0.05)")
+    parser.add_argument('--churn', type=float, default=0.02, help="chance per poll of a join and of a departure (default: 0.02)")
+    parser.add_argument('--renames', type=float, default=0.01, help="chance per poll of a rename (default: 0.01)")
+    parser.add_argument('--war-hour', action='store_true', help="every member attacks or is attacked on every poll")
+    parser.add_argument('--latency-ms', type=float, default=0, help="added CoC API latency per request (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0, help="share of CoC API requests failing with 503 (default: 0)")
+    parser.add_argument('-o', '--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    clans = make_clans(args.clans, args.members, activity=args.activity, churn=args.churn, renames=args.renames, burst=args.war_hour)
+    coc = FakeCocAPI(clans, tick_seconds=0, latency_ms=args.latency_ms, error_rate=args.error_rate).start()
+    # Read by the bot modules when run_load imports them
+    os.environ['COC_API_BASE'] = coc.base_url
+    os.environ['DB_PATH'] = os.path.join(workdir, 'shared.db')
+    # Slow cycles are expected under load; keep their profiles out of the working tree
+    os.environ['PROFILE_DIR'] = os.path.join(workdir, 'profiles')
+    report = asyncio.run(run_load(args, workdir, clans, coc))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from bot import database, tracker
+from bot.sharding import OutboundDispatcher, QueueBot, assign_shards, run_and_publish
+from bot.subscriptions import CLAN, SubscriptionIndex
+from bot.tenants import TenantRegistry, tenant_from_config
+from benchmarks.synthetic import make_members, mutate_roster
+
+class CountingBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent += 1
+
+# Shard process: run every assigned tenant's cycle back to back until the deadline
+def bench_shard(configs, members, change_rate, deadline, outbound, results):
+    database.DB_PATH = os.path.join(os.path.dirname(configs[0]['db_path']), 'shared.db')
+    tenants = TenantRegistry([tenant_from_config(config) for config in configs])
+    subscriptions = SubscriptionIndex()
+    for tenant in tenants:
+        subscriptions.add(tenant.chats[0], CLAN, tenant.clan_tag)
+        tenant.lease.acquire()
+    application = SimpleNamespace(bot=QueueBot(outbound), bot_data={'tenants': tenants, 'subscriptions': subscriptions})
+    rng = random.Random(0)
+    rosters = {tenant.clan_tag: make_members(members, seed) for seed, tenant in enumerate(tenants)}
+
+    def fetch_clan_members(clan_tag):
+        rosters[clan_tag] = mutate_roster(rosters[clan_tag], change_rate, rng)
+        return rosters[clan_tag]
+
+    async def run():
+        cycles = 0
+        while time.time() < deadline:
+            for tenant in tenants:
+                await run_and_publish(application, tenant)
+                cycles += 1
+        return cycles
+
+    with patch.object(tracker, 'fetch_clan_members', fetch_clan_members), patch.object(tracker, 'fetch_players', lambda tags: {}):
+        results.put(asyncio.run(run()))
+
+# Run all tenants over `shards` processes for `duration` seconds; the parent drains the
+# outbound queue through the dispatcher like the bot process does
+def run_sharded(configs, shards, members, change_rate, duration):
+    context = multiprocessing.get_context('spawn')
+    outbound, results = context.Queue(), context.Queue()
+    bot = CountingBot()
+    dispatcher = OutboundDispatcher(SimpleNamespace(bot=bot, bot_data={'tenants': TenantRegistry([tenant_from_config(c) for c in configs])}),
+                                    outbound, rate=1_000_000)
+
+    # Leave time for the interpreters to start so only tracking work is measured
+    deadline = time.time() + 2 + duration
+    processes = [
+        context.Process(target=bench_shard, args=(shard_configs, members, change_rate, deadline, outbound, results))
+        for shard_configs in assign_shards(configs, list(range(shards))).values() if shard_configs
+    ]
+    for process in processes:
+        process.start()
+
+    loop = asyncio.new_event_loop()
+    cycles, pending = 0, len(processes)
+    while pending or not outbound.empty():
+        try:
+            loop.run_until_complete(dispatcher.dispatch(outbound.get(timeout=0.05)))
+        except queue.Empty:
+            pass
+        while not results.empty():
+            cycles += results.get()
+            pending -= 1
+    loop.close()
+    for process in processes:
+        process.join()
+    return cycles / duration, bot.sent
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure polling throughput as tenants are spread over more processes.")
+    parser.add_argument('--tenants', type=int, default=8, help="number of clans (default: 8)")
+    parser.add_argument('--members', type=int, default=500, help="members per clan (default: 500)")
+    parser.add_argument('--change-rate', type=float, default=0.2, help="share of members changing per cycle (default: 0.2)")
+    parser.add_argument('--max-shards', type=int, default=os.cpu_count(), help="largest shard count (default: CPU count)")
+    parser.add_argument('--duration', type=float, default=5, help="seconds measured per shard count (default: 5)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    configs = [
+        {'clan_tag': f"#SHARD{idx}", 'chats': [idx + 1], 'db_path': os.path.join(workdir, f"clan_{idx}.db")}
+        for idx in range(args.tenants)
+    ]
+    print(f"{os.cpu_count()} CPUs, {args.tenants} clans of {args.members} members")
+    print(f"{'shards':>6} {'cycles/s':>9} {'speedup':>8} {'messages':>9}")
+    baseline = None
+    for shards in range(1, args.max_shards + 1):
+        throughput, messages = run_sharded(configs, shards, args.members, args.change_rate, args.duration)
+        baseline = baseline or throughput
+        print(f"{shards:>6} {throughput:>9.1f} {throughput / baseline:>7.2f}x {messages:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_bot_api import FakeBotAPI
+
+# Regression thresholds; the run fails when either is exceeded
+MAX_IMPORT_MS = 1500
+MAX_FIRST_POLL_MS = 4000
+
+# Modules `python -m bot.main` imports before it validates the configuration
+STARTUP_MODULES = 'bot.main'
+# Modules that should stay unloaded until their commands are used
+LAZY_MODULES = ('bot.charts', 'bot.analytics', 'bot.export', 'matplotlib')
+
+def bench_env(workdir, base_url=None):
+    env = dict(os.environ, TELEGRAM_TEST_TOKEN='123456:bench', API_KEY='bench', CLAN_TAG='#BENCH',
+               DB_PATH=os.path.join(workdir, 'bench.db'), CHART_CACHE_DIR=os.path.join(workdir, 'charts'),
+               RANKING_LOCATIONS='', LOG_LEVEL='WARNING')
+    if base_url:
+        env['TELEGRAM_BASE_URL'] = base_url
+    return env
+
+# Import everything a polling bot loads in a fresh interpreter and report the time taken
+# and which lazily loaded modules were pulled in anyway
+def measure_imports(workdir):
+    script = (
+        "import sys, time, json; started = time.perf_counter();"
+        "import bot.main, bot.telegram_bot, bot.scheduler;"
+        "elapsed = (time.perf_counter() - started) * 1000;"
+        f"print(json.dumps({{'import_ms': elapsed, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))"
+    )
+    output = subprocess.run([sys.executable, '-c', script], env=bench_env(workdir), capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+# Start `python -m bot.main` against the fake Bot API and time the first getUpdates call
+async def measure_first_poll(workdir, timeout=30):
+    api = FakeBotAPI()
+    await api.start()
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'bot.main', env=bench_env(workdir, api.base_url),
+                                                   stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        await asyncio.wait_for(api.polled.wait(), timeout)
+        return (api.first_poll_at - started) * 1000
+    finally:
+        process.terminate()
+        await process.wait()
+        await api.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bot import time and time to the first Telegram poll.")
+    parser.add_argument('--runs', type=int, default=3, help="runs to take the median of (default: 3)")
+    parser.add_argument('--max-import-ms', type=float, default=MAX_IMPORT_MS, help=f"import time budget (default: {MAX_IMPORT_MS})")
+    parser.add_argument('--max-first-poll-ms', type=float, default=MAX_FIRST_POLL_MS, help=f"time-to-first-poll budget (default: {MAX_FIRST_POLL_MS})")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    imports = [measure_imports(workdir) for _ in range(args.runs)]
+    first_polls = [asyncio.run(measure_first_poll(workdir)) for _ in range(args.runs)]
+    import_ms = sorted(run['import_ms'] for run in imports)[args.runs // 2]
+    first_poll_ms = sorted(first_polls)[args.runs // 2]
+    eager = imports[0]['loaded']
+
+    print(f"import time      {import_ms:8.1f} ms  (budget {args.max_import_ms:.0f} ms)")
+    print(f"time to 1st poll {first_poll_ms:8.1f} ms  (budget {args.max_first_poll_ms:.0f} ms)")
+    print(f"lazy modules loaded at startup: {', '.join(eager) or 'none'}")
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append("import time over budget")
+    if first_poll_ms > args.max_first_poll_ms:
+        failures.append("time to first poll over budget")
+    if eager:
+        failures.append("lazily loaded modules imported at startup")
+    if failures:
+        sys.exit("REGRESSION: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from bot import database, handlers, tracker
+from bot.keyboards import STATUS_PREFIX
+from bot.subscriptions import CLAN, SubscriptionIndex
+from bot.tenants import Tenant, TenantRegistry
+from bot.utils import format_trophy_table
+from benchmarks.synthetic import make_members, mutate_roster
+
+# Stands in for the Telegram Bot API: every call succeeds immediately and is counted
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        self.sent += 1
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        self.sent += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"photo-{self.sent}")])
+
+# Stands in for the CoC API: serves the current synthetic roster and per-player counters
+class FakeClanAPI:
+    def __init__(self, members, seed=0):
+        self.members = members
+        self.counters = {member['tag']: (0, 0) for member in members}
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def advance(self, change_rate):
+        self.members = mutate_roster(self.members, change_rate, self.rng)
+
+    def fetch_clan_members(self, clan_tag=None):
+        self.calls += 1
+        return self.members
+
+    def fetch_top_clan_trophies(self, clan_tag=None):
+        self.calls += 1
+        return self.members[:25]
+
+    def fetch_players(self, tags):
+        self.calls += 1
+        return {tag: {'attackWins': self.counters[tag][0], 'defenseWins': self.counters[tag][1]} for tag in tags}
+
+    def patches(self):
+        return [
+            patch.object(tracker, 'fetch_clan_members', self.fetch_clan_members),
+            patch.object(tracker, 'fetch_players', self.fetch_players),
+            patch.object(tracker, 'fetch_top_clan_trophies', self.fetch_top_clan_trophies),
+            patch.object(handlers, 'fetch_clan_members', self.fetch_clan_members),
+        ]
+
+# Callback query for a status button press, answered into the fake bot
+def status_update(chat_id, tag, bot):
+    async def answer():
+        pass
+
+    async def reply_text(text, parse_mode=None, reply_markup=None):
+        await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+
+    query = SimpleNamespace(data=f"{STATUS_PREFIX}{tag}", answer=answer, message=SimpleNamespace(chat_id=chat_id, reply_text=reply_text))
+    return SimpleNamespace(callback_query=query, effective_chat=SimpleNamespace(id=chat_id))
+
+def summarize(name, samples, params, **extra):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    total = sum(samples) / 1000
+    return {
+        'scenario': name,
+        **params,
+        'iterations': len(samples),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'max_ms': round(max(samples), 3),
+        'ops_per_s': round(len(samples) / total, 1) if total else None,
+        **extra,
+    }
+
+async def timed(samples, coro):
+    started = time.perf_counter()
+    await coro
+    samples.append((time.perf_counter() - started) * 1000)
+
+# Run every scenario for one roster size and change rate against a fresh database
+async def run_scenarios(member_count, change_rate, iterations, resets, seed=0):
+    api = FakeClanAPI(make_members(member_count, seed), seed)
+    bot = FakeBot()
+    tenant = Tenant('#BENCH', chats=[1])
+    tenant.lease.expires_at = float('inf')
+    subscriptions = SubscriptionIndex()
+    subscriptions.add(1, CLAN, tenant.clan_tag)
+    application = SimpleNamespace(bot=bot, bot_data={'subscriptions': subscriptions, 'tenants': TenantRegistry([tenant])})
+    context = SimpleNamespace(bot=bot, bot_data=application.bot_data)
+    params = {'members': member_count, 'change_rate': change_rate}
+    results = []
+
+    for active in api.patches():
+        active.start()
+    try:
+        await tracker.check_trophy_differences(application, tenant)  # baseline snapshot
+
+        samples, sent = [], bot.sent
+        for _ in range(iterations):
+            api.advance(change_rate)
+            await timed(samples, tracker.check_trophy_differences(application, tenant))
+        results.append(summarize('cycle', samples, params, members_per_s=round(member_count * len(samples) / (sum(samples) / 1000)), messages=bot.sent - sent))
+
+        rng = random.Random(seed)
+        tags = [member['tag'] for member in api.members]
+        samples = []
+        for _ in range(iterations):
+            await timed(samples, handlers.button_handler(status_update(1, rng.choice(tags), bot), context))
+        results.append(summarize('status', samples, params))
+
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            format_trophy_table(api.members[:25])
+            samples.append((time.perf_counter() - started) * 1000)
+        results.append(summarize('table', samples, params))
+
+        samples = []
+        for _ in range(resets):
+            await timed(samples, tracker.reset_player_stats(application, tenant))
+        results.append(summarize('reset', samples, params))
+    finally:
+        patch.stopall()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency and throughput of the polling cycle, status lookups, table rendering and daily reset.")
+    parser.add_argument('--sizes', default='50,200,1000', help="comma-separated roster sizes (default: 50,200,1000)")
+    parser.add_argument('--change-rates', default='0.05,0.5', help="comma-separated shares of members changing per cycle (default: 0.05,0.5)")
+    parser.add_argument('--iterations', type=int, default=50, help="cycles, status lookups and renders per combination (default: 50)")
+    parser.add_argument('--resets', type=int, default=3, help="daily resets per combination (default: 3)")
+    parser.add_argument('-o', '--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('CHART_CACHE_DIR', workdir)
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        for rate in (float(rate) for rate in args.change_rates.split(',')):
+            database.DB_PATH = os.path.join(workdir, f"bench_{size}_{rate}.db")
+            results.extend(asyncio.run(run_scenarios(size, rate, args.iterations, args.resets)))
+            print(f"members={size} change_rate={rate} done", file=sys.stderr)
+
+    report = {'commit': git_commit(), 'python': platform.python_version(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import time
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot import database
+from bot.telegram_bot import create_bot
+from bot.tenants import Tenant, TenantRegistry
+from bot.webhook import webhook_settings
+
+TOKEN = '123456:bench'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+# Drive one receive mode end to end: inject /start updates into the fake Bot API
+# and time how long it takes for the bot's reply to arrive back at the fake.
+async def run_mode(mode, updates, concurrency):
+    api = FakeBotAPI()
+    await api.start()
+    application = create_bot(TOKEN, TenantRegistry([Tenant('#BENCH', chats=[1])]), concurrent_updates=concurrency, base_url=api.base_url)
+    # Only update handling is measured; keep the polling and refresh jobs from firing
+    application.bot_data['scheduler'].pause()
+    await application.initialize()
+    if mode == 'webhook':
+        os.environ['WEBHOOK_URL'] = f"http://127.0.0.1:{free_port()}"
+        os.environ['WEBHOOK_PORT'] = os.environ['WEBHOOK_URL'].rsplit(':', 1)[1]
+        await application.updater.start_webhook(drop_pending_updates=True, **webhook_settings())
+    else:
+        await application.updater.start_polling(timeout=60, drop_pending_updates=True)
+    await application.start()
+
+    try:
+        await api.request_reply(0)  # warm up connections
+        latencies = [await api.request_reply(chat_id) for chat_id in range(1, updates + 1)]
+
+        burst_started = time.perf_counter()
+        await asyncio.gather(*(api.request_reply(chat_id) for chat_id in range(updates + 1, 2 * updates + 1)))
+        burst_elapsed = time.perf_counter() - burst_started
+    finally:
+        application.bot_data['scheduler'].shutdown(wait=False)
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await api.stop()
+
+    return {
+        'mode': mode,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'burst_updates_per_s': updates / burst_elapsed,
+    }
+
+async def run(args):
+    results = []
+    for mode in ('polling', 'webhook'):
+        results.append(await run_mode(mode, args.updates, args.concurrency))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare update-to-reply latency of polling and webhook mode against a fake Bot API.")
+    parser.add_argument('--updates', type=int, default=200, help="number of updates per mode (default: 200)")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent update handlers (default: 8)")
+    args = parser.parse_args()
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'burst upd/s':>12}")
+    for result in asyncio.run(run(args)):
+        print(f"{result['mode']:<8} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['mean_ms']:>8.2f} {result['burst_updates_per_s']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application, RequestHandler
+
+# Minimal in-process stand-in for the Telegram Bot API. It serves the handful of
+# methods the bot uses, records every sendMessage call and can deliver injected
+# updates either through getUpdates long polling or by POSTing them to a webhook.
+class FakeBotAPI:
+    def __init__(self):
+        self.port = None
+        self.server = None
+        self.webhook_url = None
+        self.secret_token = None
+        self.pending_updates = []
+        self.updates_available = asyncio.Event()
+        self.sent_messages = []
+        self.reply_waiters = {}
+        self.next_update_id = 1
+        self.next_message_id = 1
+        # perf_counter() of the first getUpdates call, for time-to-first-poll measurements
+        self.first_poll_at = None
+        self.polled = asyncio.Event()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self):
+        sockets = bind_sockets(0, '127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        app = Application([(r'/bot[^/]+/(\w+)', _MethodHandler, {'api': self})])
+        self.server = HTTPServer(app)
+        self.server.add_sockets(sockets)
+
+    async def stop(self):
+        # Release any long poll that is still waiting before closing connections
+        self.updates_available.set()
+        self.server.stop()
+        await self.server.close_all_connections()
+
+    def make_command_update(self, chat_id, command):
+        update_id = self.next_update_id
+        self.next_update_id += 1
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': f"user{chat_id}"},
+                'text': command,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+            },
+        }
+
+    async def push_update(self, update):
+        if self.webhook_url:
+            headers = {'Content-Type': 'application/json'}
+            if self.secret_token:
+                headers['X-Telegram-Bot-Api-Secret-Token'] = self.secret_token
+            request = HTTPRequest(self.webhook_url, method='POST', headers=headers, body=json.dumps(update))
+            await AsyncHTTPClient().fetch(request)
+        else:
+            self.pending_updates.append(update)
+            self.updates_available.set()
+
+    # Inject a command update and wait for the bot's reply in the same chat.
+    # Returns the update-to-reply latency in seconds.
+    async def request_reply(self, chat_id, command='/start'):
+        waiter = asyncio.get_running_loop().create_future()
+        self.reply_waiters[chat_id] = waiter
+        started = time.perf_counter()
+        await self.push_update(self.make_command_update(chat_id, command))
+        await waiter
+        return time.perf_counter() - started
+
+    async def get_updates(self, offset, timeout):
+        if self.first_poll_at is None:
+            self.first_poll_at = time.perf_counter()
+            self.polled.set()
+        self.pending_updates = [update for update in self.pending_updates if update['update_id'] >= offset]
+        if not self.pending_updates:
+            self.updates_available.clear()
+            try:
+                await asyncio.wait_for(self.updates_available.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(self.pending_updates)
+
+    def record_message(self, chat_id, text):
+        message_id = self.next_message_id
+        self.next_message_id += 1
+        self.sent_messages.append((time.perf_counter(), chat_id, text))
+        waiter = self.reply_waiters.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(text)
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': text,
+        }
+
+
+class _MethodHandler(RequestHandler):
+    def initialize(self, api):
+        self.api = api
+
+    def param(self, name, default=None):
+        return self.get_body_argument(name, None) or self.get_query_argument(name, default)
+
+    async def post(self, method):
+        api = self.api
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method == 'getUpdates':
+            result = await api.get_updates(int(self.param('offset', 0)), float(self.param('timeout', 0)))
+        elif method == 'setWebhook':
+            api.webhook_url = self.param('url')
+            api.secret_token = self.param('secret_token')
+            result = True
+        elif method == 'deleteWebhook':
+            api.webhook_url = None
+            result = True
+        elif method == 'sendMessage':
+            result = api.record_message(int(self.param('chat_id')), self.param('text'))
+        else:
+            result = True
+        self.write({'ok': True, 'result': result})
+
+    get = post
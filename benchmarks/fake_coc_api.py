@@ -0,0 +1,244 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+from bot.reconcile import ATTACK_MAX, ATTACK_MIN, DEFENSE_MAX, MAX_EVENTS
+
+# One simulated step per real 45 s poll makes a day this many steps long
+STEPS_PER_DAY = 24 * 3600 // 45
+NAME_PARTS = ('Dragon', 'Ñoño', 'Kïng', 'Queen', 'Shadow', 'Ártemis', 'Zap', 'Hog', 'Valk', 'Miner', 'Ｍａｘ', 'Lord')
+
+class SimulatedMember:
+    __slots__ = ('tag', 'name', 'trophies', 'attacks', 'defenses', 'attack_wins', 'defense_wins', 'session')
+
+    def __init__(self, tag, name, trophies):
+        self.tag = tag
+        self.name = name
+        self.trophies = trophies
+        # Today's attacks and defenses, capped at MAX_EVENTS each outside war-hour bursts
+        self.attacks = 0
+        self.defenses = 0
+        # Lifetime counters the player endpoint reports
+        self.attack_wins = 0
+        self.defense_wins = 0
+        # Steps left in the member's current play session
+        self.session = 0
+
+# A legend-league clan: members play in short sessions of back-to-back attacks, get
+# defended against at random, and the roster sees joins, departures and renames.
+# In burst mode (war hour) every member attacks or is attacked on every step.
+class ClanSimulator:
+    def __init__(self, clan_tag, member_count, seed=0, activity=0.05, churn=0.02, renames=0.01, burst=False):
+        self.clan_tag = clan_tag
+        self.rng = random.Random(seed)
+        self.activity = activity
+        self.churn = churn
+        self.renames = renames
+        self.burst = burst
+        self.next_id = 0
+        self.steps = 0
+        self.lock = threading.Lock()
+        self.members = {}
+        # Shared tag -> clan index of the API serving this clan, kept up to date on joins and departures
+        self.directory = {}
+        for _ in range(member_count):
+            self.join()
+
+    def join(self):
+        self.next_id += 1
+        tag = f"#{self.clan_tag.lstrip('#')}P{self.next_id:04d}"
+        member = SimulatedMember(tag, self.random_name(), self.rng.randint(5000, 6200))
+        self.members[tag] = member
+        self.directory[tag] = self
+        return member
+
+    def leave(self, tag):
+        del self.members[tag]
+        self.directory.pop(tag, None)
+
+    def random_name(self):
+        return f"{self.rng.choice(NAME_PARTS)} {self.rng.choice(NAME_PARTS)} {self.rng.randint(1, 99)}"
+
+    def attack(self, member):
+        # Most legend attacks are triples or close to it
+        gain = max(ATTACK_MIN, min(ATTACK_MAX, round(self.rng.gauss(33, 5))))
+        member.trophies += gain
+        member.attacks += 1
+        member.attack_wins += 1
+
+    def defend(self, member):
+        loss = max(0, min(DEFENSE_MAX, round(self.rng.gauss(26, 11))))
+        member.trophies -= loss
+        member.defenses += 1
+        if loss == 0:
+            member.defense_wins += 1
+
+    # Advance the clan by one poll interval
+    def step(self):
+        rng = self.rng
+        self.steps += 1
+        if self.steps % STEPS_PER_DAY == 0:
+            for member in self.members.values():
+                member.attacks = member.defenses = 0
+
+        for member in self.members.values():
+            if self.burst:
+                if rng.random() < 0.5:
+                    self.attack(member)
+                else:
+                    self.defend(member)
+                continue
+            if member.session:
+                member.session -= 1
+                if member.attacks < MAX_EVENTS and rng.random() < 0.5:
+                    self.attack(member)
+            elif rng.random() < self.activity:
+                member.session = rng.randint(2, 6)
+            if member.defenses < MAX_EVENTS and rng.random() < self.activity:
+                self.defend(member)
+
+        if rng.random() < self.churn and len(self.members) > 1:
+            self.leave(rng.choice(list(self.members)))
+        if rng.random() < self.churn:
+            self.join()
+        if rng.random() < self.renames:
+            rng.choice(list(self.members.values())).name = self.random_name()
+
+    def clan_json(self):
+        members = sorted(self.members.values(), key=lambda member: member.trophies, reverse=True)
+        return {
+            'tag': self.clan_tag,
+            'name': f"Simulated {self.clan_tag}",
+            'members': len(members),
+            'memberList': [
+                {'tag': member.tag, 'name': member.name, 'trophies': member.trophies, 'clanRank': rank, 'role': 'member'}
+                for rank, member in enumerate(members, start=1)
+            ],
+        }
+
+    def player_json(self, tag):
+        member = self.members.get(tag)
+        if member is None:
+            return None
+        return {'tag': member.tag, 'name': member.name, 'trophies': member.trophies,
+                'attackWins': member.attack_wins, 'defenseWins': member.defense_wins}
+
+# Local stand-in for the CoC API serving simulated clans. A clan advances one step when
+# it is fetched and at least tick_seconds passed since its last step; 0 advances it on
+# every fetch, so every poll of a stress test sees fresh activity.
+class FakeCocAPI:
+    def __init__(self, clans, tick_seconds=0, latency_ms=0, error_rate=0, port=0, host='127.0.0.1', seed=0):
+        self.clans = {clan.clan_tag: clan for clan in clans}
+        self.tick_seconds = tick_seconds
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = Counter()
+        self.requests_lock = threading.Lock()
+        self.stepped_at = {}
+        # Player tag -> clan, so a player lookup does not scan every clan
+        self.player_clans = {}
+        for clan in clans:
+            self.player_clans.update(clan.directory)
+            clan.directory = self.player_clans
+        self.server = ThreadingHTTPServer((host, port), _CocHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-coc-api', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # (status, body) for an API path such as /v1/clans/#TAG
+    def respond(self, path):
+        parts = unquote(urlparse(path).path).strip('/').split('/')
+        if parts and parts[0] == 'v1':
+            parts = parts[1:]
+        endpoint = parts[0] if parts else ''
+        with self.requests_lock:
+            self.requests[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return 503, {'reason': 'inMaintenance'}
+
+        if endpoint == 'clans' and len(parts) == 2 and parts[1] in self.clans:
+            clan = self.clans[parts[1]]
+            with clan.lock:
+                now = time.monotonic()
+                if now - self.stepped_at.get(clan.clan_tag, 0) >= self.tick_seconds:
+                    self.stepped_at[clan.clan_tag] = now
+                    clan.step()
+                return 200, clan.clan_json()
+        if endpoint == 'players' and len(parts) == 2:
+            clan = self.player_clans.get(parts[1])
+            if clan is not None:
+                with clan.lock:
+                    player = clan.player_json(parts[1])
+                if player is not None:
+                    return 200, player
+        if endpoint == 'locations' and len(parts) == 4 and parts[2:] == ['rankings', 'players']:
+            return 200, {'items': []}
+        if endpoint == 'locations' and len(parts) == 2:
+            return 200, {'id': parts[1], 'name': parts[1].capitalize()}
+        return 404, {'reason': 'notFound'}
+
+class _CocHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, body = self.server.api.respond(self.path)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_clans(count, members, seed=0, **options):
+    return [ClanSimulator(f"#SIM{index:03d}", members, seed=seed + index, **options) for index in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve simulated legend-league clans through a local CoC API stand-in.")
+    parser.add_argument('--clans', type=int, default=5, help="simulated clans (default: 5)")
+    parser.add_argument('--members', type=int, default=50, help="members per clan (default: 50)")
+    parser.add_argument('--activity', type=float, default=0.05, help="chance per step that an idle member starts playing or is attacked (default: 0.05)")
+    parser.add_argument('--churn', type=float, default=0.02, help="chance per step of a join and of a departure (default: 0.02)")
+    parser.add_argument('--renames', type=float, default=0.01, help="chance per step of a rename (default: 0.01)")
+    parser.add_argument('--war-hour', action='store_true', help="every member attacks or is attacked on every step")
+    parser.add_argument('--tick', type=float, default=45, help="seconds between steps of a clan (default: 45)")
+    parser.add_argument('--latency-ms', type=float, default=0, help="added latency per request (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0, help="share of requests answered with 503 (default: 0)")
+    parser.add_argument('--port', type=int, default=8090, help="port to listen on (default: 8090)")
+    parser.add_argument('--tenants-file', help="write a TENANTS_FILE for the simulated clans here")
+    args = parser.parse_args()
+
+    clans = make_clans(args.clans, args.members, activity=args.activity, churn=args.churn, renames=args.renames, burst=args.war_hour)
+    api = FakeCocAPI(clans, tick_seconds=args.tick, latency_ms=args.latency_ms, error_rate=args.error_rate, port=args.port)
+    if args.tenants_file:
+        with open(args.tenants_file, 'w', encoding='utf-8') as tenants_file:
+            json.dump([{'clan_tag': clan.clan_tag} for clan in clans], tenants_file, indent=2)
+    print(f"Serving {args.clans} clans of {args.members} members; run the bot with COC_API_BASE={api.base_url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import random
+from datetime import datetime, timedelta
+from bot.database import init_db_for_date, record_events
+
+# Legend league limits: 8 attacks and 8 defenses a day, each worth up to 40 trophies
+ATTACKS_PER_DAY = 8
+DEFENSES_PER_DAY = 8
+
+def make_members(count, seed=0):
+    rng = random.Random(seed)
+    members = [
+        {'tag': f"#BENCH{idx:04d}", 'name': f"Player {idx}", 'trophies': rng.randint(5000, 6200)}
+        for idx in range(count)
+    ]
+    return sorted(members, key=lambda member: member['trophies'], reverse=True)
+
+# Return the next poll's roster: a change_rate share of members gained or lost trophies
+def mutate_roster(members, change_rate, rng):
+    next_members = []
+    for member in members:
+        if rng.random() < change_rate:
+            delta = rng.randint(5, 40) if rng.random() < 0.5 else -rng.randint(0, 40)
+            member = dict(member, trophies=member['trophies'] + delta)
+        next_members.append(member)
+    return sorted(next_members, key=lambda member: member['trophies'], reverse=True)
+
+# Fill the database with a season of legend-league events for the given members
+def populate_season(members, start_date, days, seed=0):
+    rng = random.Random(seed)
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        date_str = day.strftime('%m%d')
+        conn = init_db_for_date(date_str)
+        events = []
+        for member in members:
+            event_types = ['attack'] * ATTACKS_PER_DAY + ['defend'] * DEFENSES_PER_DAY
+            rng.shuffle(event_types)
+            for slot, event_type in enumerate(event_types):
+                when = datetime.combine(day, datetime.min.time()) + timedelta(minutes=slot * 85 + rng.randint(0, 60))
+                events.append((member['tag'], member['name'], when, event_type, rng.randint(5, 40), False))
+        record_events(conn, date_str, events)
+        conn.close()
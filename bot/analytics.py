@@ -0,0 +1,146 @@
+import html
+from dataclasses import dataclass
+import numpy as np
+from .database import event_days_between
+
+# Legend league attacks top out at 40 trophies; a +40 attack is a triple
+TRIPLE_TROPHIES = 40
+
+# A date range of events loaded once into columnar arrays. Player and day columns are
+# integer codes into `tags`/`names` and `days`, so every statistic is a group-by over
+# flat arrays instead of a loop over rows.
+@dataclass
+class SeasonEvents:
+    tags: np.ndarray
+    names: list
+    days: list
+    player: np.ndarray
+    day: np.ndarray
+    is_attack: np.ndarray
+    change: np.ndarray
+
+    @property
+    def player_count(self):
+        return len(self.tags)
+
+    @property
+    def day_count(self):
+        return len(self.days)
+
+def load_season(conn, start_date, end_date):
+    days, day_codes, tags, names, event_types, changes = [], [], [], [], [], []
+    for day, date_str in event_days_between(conn, start_date, end_date):
+        rows = conn.execute(
+            f"SELECT tag, name, event_type, trophy_change FROM player_events_{date_str} WHERE date = ?", (day,)).fetchall()
+        if not rows:
+            continue
+        day_tags, day_names, day_types, day_changes = zip(*rows)
+        day_codes.append(np.full(len(rows), len(days), dtype=np.int32))
+        days.append(day)
+        tags.extend(day_tags)
+        names.extend(day_names)
+        event_types.extend(day_types)
+        changes.extend(day_changes)
+
+    if not days:
+        return None
+
+    unique_tags, first_seen, player = np.unique(np.array(tags), return_index=True, return_inverse=True)
+    return SeasonEvents(
+        tags=unique_tags,
+        names=[names[idx] for idx in first_seen],
+        days=days,
+        player=player.astype(np.int32),
+        day=np.concatenate(day_codes),
+        is_attack=np.array(event_types) == 'attack',
+        change=np.array(changes, dtype=np.int64),
+    )
+
+# Per-group median of values, where groups are integer codes; empty groups get NaN
+def group_median(groups, values, group_count):
+    counts = np.bincount(groups, minlength=group_count)
+    order = np.lexsort((values, groups))
+    ordered = values[order].astype(np.float64)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(group_count, np.nan)
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    medians[present] = (ordered[low] + ordered[high]) / 2
+    return medians
+
+def safe_divide(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan), where=denominator > 0)
+
+def compute_season_stats(events):
+    players, days = events.player_count, events.day_count
+    attack = events.is_attack
+    defend = ~attack
+
+    attack_count = np.bincount(events.player[attack], minlength=players)
+    defend_count = np.bincount(events.player[defend], minlength=players)
+    attack_trophies = np.bincount(events.player[attack], weights=events.change[attack], minlength=players)
+    defend_trophies = np.bincount(events.player[defend], weights=events.change[defend], minlength=players)
+    triples = np.bincount(events.player[attack & (events.change >= TRIPLE_TROPHIES)], minlength=players)
+    defend_triples = np.bincount(events.player[defend & (events.change <= -TRIPLE_TROPHIES)], minlength=players)
+
+    # Player x day matrices of net trophies and event counts
+    cell = events.player * days + events.day
+    daily_net = np.bincount(cell, weights=events.change, minlength=players * days).reshape(players, days)
+    daily_events = np.bincount(cell, minlength=players * days).reshape(players, days)
+    active = daily_events > 0
+    best_day = np.where(active, daily_net, -np.inf).argmax(axis=1)
+    worst_day = np.where(active, daily_net, np.inf).argmin(axis=1)
+    clan_daily_net = daily_net.sum(axis=0)
+
+    return {
+        'attack_count': attack_count,
+        'defend_count': defend_count,
+        'attack_trophies': attack_trophies,
+        'defend_trophies': defend_trophies,
+        'net': attack_trophies + defend_trophies,
+        'attack_avg': safe_divide(attack_trophies, attack_count),
+        'defend_avg': safe_divide(defend_trophies, defend_count),
+        'attack_median': group_median(events.player[attack], events.change[attack], players),
+        'defend_median': group_median(events.player[defend], events.change[defend], players),
+        'triple_rate': safe_divide(triples, attack_count),
+        'hold_rate': safe_divide(defend_count - defend_triples, defend_count),
+        'active_days': active.sum(axis=1),
+        'best_day': best_day,
+        'best_day_net': daily_net[np.arange(players), best_day],
+        'worst_day': worst_day,
+        'worst_day_net': daily_net[np.arange(players), worst_day],
+        'daily_net': daily_net,
+        'clan': {
+            'events': len(events.change),
+            'attacks': int(attack_count.sum()),
+            'defends': int(defend_count.sum()),
+            'attack_avg': float(safe_divide(attack_trophies.sum(), attack_count.sum())),
+            'defend_avg': float(safe_divide(defend_trophies.sum(), defend_count.sum())),
+            'triple_rate': float(safe_divide(triples.sum(), attack_count.sum())),
+            'daily_net': clan_daily_net,
+            'best_day': int(clan_daily_net.argmax()),
+            'worst_day': int(clan_daily_net.argmin()),
+        },
+    }
+
+def format_percent(value):
+    return ' -- ' if np.isnan(value) else f"{value * 100:3.0f}%"
+
+def format_average(value):
+    return '  -- ' if np.isnan(value) else f"{value:5.1f}"
+
+# Yield the /season report lines: clan summary first, then one line per player by net gain
+def format_season_report(events, stats):
+    clan = stats['clan']
+    yield f"Days: {events.day_count}  Events: {clan['events']}"
+    yield f"Clan ATK {clan['attacks']}x avg {clan['attack_avg']:+.1f}  triples {format_percent(clan['triple_rate'])}"
+    yield f"Clan DEF {clan['defends']}x avg {clan['defend_avg']:+.1f}"
+    yield f"Best day  {events.days[clan['best_day']]:%m-%d} {clan['daily_net'][clan['best_day']]:+.0f}"
+    yield f"Worst day {events.days[clan['worst_day']]:%m-%d} {clan['daily_net'][clan['worst_day']]:+.0f}"
+    yield ""
+    yield "Name          ATKavg DEFavg  3*%  Net  Best"
+    for idx in np.argsort(-stats['net'], kind='stable'):
+        yield (f"{html.escape(events.names[idx][:12]):<12} {format_average(stats['attack_avg'][idx])} "
+               f"{format_average(stats['defend_avg'][idx])} {format_percent(stats['triple_rate'][idx])} "
+               f"{stats['net'][idx]:>+5.0f} {events.days[stats['best_day'][idx]]:%m-%d}")
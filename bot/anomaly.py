@@ -0,0 +1,115 @@
+import math
+import os
+from collections import deque
+from dataclasses import dataclass
+
+ROLLING_WINDOW_SECONDS = int(os.getenv('ANOMALY_WINDOW_MINUTES', '60')) * 60
+ROLLING_LOSS_THRESHOLD = int(os.getenv('ANOMALY_LOSS_THRESHOLD', '200'))
+ZSCORE_THRESHOLD = float(os.getenv('ANOMALY_ZSCORE', '3.0'))
+PERFECT_DEFENSE_STREAK = int(os.getenv('ANOMALY_PERFECT_DEFENSES', '3'))
+EWMA_ALPHA = 0.1
+# Events needed before the EWMA statistics are trusted for z-scores
+WARMUP_EVENTS = 10
+# Hard cap on events kept per player for the rolling window
+WINDOW_MAX_EVENTS = 64
+
+@dataclass
+class Alert:
+    kind: str
+    tag: str
+    name: str
+    message: str
+
+# Exponentially weighted mean and variance of one kind of event
+class Moments:
+    __slots__ = ('count', 'mean', 'variance')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def zscore(self, change):
+        if self.count < WARMUP_EVENTS or self.variance <= 0:
+            return 0.0
+        return (change - self.mean) / math.sqrt(self.variance)
+
+    def update(self, change):
+        if not self.count:
+            # Start from the first value rather than 0, so warm-up does not inflate the variance
+            self.mean = float(change)
+        diff = change - self.mean
+        increment = EWMA_ALPHA * diff
+        self.mean += increment
+        self.variance = (1 - EWMA_ALPHA) * (self.variance + diff * increment)
+        self.count += 1
+
+# Rolling state for one player. Every update is O(1): the EWMA moments of the event's
+# type are updated in place and the rolling sum adds the new event and subtracts expired
+# ones. Attacks and defenses keep separate moments, since one gains and the other loses.
+class PlayerStream:
+    __slots__ = ('moments', 'window', 'window_sum', 'loss_alerted', 'perfect_defenses')
+
+    def __init__(self):
+        self.moments = {'attack': Moments(), 'defend': Moments()}
+        self.window = deque(maxlen=WINDOW_MAX_EVENTS)
+        self.window_sum = 0
+        self.loss_alerted = False
+        self.perfect_defenses = 0
+
+    def update(self, timestamp, event_type, change):
+        self.moments[event_type].update(change)
+        if len(self.window) == self.window.maxlen:
+            self.window_sum -= self.window[0][1]
+        self.window.append((timestamp, change))
+        self.window_sum += change
+        while self.window and self.window[0][0] <= timestamp - ROLLING_WINDOW_SECONDS:
+            self.window_sum -= self.window.popleft()[1]
+
+# Streaming detector fed with recorded events. State is one PlayerStream per tracked
+# player and is dropped when the player leaves.
+class AnomalyDetector:
+    def __init__(self, loss_threshold=None):
+        self.streams = {}
+        self.loss_threshold = loss_threshold or ROLLING_LOSS_THRESHOLD
+
+    def forget(self, tag):
+        self.streams.pop(tag, None)
+
+    def stream(self, tag):
+        stream = self.streams.get(tag)
+        if stream is None:
+            stream = self.streams[tag] = PlayerStream()
+        return stream
+
+    # change is signed: positive for attacks, negative for defenses; timestamp in seconds
+    def observe(self, tag, name, timestamp, event_type, change):
+        stream = self.stream(tag)
+        alerts = []
+        zscore = stream.moments[event_type].zscore(change)
+        stream.update(timestamp, event_type, change)
+
+        if abs(zscore) >= ZSCORE_THRESHOLD:
+            alerts.append(Alert('zscore', tag, name, f"unusual {event_type} of {change:+d} (z-score {zscore:+.1f})"))
+
+        if stream.window_sum <= -self.loss_threshold:
+            # Alert once per losing streak, re-arm when the window recovers
+            if not stream.loss_alerted:
+                stream.loss_alerted = True
+                minutes = ROLLING_WINDOW_SECONDS // 60
+                alerts.append(Alert('rolling_loss', tag, name, f"lost {-stream.window_sum} trophies in the last {minutes} minutes"))
+        else:
+            stream.loss_alerted = False
+        return alerts
+
+    # A defense that costs no trophies leaves no trophy change to record, so the streak
+    # follows the player's defenseWins counter: `wins` is its increase since the last
+    # lookup and `losses` the defenses that cost trophies in the same poll window.
+    # Losses are taken to come first, as the order within a window is unknown.
+    def observe_defenses(self, tag, name, wins, losses):
+        stream = self.stream(tag)
+        before = 0 if losses else stream.perfect_defenses
+        stream.perfect_defenses = before + wins
+        if before < PERFECT_DEFENSE_STREAK <= stream.perfect_defenses:
+            return [Alert('perfect_defenses', tag, name, f"{stream.perfect_defenses} perfect defenses in a row")]
+        return []
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from .database import connect_db, fetch_player_events, fetch_day_events
+
+CHART_CACHE_DIR = os.getenv('CHART_CACHE_DIR', 'chart_cache')
+CHART_CACHE_MAX_FILES = int(os.getenv('CHART_CACHE_MAX_FILES', '200'))
+
+ATTACK_COLOR = '#2e7d32'
+DEFEND_COLOR = '#c62828'
+
+# Charts are cached under a hash of what they show: the series, the first and last
+# event timestamps, the number of events and the trophy anchor. New events change the
+# key, so a cached file never goes stale and repeat requests skip rendering entirely.
+def chart_cache_path(*parts):
+    key = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return os.path.join(CHART_CACHE_DIR, f"{key}.png")
+
+def prune_chart_cache():
+    files = [os.path.join(CHART_CACHE_DIR, name) for name in os.listdir(CHART_CACHE_DIR) if name.endswith('.png')]
+    if len(files) > CHART_CACHE_MAX_FILES:
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - CHART_CACHE_MAX_FILES]:
+            os.remove(path)
+
+def save_figure(figure, path):
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    figure.savefig(temp_path, format='png', dpi=100)
+    os.replace(temp_path, path)
+    prune_chart_cache()
+    return path
+
+# Turn (timestamp, change) rows into datetime64 and int arrays without touching single points in Python
+def to_series(rows):
+    timestamps, changes = zip(*rows)
+    return np.array(timestamps, dtype='datetime64[s]'), np.array(changes, dtype=np.int64)
+
+# Render one player's trophy progression over a date range. With current_trophies the
+# curve is anchored to the live trophy count, otherwise it shows the net change.
+def render_player_chart(tag, name, start_date, end_date, current_trophies=None):
+    conn = connect_db()
+    rows = fetch_player_events(conn, tag, start_date, end_date)
+    conn.close()
+    if not rows:
+        return None
+
+    path = chart_cache_path('player', tag, rows[0][0], rows[-1][0], len(rows), current_trophies)
+    if os.path.exists(path):
+        return path
+
+    times, changes = to_series(rows)
+    progression = np.cumsum(changes)
+    if current_trophies is not None:
+        progression += current_trophies - progression[-1]
+    attacks = changes > 0
+
+    figure = Figure(figsize=(8, 4))
+    ax = figure.add_subplot()
+    ax.step(times, progression, where='post', color='#455a64', linewidth=1.2)
+    ax.scatter(times[attacks], progression[attacks], color=ATTACK_COLOR, s=14, label='Attack')
+    ax.scatter(times[~attacks], progression[~attacks], color=DEFEND_COLOR, s=14, label='Defend')
+    ax.set_title(f"{name} ({tag}) {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}")
+    ax.set_ylabel('Trophies' if current_trophies is not None else 'Net trophies')
+    ax.grid(alpha=0.3)
+    ax.legend(loc='upper left')
+    figure.autofmt_xdate()
+    return save_figure(figure, path)
+
+# Render the cumulative net trophy change of the given members over one day
+def render_clan_chart(members, day):
+    names = {member['tag']: member['name'] for member in members}
+    conn = connect_db()
+    rows = fetch_day_events(conn, list(names), day)
+    conn.close()
+    if not rows:
+        return None
+
+    path = chart_cache_path('clan', day.isoformat(), tuple(names), rows[-1][1], len(rows))
+    if os.path.exists(path):
+        return path
+
+    tags, timestamps, changes = zip(*rows)
+    times = np.array(timestamps, dtype='datetime64[s]')
+    changes = np.array(changes, dtype=np.int64)
+    # Per-player running totals: one global cumsum minus the total reached before each group starts
+    unique_tags, starts, counts = np.unique(np.array(tags), return_index=True, return_counts=True)
+    running = np.cumsum(changes)
+    running -= np.repeat(running[starts] - changes[starts], counts)
+
+    figure = Figure(figsize=(10, 5))
+    ax = figure.add_subplot()
+    for tag, group_times, group_running in zip(unique_tags, np.split(times, starts[1:]), np.split(running, starts[1:])):
+        ax.step(group_times, group_running, where='post', linewidth=1.2, label=names[tag][:15])
+    ax.axhline(0, color='#9e9e9e', linewidth=0.8)
+    ax.set_title(f"Clan trophy progression {day:%Y-%m-%d}")
+    ax.set_ylabel('Net trophies')
+    ax.grid(alpha=0.3)
+    ax.legend(loc='upper left', fontsize='small', ncol=3)
+    figure.autofmt_xdate()
+    return save_figure(figure, path)
@@ -1,24 +1,99 @@
 import requests
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import API_RESPONSES, API_SECONDS
+from .profiling import stage
+
+logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv('API_KEY')
 CLAN_TAG = os.getenv('CLAN_TAG')
+# COC_API_BASE points the bot at a proxy or a local stand-in of the API
+API_BASE_URL = os.getenv('COC_API_BASE', 'https://api.clashofclans.com/v1').rstrip('/')
+
+# Seconds to connect and to wait for each read. A hung request ends in its worker thread
+# instead of outliving the tenant cycle that was abandoned waiting for it.
+API_TIMEOUT = (3.05, float(os.getenv('COC_API_TIMEOUT', '10')))
+# A batch of player lookups gives up after two read timeouts; lookups still queued are cancelled
+PLAYER_BATCH_TIMEOUT = 2 * API_TIMEOUT[1]
+
+# Shared session so repeated calls reuse the HTTPS connection
+session = requests.Session()
+# Worker threads for batched player lookups
+lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='coc-lookup')
 
-def fetch_top_clan_trophies():
-    logging.info("Fetching clan trophies...")
-    url = f"https://api.clashofclans.com/v1/clans/{CLAN_TAG.replace('#', '%23')}"
+# GET an API path, recording its latency and status under the given endpoint name
+def api_get(endpoint, path, params=None):
     headers = {'Authorization': f'Bearer {API_KEY}'}
-    
+    status = 'error'
+    started = time.perf_counter()
+    try:
+        with stage('fetch'):
+            response = session.get(f"{API_BASE_URL}{path}", headers=headers, params=params, timeout=API_TIMEOUT)
+        status = str(response.status_code)
+        return response
+    finally:
+        API_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+        API_RESPONSES.labels(endpoint, status).inc()
+
+# Fetch every clan member sorted by trophies in descending order
+def fetch_clan_members(clan_tag=None):
+    clan_tag = clan_tag or CLAN_TAG
+    logger.info("Fetching clan trophies for %s...", clan_tag)
+    try:
+        response = api_get('clan', f"/clans/{clan_tag.replace('#', '%23')}")
+        response.raise_for_status()
+        logger.debug("Successfully fetched data from API.")
+        with stage('parse'):
+            data = response.json()
+            members = data.get('memberList', [])
+            return sorted(members, key=lambda member: member['trophies'], reverse=True)
+    except requests.exceptions.RequestException as e:
+        logger.error("Request error: %s", e)
+        return None
+
+def fetch_top_clan_trophies(clan_tag=None):
+    members = fetch_clan_members(clan_tag)
+    return members[:25] if members is not None else None
+
+def fetch_player(tag):
+    try:
+        response = api_get('player', f"/players/{tag.replace('#', '%23')}")
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error("Request error for player %s: %s", tag, e)
+        return None
+
+# Fetch several players concurrently; the batch takes about as long as the slowest lookup,
+# and at most PLAYER_BATCH_TIMEOUT, after which the players answered so far are returned
+def fetch_players(tags):
+    players = {}
+    try:
+        for tag, player in zip(tags, lookup_pool.map(fetch_player, tags, timeout=PLAYER_BATCH_TIMEOUT)):
+            if player is not None:
+                players[tag] = player
+    except TimeoutError:
+        logger.error("Player lookups exceeded %.0fs; %d of %d players fetched.", PLAYER_BATCH_TIMEOUT, len(players), len(tags))
+    return players
+
+# Fetch a player ranking; location_id is a numeric location id or 'global'
+def fetch_location_rankings(location_id, limit=200):
+    try:
+        response = api_get('rankings', f"/locations/{location_id}/rankings/players", params={'limit': limit})
+        response.raise_for_status()
+        return response.json().get('items', [])
+    except requests.exceptions.RequestException as e:
+        logger.error("Request error for location %s rankings: %s", location_id, e)
+        return None
+
+def fetch_location(location_id):
     try:
-        response = requests.get(url, headers=headers)
+        response = api_get('location', f"/locations/{location_id}")
         response.raise_for_status()
-        logging.debug("Successfully fetched data from API.")
-        data = response.json()
-        members = data.get('memberList', [])
-        sorted_members = sorted(members, key=lambda member: member['trophies'], reverse=True)
-        top_members = sorted_members[:25]
-        return top_members
+        return response.json()
     except requests.exceptions.RequestException as e:
-        logging.error(f"Request error: {e}")
+        logger.error("Request error for location %s: %s", location_id, e)
         return None
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+from .logs import LOG_FORMAT, LOG_SAMPLE, parse_sampling
+
+# Settings that must be present for the bot to start
+REQUIRED_SETTINGS = ('TELEGRAM_TEST_TOKEN', 'API_KEY')
+INTEGER_SETTINGS = (
+    'CONCURRENT_UPDATES', 'SHARDS', 'WEBHOOK_PORT', 'METRICS_PORT', 'NOTIFY_TOP_N', 'RANKING_REFRESH_MINUTES',
+    'CHART_CACHE_MAX_FILES', 'ANOMALY_WINDOW_MINUTES', 'ANOMALY_LOSS_THRESHOLD', 'ANOMALY_PERFECT_DEFENSES',
+)
+FLOAT_SETTINGS = (
+    'TELEGRAM_SEND_RATE', 'LEASE_TTL_SECONDS', 'LEASE_RENEW_SECONDS', 'TENANT_CYCLE_TIMEOUT',
+    'SINGLEFLIGHT_TTL_SECONDS', 'ANOMALY_ZSCORE', 'SLOW_CYCLE_SECONDS', 'PROFILE_SAMPLE_MS',
+    'COC_API_TIMEOUT',
+)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+def parse_number(name, kind, errors):
+    value = os.getenv(name)
+    if value is None:
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        errors.append(f"{name} must be a{'n integer' if kind is int else ' number'}, got {value!r}.")
+
+def validate_tenants_file(path, errors):
+    try:
+        with open(path, encoding='utf-8') as tenants_file:
+            configs = json.load(tenants_file)
+    except (OSError, ValueError) as e:
+        errors.append(f"TENANTS_FILE {path} cannot be read: {e}")
+        return
+    if not isinstance(configs, list) or not configs:
+        errors.append(f"TENANTS_FILE {path} must contain a non-empty JSON list.")
+        return
+    for position, config in enumerate(configs, start=1):
+        if not isinstance(config, dict) or not config.get('clan_tag'):
+            errors.append(f"TENANTS_FILE entry {position} needs a clan_tag.")
+
+# Check the environment using only the standard library, so a misconfigured deploy fails
+# in milliseconds instead of after the Telegram and scheduler stacks are loaded.
+# Returns a list of problems; empty when the configuration is usable.
+def validate_config():
+    errors = [f"{name} is not set." for name in REQUIRED_SETTINGS if not os.getenv(name)]
+    if os.getenv('TENANTS_FILE'):
+        validate_tenants_file(os.getenv('TENANTS_FILE'), errors)
+    elif not os.getenv('CLAN_TAG'):
+        errors.append("Set CLAN_TAG, or TENANTS_FILE to track several clans.")
+
+    for name in INTEGER_SETTINGS:
+        parse_number(name, int, errors)
+    numbers = {name: parse_number(name, float, errors) for name in FLOAT_SETTINGS}
+    ttl, renew = numbers['LEASE_TTL_SECONDS'] or 30, numbers['LEASE_RENEW_SECONDS'] or 10
+    if renew >= ttl:
+        errors.append("LEASE_RENEW_SECONDS must be shorter than LEASE_TTL_SECONDS.")
+    # A cycle makes one clan request and one batch of player lookups, up to three read timeouts
+    api_timeout, cycle_timeout = numbers['COC_API_TIMEOUT'] or 10, numbers['TENANT_CYCLE_TIMEOUT'] or 40
+    if 3 * api_timeout + 3.05 >= cycle_timeout:
+        errors.append("Three COC_API_TIMEOUT reads plus the 3 s connect timeout must fit in TENANT_CYCLE_TIMEOUT.")
+    if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+        errors.append(f"LOG_LEVEL must be one of DEBUG, INFO, WARNING, ERROR, got {LOG_LEVEL!r}.")
+    if LOG_FORMAT not in ('text', 'json'):
+        errors.append(f"LOG_FORMAT must be text or json, got {LOG_FORMAT!r}.")
+    try:
+        parse_sampling(LOG_SAMPLE)
+    except ValueError:
+        errors.append(f"LOG_SAMPLE must look like logger=N,other.logger=M, got {LOG_SAMPLE!r}.")
+    return errors
@@ -1,30 +1,64 @@
+import os
 import sqlite3
-from datetime import datetime
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+from .metrics import DB_SECONDS
+
+DB_PATH = os.getenv('DB_PATH', 'clash_of_clans.db')
+# Database of the tenant the current task works for. Each scheduler job and update handler
+# runs in its own task, so setting it there does not leak into other tenants' work.
+tenant_db_path = ContextVar('tenant_db_path', default=None)
+
+def connect_db():
+    return sqlite3.connect(tenant_db_path.get() or DB_PATH)
+
+# Database shared by all tenants, for data that is not per clan such as subscriptions
+def connect_shared_db():
+    return sqlite3.connect(DB_PATH)
 
 def init_db_for_date(date_str):
-    conn = sqlite3.connect('clash_of_clans.db')
+    conn = connect_db()
     cursor = conn.cursor()
     cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS player_events_{date_str} (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tag TEXT, name TEXT, date DATE, time TEXT, event_type TEXT, trophy_change INTEGER
+        tag TEXT, name TEXT, date DATE, time TEXT, event_type TEXT, trophy_change INTEGER,
+        inferred INTEGER DEFAULT 0 -- 1 when split out of a merged delta rather than observed directly
     )''')
     cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS player_stats_{date_str} (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         tag TEXT, name TEXT, date DATE, total_attacks INTEGER, total_defends INTEGER, net_gain INTEGER
     )''')
+    create_event_index(conn, date_str)
     conn.commit()
     return conn
 
-def record_event(conn, date_str, tag, name, datetime, event_type, trophy_change):
+# Index events by (tag, date) so per-player lookups and range scans avoid full table scans
+def create_event_index(conn, date_str):
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_player_events_{date_str}_tag_date ON player_events_{date_str} (tag, date)')
+
+# Bring event tables created by older versions up to date: add the (tag, date) index
+# and the inferred column
+def upgrade_event_tables():
+    conn = connect_db()
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'player_events_%'").fetchall():
+        create_event_index(conn, name[len('player_events_'):])
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({name})')}
+        if 'inferred' not in columns:
+            conn.execute(f'ALTER TABLE {name} ADD COLUMN inferred INTEGER DEFAULT 0')
+    conn.commit()
+    conn.close()
+
+def record_event(conn, date_str, tag, name, datetime, event_type, trophy_change, inferred=False):
     cursor = conn.cursor()
     trophy_change = -trophy_change if event_type == 'defend' else trophy_change
     date = datetime.date()
     time = datetime.strftime('%H:%M:%S')
     cursor.execute(f'''
-    INSERT INTO player_events_{date_str} (tag, name, date, time, event_type, trophy_change)
-    VALUES (?, ?, ?, ?, ?, ?)''', (tag, name, date, time, event_type, trophy_change))
+    INSERT INTO player_events_{date_str} (tag, name, date, time, event_type, trophy_change, inferred)
+    VALUES (?, ?, ?, ?, ?, ?, ?)''', (tag, name, date, time, event_type, trophy_change, int(inferred)))
     conn.commit()
     update_daily_stats(conn, date_str, tag, name, date)
 
@@ -43,3 +77,69 @@ def update_daily_stats(conn, date_str, tag, name, date):
         INSERT OR REPLACE INTO player_stats_{date_str} (tag, name, date, total_attacks, total_defends, net_gain)
         VALUES (?, ?, ?, ?, ?, ?)''', (tag, name, date, total_attacks, total_defends, net_gain))
     conn.commit()
+
+# Record a whole cycle's events in one transaction. events holds
+# (tag, name, datetime, event_type, trophy_change, inferred) tuples; stats are rebuilt
+# once per affected player instead of once per event.
+def record_events(conn, date_str, events):
+    if not events:
+        return
+    started = time.perf_counter()
+    rows = [
+        (tag, name, when.date(), when.strftime('%H:%M:%S'), event_type,
+         -trophy_change if event_type == 'defend' else trophy_change, int(inferred))
+        for tag, name, when, event_type, trophy_change, inferred in events
+    ]
+    conn.executemany(f'''
+    INSERT INTO player_events_{date_str} (tag, name, date, time, event_type, trophy_change, inferred)
+    VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+
+    for date in {row[2] for row in rows}:
+        tags = list({row[0] for row in rows if row[2] == date})
+        for offset in range(0, len(tags), 500):
+            chunk = tags[offset:offset + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            conn.execute(f'DELETE FROM player_stats_{date_str} WHERE date = ? AND tag IN ({placeholders})', (date, *chunk))
+            conn.execute(f'''
+            INSERT INTO player_stats_{date_str} (tag, name, date, total_attacks, total_defends, net_gain)
+            SELECT tag, MAX(name), date,
+                   COUNT(CASE WHEN event_type = 'attack' THEN 1 END),
+                   COUNT(CASE WHEN event_type = 'defend' THEN 1 END),
+                   SUM(trophy_change)
+            FROM player_events_{date_str}
+            WHERE date = ? AND tag IN ({placeholders})
+            GROUP BY tag, date''', (date, *chunk))
+    written = time.perf_counter()
+    conn.commit()
+    DB_SECONDS.labels('write').observe(written - started)
+    DB_SECONDS.labels('commit').observe(time.perf_counter() - written)
+
+# Yield (date, date_str) for every day in the inclusive range that has an events table
+def event_days_between(conn, start_date, end_date):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'player_events_%'")}
+    day = start_date
+    while day <= end_date:
+        date_str = day.strftime('%m%d')
+        if f"player_events_{date_str}" in existing:
+            yield day, date_str
+        day += timedelta(days=1)
+
+# Fetch (timestamp, trophy_change) rows for one player across a date range in event order
+def fetch_player_events(conn, tag, start_date, end_date):
+    rows = []
+    for day, date_str in event_days_between(conn, start_date, end_date):
+        rows.extend(conn.execute(
+            f"SELECT date || 'T' || time, trophy_change FROM player_events_{date_str} WHERE tag = ? AND date = ? ORDER BY id",
+            (tag, day)))
+    return rows
+
+# Fetch (tag, timestamp, trophy_change) rows for several players on one day, grouped by tag
+def fetch_day_events(conn, tags, day):
+    date_str = day.strftime('%m%d')
+    if not any(True for _ in event_days_between(conn, day, day)):
+        return []
+    placeholders = ', '.join('?' for _ in tags)
+    return conn.execute(
+        f"SELECT tag, date || 'T' || time, trophy_change FROM player_events_{date_str} "
+        f"WHERE date = ? AND tag IN ({placeholders}) ORDER BY tag, id",
+        (day, *tags)).fetchall()
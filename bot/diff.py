@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class MemberSnapshot:
+    tag: str
+    name: str
+    trophies: int
+    rank: int
+
+@dataclass(frozen=True)
+class TrophyChange:
+    member: MemberSnapshot
+    previous_trophies: int
+
+    @property
+    def delta(self):
+        return self.member.trophies - self.previous_trophies
+
+@dataclass(frozen=True)
+class MemberJoined:
+    member: MemberSnapshot
+
+@dataclass(frozen=True)
+class MemberLeft:
+    member: MemberSnapshot
+
+@dataclass(frozen=True)
+class MemberRenamed:
+    member: MemberSnapshot
+    previous_name: str
+
+@dataclass(frozen=True)
+class RankChanged:
+    member: MemberSnapshot
+    previous_rank: int
+
+    # Whether the move takes the member into or out of the top n
+    def crosses(self, n):
+        return (self.previous_rank <= n) != (self.member.rank <= n)
+
+# Build a tag -> snapshot mapping from an API member list sorted by trophies
+def snapshot_roster(members):
+    return {
+        member['tag']: MemberSnapshot(member['tag'], member['name'], member['trophies'], rank)
+        for rank, member in enumerate(members, start=1)
+    }
+
+# Compare two full rosters in one pass over each mapping and return typed change records
+def diff_rosters(previous, current):
+    records = []
+    for tag, member in current.items():
+        before = previous.get(tag)
+        if before is None:
+            records.append(MemberJoined(member))
+            continue
+        if member.name != before.name:
+            records.append(MemberRenamed(member, before.name))
+        if member.trophies != before.trophies:
+            records.append(TrophyChange(member, before.trophies))
+        if member.rank != before.rank:
+            records.append(RankChanged(member, before.rank))
+    for tag in previous.keys() - current.keys():
+        records.append(MemberLeft(previous[tag]))
+    return records
+
+# Holds the last roster snapshot. Each apply() swaps in the new snapshot, so state for
+# members who left is dropped along with the old mapping.
+class RosterState:
+    def __init__(self):
+        self.members = {}
+
+    # Diff against the stored roster without moving it; commit the snapshot once the
+    # records have been handled, so an abandoned cycle is diffed again on the next one
+    def diff(self, members):
+        current = snapshot_roster(members)
+        # The first snapshot is only a baseline; reporting the whole clan as joined would be noise
+        return current, diff_rosters(self.members, current) if self.members else []
+
+    def commit(self, current):
+        self.members = current
+
+    def apply(self, members):
+        current, records = self.diff(members)
+        self.commit(current)
+        return records
@@ -0,0 +1,100 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import zipfile
+from datetime import date
+from .coc_api import CLAN_TAG
+from .database import connect_db, event_days_between
+from .subscriptions import normalize_tag
+
+EVENT_COLUMNS = ('clan', 'date', 'time', 'tag', 'name', 'event_type', 'trophy_change', 'inferred')
+STATS_COLUMNS = ('clan', 'date', 'tag', 'name', 'total_attacks', 'total_defends', 'net_gain')
+
+# Stream event rows for a date range straight from the day tables' cursors, one row at a time
+def iter_events(conn, start_date, end_date, clan_tag):
+    for day, date_str in event_days_between(conn, start_date, end_date):
+        cursor = conn.execute(
+            f"SELECT date, time, tag, name, event_type, trophy_change, inferred FROM player_events_{date_str} WHERE date = ? ORDER BY id", (day,))
+        for row in cursor:
+            yield (clan_tag, *row)
+
+def iter_stats(conn, start_date, end_date, clan_tag):
+    for day, date_str in event_days_between(conn, start_date, end_date):
+        cursor = conn.execute(
+            f"SELECT date, tag, name, total_attacks, total_defends, net_gain FROM player_stats_{date_str} WHERE date = ? ORDER BY tag", (day,))
+        for row in cursor:
+            yield (clan_tag, *row)
+
+TABLES = {
+    'events': (EVENT_COLUMNS, iter_events),
+    'stats': (STATS_COLUMNS, iter_stats),
+}
+
+def write_rows(stream, columns, rows, fmt):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            stream.write('\n')
+            count += 1
+    return count
+
+# Export a date range to path. A .zip path gets both events and stats as members; any
+# other path receives the single `table`, gzip-compressed when it ends in .gz. Rows are
+# streamed through, so memory use does not depend on the size of the range.
+def export_range(path, start_date, end_date, fmt='csv', table='events', clan_tag=None):
+    clan_tag = clan_tag or CLAN_TAG
+    extension = 'csv' if fmt == 'csv' else 'jsonl'
+    conn = connect_db()
+    counts = {}
+    try:
+        if path.endswith('.zip'):
+            with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for name, (columns, iterator) in TABLES.items():
+                    with archive.open(f"{name}.{extension}", 'w', force_zip64=True) as member:
+                        stream = io.TextIOWrapper(member, encoding='utf-8', newline='')
+                        counts[name] = write_rows(stream, columns, iterator(conn, start_date, end_date, clan_tag), fmt)
+                        stream.flush()
+        else:
+            columns, iterator = TABLES[table]
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'wt', encoding='utf-8', newline='') as stream:
+                counts[table] = write_rows(stream, columns, iterator(conn, start_date, end_date, clan_tag), fmt)
+    finally:
+        conn.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Export recorded events and daily stats for a date range.")
+    parser.add_argument('--start', type=date.fromisoformat, required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today(), help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument('--format', choices=('csv', 'json'), default='csv', help="csv or JSON lines (default: csv)")
+    parser.add_argument('--table', choices=tuple(TABLES), default='events', help="table for non-.zip outputs (default: events)")
+    parser.add_argument('--clan', default=CLAN_TAG, help="clan to export, written into every row (default: CLAN_TAG)")
+    parser.add_argument('-o', '--output', required=True, help="output file: .zip for events and stats, .gz to compress a single table")
+    args = parser.parse_args()
+
+    # With a tenant list, read the store of the requested clan
+    from .tenants import TENANTS_FILE, load_tenants
+    if TENANTS_FILE and args.clan:
+        tenant = load_tenants().by_clan.get(normalize_tag(args.clan))
+        if tenant is None:
+            parser.error(f"{args.clan} is not listed in {TENANTS_FILE}")
+        tenant.activate()
+
+    counts = export_range(args.output, args.start, args.end, args.format, args.table, args.clan)
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+    print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,52 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
+import html
+import itertools
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
 from telegram.ext import ContextTypes
-from .coc_api import fetch_top_clan_trophies
+from telegram.constants import ParseMode
+from .coc_api import fetch_clan_members
+from .database import connect_db, init_db_for_date
+from .history import day_summaries, format_clan_history, format_player_history, paginate_lines
+from .keyboards import PAGE_PREFIX, STATUS_PREFIX
+from .notifier import send_photo_to_all
+from .profiling import format_recent_cycles
+from .projection import format_projection
+from .rankings import format_age
+from .search import SEARCH_LIMIT
+from .subscriptions import CLAN, PLAYER, normalize_tag, subscribe, unsubscribe
+from .utils import format_trophy_table, create_status_table_html
+
+logger = logging.getLogger(__name__)
+
+# Telegram user ids allowed to use the debugging commands
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+
+# The tenant whose clan the update's chat follows, with its database selected for this handler
+def chat_tenant(update, context):
+    return context.bot_data['tenants'].for_chat(update.effective_chat.id).activate()
+
+# Fetch the roster, refresh the keyboard cache and return the top 25 table with the first member page
+async def load_trophy_overview(tenant):
+    members = await asyncio.to_thread(fetch_clan_members, tenant.clan_tag)
+    if not members:
+        return None
+    tenant.keyboards.update(members)
+    return format_trophy_table(members[:25]), tenant.keyboards.markup(0)
+
+# Simultaneous "Check Trophy" requests share one fetch and render, and requests within the
+# freshness window reuse the last result
+async def trophy_overview(tenant):
+    overview = await tenant.singleflight.do('trophy_overview', load_trophy_overview, tenant)
+    return overview or (None, None)
 
 async def check_trophy(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    top_members = fetch_top_clan_trophies()
-    if top_members:
-        keyboard = [[InlineKeyboardButton(f"{member['name']} ({member['tag']})", callback_data=f"status_{member['tag']}")] for member in top_members]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("Top 25 Clan Members", reply_markup=reply_markup)
+    trophy_list_message, reply_markup = await trophy_overview(chat_tenant(update, context))
+    if trophy_list_message:
+        await update.message.reply_text(trophy_list_message, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
     else:
         await update.message.reply_text("Failed to fetch top clan members.")
 
@@ -15,3 +54,273 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [[InlineKeyboardButton("Check Trophy", callback_data='check_trophy')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text('Welcome! Use the buttons or commands to interact:', reply_markup=reply_markup)
+
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    tenant = chat_tenant(update, context)
+
+    if query.data == 'check_trophy':
+        trophy_list_message, reply_markup = await trophy_overview(tenant)
+        if trophy_list_message:
+            await context.bot.send_message(chat_id=query.message.chat_id, text=trophy_list_message, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+        else:
+            await query.message.reply_text("Failed to fetch top clan members.")
+
+    elif query.data.startswith(PAGE_PREFIX):
+        # Page flips reuse the cached roster instead of calling the API again
+        keyboards = tenant.keyboards
+        if not keyboards.members:
+            keyboards.update(await asyncio.to_thread(fetch_clan_members, tenant.clan_tag) or [])
+        reply_markup = keyboards.markup(int(query.data[len(PAGE_PREFIX):]))
+        if reply_markup != query.message.reply_markup:
+            await query.edit_message_reply_markup(reply_markup=reply_markup)
+
+    elif query.data.startswith(STATUS_PREFIX):
+        tag = query.data[len(STATUS_PREFIX):]
+        logger.debug("Checking status for player with tag: %s", tag)
+        await query.message.reply_text(status_table(tenant, tag), parse_mode=ParseMode.HTML)
+
+# Today's status table for one player
+def status_table(tenant, tag):
+    current_date = tenant.now().date()
+    date_str = current_date.strftime('%m%d')
+    conn = init_db_for_date(date_str)
+    response_message = create_status_table_html(conn, tag, current_date, date_str)
+    conn.close()
+    return response_message
+
+# /status <player_tag | partial name> answers directly for a tag or a single match and
+# offers the matching members as buttons otherwise
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text('Usage: /status <player_tag or name>')
+        return
+
+    tenant = chat_tenant(update, context)
+    names = tenant.names
+    query = ' '.join(context.args)
+    matches = [normalize_tag(query)] if query.startswith('#') else names.search(query)
+    if not matches:
+        await update.message.reply_text(f"No clan member matches \"{query}\".")
+    elif len(matches) == 1:
+        await update.message.reply_text(status_table(tenant, matches[0]), parse_mode=ParseMode.HTML)
+    else:
+        keyboard = [[InlineKeyboardButton(f"{names.names[tag]} ({tag})", callback_data=f"{STATUS_PREFIX}{tag}")] for tag in matches]
+        await update.message.reply_text("Several members match, pick one:", reply_markup=InlineKeyboardMarkup(keyboard))
+
+# One-line summary of a member from memory: trophies, rank and today's attacks/defenses
+def member_summary(tenant, tag):
+    day_state = tenant.day_state
+    member = tenant.roster.members.get(tag)
+    row = day_state.index.get(tag)
+    today = f", today {day_state.attacks[row]} attacks / {day_state.defends[row]} defenses ({day_state.net[row]:+d})" if row is not None else ""
+    name = html.escape(member.name if member else tenant.names.names.get(tag, tag))
+    trophies = f": #{member.rank} with {member.trophies} trophies" if member else ""
+    return f"<b>{name}</b> (<code>{html.escape(tag)}</code>){trophies}{today}"
+
+# Inline queries (@bot name) list matching members of every tracked clan without touching
+# the database or the API
+async def inline_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    results = [
+        InlineQueryResultArticle(
+            id=tag,
+            title=f"{tenant.names.names[tag]} ({tag})",
+            description=", ".join(tenant.names.history.get(tag, [])[-3:]) or None,
+            input_message_content=InputTextMessageContent(member_summary(tenant, tag), parse_mode=ParseMode.HTML),
+        )
+        for tenant in context.bot_data['tenants']
+        for tag in tenant.names.search(update.inline_query.query)
+    ][:SEARCH_LIMIT]
+    await update.inline_query.answer(results, cache_time=30)
+
+# Parse "/subscribe clan [#CLANTAG]" or "/subscribe #PLAYERTAG" into a (kind, tag) pair;
+# a bare "clan" means the clan of the chat's tenant
+def parse_subscription_args(args, tenant):
+    if not args or args[0].lower() == CLAN:
+        return CLAN, normalize_tag(args[1]) if len(args) > 1 else tenant.clan_tag
+    return PLAYER, normalize_tag(args[0])
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    kind, tag = parse_subscription_args(context.args, chat_tenant(update, context))
+    subscribe(context.bot_data['subscriptions'], update.effective_chat.id, kind, tag)
+    await update.message.reply_text(f"Subscribed to {kind} {tag}.")
+
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    kind, tag = parse_subscription_args(context.args, chat_tenant(update, context))
+    if unsubscribe(context.bot_data['subscriptions'], update.effective_chat.id, kind, tag):
+        await update.message.reply_text(f"Unsubscribed from {kind} {tag}.")
+    else:
+        await update.message.reply_text(f"This chat is not subscribed to {kind} {tag}.")
+
+async def list_subscriptions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    subscriptions = context.bot_data['subscriptions'].subscriptions_for(update.effective_chat.id)
+    if not subscriptions:
+        await update.message.reply_text("This chat has no subscriptions. Use /subscribe clan or /subscribe <player_tag>.")
+        return
+    lines = [f"{kind}: {tag}" for kind, tag in subscriptions]
+    await update.message.reply_text("Subscriptions:\n" + "\n".join(lines))
+
+# /chart <player_tag> [days] renders the player's trophy progression over the last days
+async def chart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text('Please provide a player tag. Usage: /chart <player_tag> [days]')
+        return
+
+    tag = normalize_tag(context.args[0])
+    days = min(max(int(context.args[1]), 1), 62) if len(context.args) > 1 and context.args[1].isdigit() else 7
+    tenant = chat_tenant(update, context)
+    end_date = tenant.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    member = tenant.roster.members.get(tag)
+    name = member.name if member else tag
+    trophies = member.trophies if member else None
+    # matplotlib is only loaded once someone asks for a chart
+    from .charts import render_player_chart
+    path = await asyncio.to_thread(render_player_chart, tag, name, start_date, end_date, trophies)
+    if path is None:
+        await update.message.reply_text(f"No events recorded for {tag} in the last {days} days.")
+        return
+    await send_photo_to_all(context.bot, [update.effective_chat.id], path)
+
+# /history [player_tag] [days] sends day-by-day attack/defend/net summaries for one player,
+# or for the whole clan without a tag, split over as many messages as needed
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args = list(context.args)
+    tag = normalize_tag(args.pop(0)) if args and not args[0].isdigit() else None
+    days = min(max(int(args[0]), 1), 62) if args and args[0].isdigit() else 7
+    end_date = chat_tenant(update, context).now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
+    # The range scans run in a worker thread so polling and other updates keep going
+    pages = await asyncio.to_thread(history_pages, start_date, end_date, days, tag)
+    if not pages:
+        subject = tag or 'the clan'
+        await update.message.reply_text(f"No events recorded for {subject} in the last {days} days.")
+        return
+    for page in pages:
+        await update.message.reply_text(page, parse_mode=ParseMode.HTML)
+
+# Pages of /history, or an empty list when nothing was recorded in the range
+def history_pages(start_date, end_date, days, tag=None):
+    conn = connect_db()
+    try:
+        summaries = day_summaries(conn, start_date, end_date, tag)
+        first = next(summaries, None)
+        if first is None:
+            return []
+        summaries = itertools.chain([first], summaries)
+        if tag:
+            title = f"<b>History for {html.escape(first[2])} ({html.escape(tag)}), last {days} days</b>"
+            lines = format_player_history(summaries)
+        else:
+            title = f"<b>Clan history, last {days} days</b> (name, attacks, defends, net)"
+            lines = format_clan_history(summaries)
+        return list(paginate_lines(title, lines))
+    finally:
+        conn.close()
+
+# /season [days] summarizes attack/defense performance of every member over the last days
+async def season_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    days = min(max(int(context.args[0]), 1), 62) if context.args and context.args[0].isdigit() else 30
+    end_date = chat_tenant(update, context).now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
+    # Loading the range and the NumPy statistics run in a worker thread, like /history
+    pages = await asyncio.to_thread(season_pages, start_date, end_date)
+    if not pages:
+        await update.message.reply_text(f"No events recorded in the last {days} days.")
+        return
+    for page in pages:
+        await update.message.reply_text(page, parse_mode=ParseMode.HTML)
+
+# Pages of the /season report, or an empty list when nothing was recorded in the range
+def season_pages(start_date, end_date):
+    from .analytics import compute_season_stats, format_season_report, load_season
+    conn = connect_db()
+    try:
+        events = load_season(conn, start_date, end_date)
+    finally:
+        conn.close()
+    if events is None:
+        return []
+    title = f"<b>Season report {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}</b>"
+    return list(paginate_lines(title, format_season_report(events, compute_season_stats(events))))
+
+# /check_global_ranking <player_tag> answers from the locally cached rankings
+async def check_player_global_ranking(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text('Please provide a player tag. Usage: /check_global_ranking <player_tag>')
+        return
+
+    rankings = context.bot_data['rankings']
+    if rankings.refreshed_at is None:
+        await update.message.reply_text("Rankings have not been loaded yet, please try again in a minute.")
+        return
+
+    tag = normalize_tag(context.args[0])
+    age = format_age(rankings.age_seconds)
+    matches = rankings.lookup(tag)
+    if not matches:
+        await update.message.reply_text(f"{tag} is not in the cached rankings. (Rankings updated {age} ago)")
+        return
+
+    name = matches[0][1]['name']
+    lines = [f"{name} ({tag})"]
+    lines += [f"{location}: #{entry['rank']} with {entry['trophies']} trophies" for location, entry in matches]
+    lines.append(f"(Rankings updated {age} ago)")
+    await update.message.reply_text("\n".join(lines))
+
+# /projection shows every member's projected end-of-day trophies from in-memory state only
+async def projection_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    projection = chat_tenant(update, context).projector.project()
+    if not projection['names']:
+        await update.message.reply_text("No roster loaded yet, please try again after the next trophy check.")
+        return
+    title = "<b>Projected end-of-day trophies</b> (A/D = attacks/defenses used today)"
+    for page in paginate_lines(title, format_projection(projection)):
+        await update.message.reply_text(page, parse_mode=ParseMode.HTML)
+
+# /export [days] [csv|json] sends the events and daily stats of the last 7 (or `days`) days as a zip
+# archive. The archive is streamed to a temporary file off the event loop and removed after upload.
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args = list(context.args)
+    fmt = 'json' if 'json' in args else 'csv'
+    days = next((min(max(int(arg), 1), 62) for arg in args if arg.isdigit()), 7)
+    tenant = chat_tenant(update, context)
+    end_date = tenant.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
+    from .export import export_range
+    fd, path = tempfile.mkstemp(suffix='.zip')
+    os.close(fd)
+    try:
+        counts = await asyncio.to_thread(export_range, path, start_date, end_date, fmt, 'events', tenant.clan_tag)
+        if not counts.get('events'):
+            await update.message.reply_text(f"No events recorded in the last {days} days.")
+            return
+        filename = f"export_{start_date:%Y%m%d}_{end_date:%Y%m%d}.zip"
+        with open(path, 'rb') as document:
+            await update.message.reply_document(document, filename=filename,
+                                                caption=f"{counts['events']} events, {counts['stats']} daily stats rows")
+    finally:
+        os.remove(path)
+
+# /stats shows how many interactive requests were served by a shared fetch or a recent result
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    stats = chat_tenant(update, context).singleflight.stats
+    await update.message.reply_text(
+        f"Trophy checks: {stats['calls']} requests, {stats['executions']} fetches, "
+        f"{stats['coalesced']} joined an in-flight fetch, {stats['cached']} served from the last result")
+
+# /debug_last_cycles [n] shows the stage timings of the latest polling cycles and daily
+# resets of every tenant; admins only
+async def debug_last_cycles(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Channel posts and anonymous group admins come without a user
+    if update.effective_user is None or update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("This command is only available to bot admins.")
+        return
+    # Keeps the table within Telegram's 4096 character message limit
+    limit = min(int(context.args[0]), 40) if context.args and context.args[0].isdigit() else 10
+    table = format_recent_cycles(context.bot_data['tenants'], limit)
+    await update.message.reply_text(f"<pre>{html.escape(table)}</pre>", parse_mode=ParseMode.HTML)
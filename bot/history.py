@@ -0,0 +1,48 @@
+import html
+from .database import event_days_between
+
+# Telegram rejects messages over 4096 characters; leave room for the <pre> wrapper and header
+MESSAGE_LIMIT = 3800
+
+# Yield one summary row per player and day:
+# (day, tag, name, attacks, attack_trophies, defends, defend_trophies, net)
+def day_summaries(conn, start_date, end_date, tag=None):
+    tag_filter = 'AND tag = ?' if tag else ''
+    for day, date_str in event_days_between(conn, start_date, end_date):
+        params = (day, tag) if tag else (day,)
+        for row in conn.execute(f'''
+        SELECT tag, MAX(name),
+               SUM(event_type = 'attack'), SUM(CASE WHEN event_type = 'attack' THEN trophy_change ELSE 0 END),
+               SUM(event_type = 'defend'), SUM(CASE WHEN event_type = 'defend' THEN trophy_change ELSE 0 END),
+               SUM(trophy_change)
+        FROM player_events_{date_str}
+        WHERE date = ? {tag_filter}
+        GROUP BY tag
+        ORDER BY SUM(trophy_change) DESC''', params):
+            yield (day, *row)
+
+def format_player_history(summaries):
+    yield "Date  │ ATK      │ DEF      │ Net"
+    for day, _, _, attacks, attack_trophies, defends, defend_trophies, net in summaries:
+        yield f"{day:%m-%d} │ {attacks}x {attack_trophies:>+5} │ {defends}x {defend_trophies:>+5} │ {net:>+5}"
+
+def format_clan_history(summaries):
+    current_day = None
+    for day, _, name, attacks, attack_trophies, defends, defend_trophies, net in summaries:
+        if day != current_day:
+            current_day = day
+            yield f"── {day:%Y-%m-%d} ──"
+        yield f"{html.escape(name[:14]):<14} {attacks}x{attack_trophies:>+5} {defends}x{defend_trophies:>+5} {net:>+5}"
+
+# Group lines into <pre> pages that fit in one Telegram message, yielding each page as soon as it is full
+def paginate_lines(title, lines, limit=MESSAGE_LIMIT):
+    page = []
+    size = 0
+    for line in lines:
+        if page and size + len(line) + 1 > limit:
+            yield f"{title}\n<pre>" + "\n".join(page) + "</pre>"
+            page, size = [], 0
+        page.append(line)
+        size += len(line) + 1
+    if page:
+        yield f"{title}\n<pre>" + "\n".join(page) + "</pre>"
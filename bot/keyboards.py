@@ -0,0 +1,51 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+MEMBERS_PER_PAGE = 10
+
+# Callback payloads are kept short ("status_#TAG", "members_3") to stay far below
+# Telegram's 64-byte callback_data limit
+STATUS_PREFIX = 'status_'
+PAGE_PREFIX = 'members_'
+
+# Caches the member selection keyboard page by page. Built markups are reused until
+# the member set, their names or their ordering change; trophy updates that keep the
+# order intact do not invalidate anything.
+class MemberKeyboardCache:
+    def __init__(self, page_size=MEMBERS_PER_PAGE):
+        self.page_size = page_size
+        self.members = []
+        self.roster_key = None
+        self.pages = {}
+
+    def update(self, members):
+        roster_key = tuple((member['tag'], member['name']) for member in members)
+        if roster_key != self.roster_key:
+            self.roster_key = roster_key
+            self.members = list(members)
+            self.pages = {}
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.members) // self.page_size))
+
+    def markup(self, page=0):
+        page = min(max(page, 0), self.page_count - 1)
+        if page not in self.pages:
+            self.pages[page] = self._build_page(page)
+        return self.pages[page]
+
+    def _build_page(self, page):
+        start = page * self.page_size
+        keyboard = [
+            [InlineKeyboardButton(f"{idx}. {member['name']} ({member['tag']})", callback_data=f"{STATUS_PREFIX}{member['tag']}")]
+            for idx, member in enumerate(self.members[start:start + self.page_size], start=start + 1)
+        ]
+        if self.page_count > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(InlineKeyboardButton("◀ Prev", callback_data=f"{PAGE_PREFIX}{page - 1}"))
+            navigation.append(InlineKeyboardButton(f"{page + 1}/{self.page_count}", callback_data=f"{PAGE_PREFIX}{page}"))
+            if page < self.page_count - 1:
+                navigation.append(InlineKeyboardButton("Next ▶", callback_data=f"{PAGE_PREFIX}{page + 1}"))
+            keyboard.append(navigation)
+        return InlineKeyboardMarkup(keyboard)
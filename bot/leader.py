@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from .database import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+# A lease not renewed for LEASE_TTL_SECONDS is free for another replica to take. Renewing
+# every LEASE_RENEW_SECONDS keeps takeover within one 45 s polling interval.
+LEASE_TTL_SECONDS = float(os.getenv('LEASE_TTL_SECONDS', '30'))
+LEASE_RENEW_SECONDS = float(os.getenv('LEASE_RENEW_SECONDS', '10'))
+# Identifies this replica in the lease table. Exported so shard processes spawned from
+# this one hold leases under the same name.
+REPLICA_ID = os.environ.setdefault('REPLICA_ID', f"{socket.gethostname()}:{os.getpid()}")
+
+def init_leases_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY, holder TEXT, expires_at REAL
+    )''')
+    conn.commit()
+
+# Lease row in the shared database. Whoever holds it polls and notifies; everyone else
+# keeps serving interactive commands from the stored data.
+class Lease:
+    def __init__(self, name, holder=REPLICA_ID, ttl=LEASE_TTL_SECONDS):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.expires_at = 0.0
+
+    @property
+    def held(self):
+        return time.time() < self.expires_at
+
+    # Take or renew the lease. The upsert only overwrites a row that is ours or expired,
+    # so of two replicas racing for a free lease exactly one wins.
+    def acquire(self):
+        now = time.time()
+        conn = connect_shared_db()
+        init_leases_table(conn)
+        cursor = conn.execute('''
+            INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE leases.holder = excluded.holder OR leases.expires_at < ?''',
+            (self.name, self.holder, now + self.ttl, now))
+        conn.commit()
+        conn.close()
+        was_held = self.held
+        self.expires_at = now + self.ttl if cursor.rowcount == 1 else 0.0
+        if self.held != was_held:
+            logger.info("%s lease %s as %s.", 'Acquired' if self.held else 'Lost', self.name, self.holder)
+        return self.held
+
+    # Give the lease up on shutdown so a standby replica can take over right away
+    def release(self):
+        conn = connect_shared_db()
+        init_leases_table(conn)
+        conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (self.name, self.holder))
+        conn.commit()
+        conn.close()
+        self.expires_at = 0.0
+
+async def renew_leases(application):
+    for tenant in application.bot_data['tenants']:
+        try:
+            await asyncio.to_thread(tenant.lease.acquire)
+        except Exception as e:
+            # Without a successful renewal the lease simply runs out and polling stops
+            logger.error("Failed to renew lease %s: %s", tenant.lease.name, e)
+
+async def release_leases(application):
+    for tenant in application.bot_data['tenants']:
+        if tenant.lease.held:
+            await asyncio.to_thread(tenant.lease.release)
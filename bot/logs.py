@@ -0,0 +1,125 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# 'text' for people, 'json' for one object per line with tenant and cycle ids as fields
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Keep only 1 in N DEBUG records of chatty loggers, e.g. "bot.coc_api=20,telegram=50"
+LOG_SAMPLE = os.getenv('LOG_SAMPLE', '')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s%(context)s'
+
+# Clan of the tenant and id of the cycle the current task works for; set by Tenant.activate
+# and CycleTimer, and copied into every record logged from that task or its threads
+log_tenant = ContextVar('log_tenant', default=None)
+log_cycle = ContextVar('log_cycle', default=None)
+
+def parse_sampling(value):
+    rates = {}
+    for entry in value.split(','):
+        name, _, rate = entry.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = int(rate)
+    return rates
+
+# Runs in the thread that logs, before the record is queued: stamps the context ids on it
+class ContextFilter(logging.Filter):
+    def __init__(self, label=None):
+        super().__init__()
+        self.label = label
+
+    def filter(self, record):
+        record.tenant = log_tenant.get()
+        record.cycle = log_cycle.get()
+        record.process_label = self.label
+        parts = [part for part in (self.label, record.tenant, record.cycle and f"cycle={record.cycle}") if part]
+        record.context = f" [{' '.join(parts)}]" if parts else ''
+        return True
+
+# Drops all but 1 in N DEBUG records of the configured loggers and their children
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.resolved = {}
+        self.seen = {}
+
+    def rate_for(self, name):
+        rate = self.resolved.get(name)
+        if rate is None:
+            logger_name, rate = name, 1
+            while logger_name:
+                if logger_name in self.rates:
+                    rate = self.rates[logger_name]
+                    break
+                logger_name = logger_name.rpartition('.')[0]
+            self.resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        if rate <= 1:
+            return True
+        seen = self.seen.get(record.name, 0)
+        self.seen[record.name] = seen + 1
+        return seen % rate == 0
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in ('process_label', 'tenant', 'cycle'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field.replace('process_label', 'process')] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+# Resolves the message and traceback in the thread that logs, while the arguments are
+# still current, and leaves the layout to the listener's formatter
+class LogQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# Route every record through a queue to a background thread that formats and writes it,
+# so the event loop never blocks on stderr. Messages are only formatted for records that
+# pass the level and sampling filters. label names the process, e.g. "shard-1".
+def setup_logging(level, fmt=LOG_FORMAT, label=None, stream=None):
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = LogQueueHandler(records)
+    handler.addFilter(SamplingFilter(parse_sampling(LOG_SAMPLE)))
+    handler.addFilter(ContextFilter(label))
+
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
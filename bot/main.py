@@ -1,13 +1,44 @@
 import os
+import sys
 from dotenv import load_dotenv
-from bot.telegram_bot import create_bot
+
+# Load the .env file before the bot modules read their settings at import time
+load_dotenv()
+
+from bot.config import LOG_LEVEL, validate_config  # noqa: E402
+from bot.logs import setup_logging  # noqa: E402
 
 def main():
-    load_dotenv()
+    errors = validate_config()
+    if errors:
+        sys.exit("Invalid configuration:\n" + "\n".join(f"  - {error}" for error in errors))
+    setup_logging(LOG_LEVEL)
+
+    # The Telegram, scheduler and HTTP stacks are only imported once the configuration is known to be good
+    from bot.metrics import METRICS_PORT, start_metrics_server
+    from bot.sharding import SHARDS, attach_shards
+    from bot.telegram_bot import create_bot
+    from bot.tenants import load_tenants
+    from bot.webhook import webhook_enabled, webhook_settings
+
     token = os.getenv('TELEGRAM_TEST_TOKEN')
     chat_id = os.getenv('TELEGRAM_TEST_CHAT_ID')  # Load TELEGRAM_TEST_CHAT_ID
-    application = create_bot(token, chat_id)
-    application.run_polling()
+    concurrent_updates = int(os.getenv('CONCURRENT_UPDATES', '8'))
+    tenants = load_tenants(chat_id=chat_id)
+    # TELEGRAM_BASE_URL points the bot at a local Bot API server or a test double
+    application = create_bot(token, tenants, concurrent_updates=concurrent_updates,
+                             base_url=os.getenv('TELEGRAM_BASE_URL'), run_tenants=not SHARDS)
+    if SHARDS:
+        # Tenants are polled in worker processes; this process serves updates and sends
+        attach_shards(application, tenants, SHARDS)
+    if METRICS_PORT:
+        start_metrics_server()
+
+    # The scheduler and the webhook server share the event loop that run_* drives
+    if webhook_enabled():
+        application.run_webhook(drop_pending_updates=True, **webhook_settings())
+    else:
+        application.run_polling(timeout=60, drop_pending_updates=True)
 
 if __name__ == "__main__":
     main()
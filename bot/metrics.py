@@ -0,0 +1,201 @@
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Port of the Prometheus /metrics endpoint; unset keeps it off. Shard processes serve
+# their own metrics on METRICS_PORT + 1 + shard id.
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Seconds; covers a fast SQLite commit up to a cycle close to its 40 s budget
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+# Every metric created in this process, in the order they are exposed
+REGISTRY = []
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class CounterChild:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name):
+        yield name, '', self.value
+
+class GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    # Read the value from fn at scrape time, so nothing is paid on the hot path
+    def set_function(self, fn):
+        self.function = fn
+
+    def samples(self, name):
+        yield name, '', self.function() if self.function else self.value
+
+# Bucket counts are kept per bucket and only made cumulative when scraped
+class HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            yield f"{name}_bucket", f'le="{format_value(bound)}"', cumulative
+        yield f"{name}_sum", '', total
+        yield f"{name}_count", '', cumulative
+
+# A named metric with one child per combination of label values. Hot paths can keep the
+# child returned by labels() around to skip the lookup.
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            # A failing gauge callback or a bad value drops that series from the scrape, not the scrape
+            try:
+                lines.extend(f"{name}{format_labels(self.labelnames, values, extra)} {format_value(value)}"
+                             for name, extra, value in child.samples(self.name))
+            except Exception as e:
+                logger.error("Failed to collect %s%s: %s", self.name, format_labels(self.labelnames, values), e)
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_child(self):
+        return CounterChild()
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def new_child(self):
+        return GaugeChild()
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def new_child(self):
+        return HistogramChild(self.buckets)
+
+CYCLE_SECONDS = Histogram('cocbot_cycle_seconds', "Duration of a clan's polling cycle.", ['clan'])
+CYCLE_TIMEOUTS = Counter('cocbot_cycle_timeouts_total', "Polling cycles abandoned after TENANT_CYCLE_TIMEOUT.", ['clan'])
+API_SECONDS = Histogram('cocbot_api_request_seconds', "Latency of Clash of Clans API requests.", ['endpoint'])
+API_RESPONSES = Counter('cocbot_api_responses_total', "Clash of Clans API responses by HTTP status; 'error' when no response arrived.", ['endpoint', 'status'])
+DB_SECONDS = Histogram('cocbot_db_seconds', "Time spent writing and committing a cycle's events.", ['operation'])
+SEND_SECONDS = Histogram('cocbot_telegram_send_seconds', "Latency of Telegram sends.", ['method'])
+SEND_FAILURES = Counter('cocbot_telegram_send_failures_total', "Telegram sends that raised.", ['method'])
+HANDLER_SECONDS = Histogram('cocbot_handler_seconds', "Time spent handling an update, by handler.", ['handler'])
+TRACKED_PLAYERS = Gauge('cocbot_tracked_players', "Members in the last roster of each clan.", ['clan'])
+QUEUE_DEPTH = Gauge('cocbot_queue_depth', "Items waiting in internal queues.", ['queue'])
+SCHEDULER_LAG = Gauge('cocbot_scheduler_lag_seconds', "Delay between a job's scheduled and actual start, by job.", ['job'])
+JOB_LATENESS = Histogram('cocbot_job_lateness_seconds', "Delay between a job's scheduled and actual start, by job.", ['job'])
+JOBS_SKIPPED = Counter('cocbot_jobs_skipped_total', "Scheduled runs that did not start, by job and reason: 'running' while the "
+                       "previous run was unfinished, 'missed' when started too late, 'busy' while the clan's reset held it.", ['job', 'reason'])
+
+# Report each tenant's roster size at scrape time
+def track_tenants(tenants):
+    for tenant in tenants:
+        TRACKED_PLAYERS.labels(tenant.clan_tag).set_function(lambda tenant=tenant: len(tenant.roster.members))
+
+# Prometheus text exposition of every registered metric
+def render():
+    return '\n'.join(line for metric in REGISTRY for line in metric.render()) + '\n'
+
+# Time an awaitable Telegram call into SEND_SECONDS / SEND_FAILURES
+async def timed_send(method, coroutine):
+    started = time.perf_counter()
+    try:
+        return await coroutine
+    except Exception:
+        SEND_FAILURES.labels(method).inc()
+        raise
+    finally:
+        SEND_SECONDS.labels(method).observe(time.perf_counter() - started)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Serve /metrics from a daemon thread, so scrapes never run on the bot's event loop
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+    return server
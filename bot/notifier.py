@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from telegram.constants import ParseMode
+from .metrics import timed_send
+from .profiling import stage
+
+logger = logging.getLogger(__name__)
+
+# Send one rendered message to every recipient concurrently. Failures for one chat
+# (blocked bot, deleted group) are logged and do not affect the others.
+async def send_to_all(bot, chat_ids, text, parse_mode=ParseMode.HTML):
+    chat_ids = list(chat_ids)
+    with stage('send'):
+        results = await asyncio.gather(
+            *(timed_send('send_message', bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)) for chat_id in chat_ids),
+            return_exceptions=True,
+        )
+    delivered = 0
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            logger.error("Failed to send message to chat %s: %s", chat_id, result)
+        else:
+            delivered += 1
+    return delivered
+
+# Telegram file ids of chart images that were already uploaded, keyed by cache path
+uploaded_photos = {}
+
+# Send a rendered image to every recipient. The file is uploaded once; everyone else
+# (and any later request for the same cached render) gets the Telegram file id.
+async def send_photo_to_all(bot, chat_ids, path, caption=None):
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return 0
+    delivered = 0
+    if path not in uploaded_photos:
+        first, chat_ids = chat_ids[0], chat_ids[1:]
+        try:
+            with open(path, 'rb') as photo, stage('send'):
+                message = await timed_send('send_photo', bot.send_photo(chat_id=first, photo=photo, caption=caption))
+            uploaded_photos[path] = message.photo[-1].file_id
+            delivered += 1
+        except Exception as e:
+            logger.error("Failed to send photo to chat %s: %s", first, e)
+            return delivered
+
+    with stage('send'):
+        results = await asyncio.gather(
+            *(timed_send('send_photo', bot.send_photo(chat_id=chat_id, photo=uploaded_photos[path], caption=caption)) for chat_id in chat_ids),
+            return_exceptions=True,
+        )
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            logger.error("Failed to send photo to chat %s: %s", chat_id, result)
+        else:
+            delivered += 1
+    return delivered
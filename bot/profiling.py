@@ -0,0 +1,222 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from .logs import log_cycle
+from .metrics import HANDLER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# A job running longer than this many seconds has its stage breakdown and a sampled
+# profile of the time it ran saved to PROFILE_DIR
+SLOW_CYCLE_SECONDS = float(os.getenv('SLOW_CYCLE_SECONDS', '10'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Stack sampling interval for jobs that run long; 0 turns sampling off. Sampling starts once
+# a job has run for PROFILE_ARM_FRACTION of SLOW_CYCLE_SECONDS, so the jobs that finish in
+# time, nearly all of them, never pay for walking every thread's stack.
+PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', '10'))
+PROFILE_ARM_FRACTION = 0.5
+PROFILE_MAX_FILES = 50
+# Finished jobs each tenant keeps for /debug_last_cycles
+RECENT_CYCLES = 20
+# Seconds of stack samples kept, enough to cover a cycle up to its timeout
+SAMPLE_WINDOW_SECONDS = 60
+
+STAGES = ('fetch', 'parse', 'diff', 'record', 'render', 'send')
+
+# Timer of the job the current task (and threads started from it with to_thread) works for
+current_cycle = contextvars.ContextVar('current_cycle', default=None)
+
+# Innermost frames of threads that are waiting rather than working
+IDLE_FRAMES = {('threading.py', 'wait'), ('selectors.py', 'select'), ('thread.py', '_worker'), ('queue.py', 'get')}
+
+# Samples the stacks of every thread while a job has been running for at least arm_after
+# seconds, so a slow job's profile shows where the event loop and its worker threads spent
+# that time
+class StackSampler:
+    def __init__(self, interval, arm_after=0):
+        self.interval = interval
+        self.arm_after = arm_after
+        self.samples = deque(maxlen=int(SAMPLE_WINDOW_SECONDS / interval) if interval else 0)
+        # perf_counter start of each running job, by job id
+        self.active = {}
+        self.running = threading.Event()
+        self.thread = None
+
+    def begin(self, key, started):
+        if not self.interval:
+            return
+        self.active[key] = started
+        self.running.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+            self.thread.start()
+
+    def end(self, key):
+        if not self.interval:
+            return
+        self.active.pop(key, None)
+        if not self.active:
+            self.running.clear()
+
+    def run(self):
+        own = threading.get_ident()
+        while True:
+            self.running.wait()
+            now = time.perf_counter()
+            oldest = min(list(self.active.values()), default=now)
+            # Jobs started later only arm later, so waiting for the oldest one is enough
+            if now - oldest < self.arm_after:
+                time.sleep(self.arm_after - (now - oldest))
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append((frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                self.samples.append((now, tuple(reversed(stack))))
+            time.sleep(self.interval)
+
+    # Collapsed stacks ("outer;inner;innermost") sampled between two perf_counter times,
+    # with how often each was seen; the format flame graph tools read
+    def stacks_between(self, start, end):
+        stacks = Counter(stack for when, stack in list(self.samples) if start <= when <= end)
+        return {
+            ';'.join(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{line})" for code, line in stack): count
+            for stack, count in stacks.most_common()
+        }
+
+sampler = StackSampler(PROFILE_SAMPLE_MS / 1000, PROFILE_ARM_FRACTION * SLOW_CYCLE_SECONDS)
+
+# Times one run of a tenant's job and the stages inside it. Used as a context manager
+# around the job; the finished run is kept on the tenant and saved when it was slow.
+class CycleTimer:
+    def __init__(self, job, tenant):
+        self.job = job
+        self.tenant = tenant
+        # Short id that ties the run's log records to its /debug_last_cycles row and profile
+        self.id = secrets.token_hex(4)
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.outcome = 'ok'
+        self.duration = None
+
+    def __enter__(self):
+        self.started_at = datetime.now(self.tenant.timezone)
+        self.started = time.perf_counter()
+        self.token = current_cycle.set(self)
+        self.log_token = log_cycle.set(self.id)
+        sampler.begin(self.id, self.started)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        sampler.end(self.id)
+        self.duration = self.elapsed()
+        if exc_type is not None and self.outcome == 'ok':
+            self.outcome = 'cancelled' if issubclass(exc_type, asyncio.CancelledError) else 'error'
+        summary = self.summary()
+        self.tenant.cycles.append(summary)
+        if self.duration > SLOW_CYCLE_SECONDS:
+            logger.warning("%s for %s took %.1fs: %s", self.job, self.tenant.clan_tag, self.duration,
+                           ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items() if seconds))
+            stacks = sampler.stacks_between(self.started, self.started + self.duration)
+            save = functools.partial(save_profile, summary, stacks)
+            try:
+                asyncio.get_running_loop().run_in_executor(None, save).add_done_callback(log_save_failure)
+            except RuntimeError:
+                save()
+        current_cycle.reset(self.token)
+        log_cycle.reset(self.log_token)
+        return False
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'job': self.job,
+            'clan': self.tenant.clan_tag,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'duration': round(self.duration, 4),
+            'outcome': self.outcome,
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+        }
+
+# Add the time spent in the block to a stage of the current job; a no-op outside jobs
+@contextmanager
+def stage(name):
+    timer = current_cycle.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.stages[name] += time.perf_counter() - started
+
+# Write a slow job's breakdown and, when stacks were sampled, its collapsed stacks next to
+# each other in PROFILE_DIR
+def save_profile(summary, stacks):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = summary['started_at'][:19].replace(':', '').replace('-', '')
+    base = os.path.join(PROFILE_DIR, f"{summary['job']}-{summary['clan'].lstrip('#')}-{stamp}-{summary['id']}")
+    with open(f"{base}.json", 'w', encoding='utf-8') as profile:
+        json.dump(dict(summary, sample_interval_ms=PROFILE_SAMPLE_MS, samples=sum(stacks.values())), profile, indent=2)
+    if stacks:
+        with open(f"{base}.folded", 'w', encoding='utf-8') as folded:
+            folded.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+    prune_profiles()
+    logger.info("Saved slow %s profile to %s.json", summary['job'], base)
+
+def log_save_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Failed to save slow job profile: %s", future.exception())
+
+def prune_profiles():
+    files = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(('.json', '.folded'))]
+    if len(files) > 2 * PROFILE_MAX_FILES:
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - 2 * PROFILE_MAX_FILES]:
+            os.remove(path)
+
+# Record how long an update handler takes
+def timed_handler(name, callback):
+    child = HANDLER_SECONDS.labels(name)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            child.observe(time.perf_counter() - started)
+    return wrapper
+
+# Plain-text table of the most recent jobs of the given tenants, newest first
+def format_recent_cycles(tenants, limit=10):
+    cycles = sorted((cycle for tenant in tenants for cycle in tenant.cycles), key=lambda cycle: cycle['started_at'], reverse=True)[:limit]
+    if not cycles:
+        return "No cycles recorded yet."
+    header = f"{'time':<8} {'clan':<11} {'job':<6} {'total':>6} " + ' '.join(f"{name[:6]:>6}" for name in STAGES) + " outcome"
+    lines = [header]
+    for cycle in cycles:
+        lines.append(
+            f"{cycle['started_at'][11:19]:<8} {cycle['clan'][:11]:<11} {cycle['job'][:6]:<6} {cycle['duration'] * 1000:>6.0f} "
+            + ' '.join(f"{cycle['stages'][name] * 1000:>6.0f}" for name in STAGES) + f" {cycle['outcome']}"
+        )
+    return "\n".join(lines) + "\n(milliseconds)"
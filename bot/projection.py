@@ -0,0 +1,165 @@
+import html
+from datetime import timedelta
+import numpy as np
+from .database import connect_db
+from .history import day_summaries
+from .reconcile import ATTACK_ESTIMATE
+
+# Legend league: 8 attacks and 8 defenses a day
+ATTACKS_PER_DAY = 8
+DEFENSES_PER_DAY = 8
+# Fallback per-event averages for players without history
+DEFAULT_ATTACK_AVG = float(ATTACK_ESTIMATE)
+DEFAULT_DEFEND_AVG = -25.0
+# Days of stored events the per-player averages are based on
+BASELINE_DAYS = 14
+
+# Columnar in-memory state of the current legend day, one row per tracked player.
+# Counters are updated per event; projections read the columns as whole arrays.
+class DayState:
+    COLUMNS = {
+        'attacks': (np.int32, 0),
+        'defends': (np.int32, 0),
+        'net': (np.int32, 0),
+        'trophies': (np.int32, 0),
+        'active': (bool, False),
+        'attack_avg': (np.float64, DEFAULT_ATTACK_AVG),
+        'defend_avg': (np.float64, DEFAULT_DEFEND_AVG),
+    }
+
+    def __init__(self, capacity=64):
+        self.day = None
+        self.tags = []
+        self.names = []
+        self.index = {}
+        self.baseline = {}
+        self.version = 0
+        for column, (dtype, fill) in self.COLUMNS.items():
+            setattr(self, column, np.full(capacity, fill, dtype=dtype))
+
+    @property
+    def size(self):
+        return len(self.tags)
+
+    def _grow(self):
+        for column, (dtype, fill) in self.COLUMNS.items():
+            values = getattr(self, column)
+            grown = np.full(len(values) * 2, fill, dtype=dtype)
+            grown[:len(values)] = values
+            setattr(self, column, grown)
+
+    def _row(self, tag, name):
+        row = self.index.get(tag)
+        if row is None:
+            row = self.index[tag] = len(self.tags)
+            self.tags.append(tag)
+            self.names.append(name)
+            if row == len(self.attacks):
+                self._grow()
+            self.attack_avg[row], self.defend_avg[row] = self.baseline.get(tag, (DEFAULT_ATTACK_AVG, DEFAULT_DEFEND_AVG))
+        else:
+            self.names[row] = name
+        return row
+
+    # Start a new legend day: counters go back to zero, trophies and averages stay
+    def roll_over(self, day):
+        if day != self.day:
+            self.day = day
+            self.attacks[:] = 0
+            self.defends[:] = 0
+            self.net[:] = 0
+            self.version += 1
+
+    # Take the trophies of the current roster; players no longer in it are left out of projections
+    def set_trophies(self, members):
+        self.active[:] = False
+        for member in members:
+            row = self._row(member.tag, member.name)
+            self.trophies[row] = member.trophies
+            self.active[row] = True
+
+    def add_event(self, tag, name, event_type, change):
+        row = self._row(tag, name)
+        if event_type == 'attack':
+            self.attacks[row] += 1
+        else:
+            self.defends[row] += 1
+        self.net[row] += change
+
+    # Mark the end of a polling cycle; cached projections are recomputed at most once after this
+    def commit_cycle(self):
+        self.version += 1
+
+    # Restore today's counters after a restart from (tag, name, attacks, defends, net) rows
+    def seed(self, day, rows):
+        self.roll_over(day)
+        for tag, name, attacks, defends, net in rows:
+            row = self._row(tag, name)
+            self.attacks[row] = attacks
+            self.defends[row] = defends
+            self.net[row] = net
+        self.version += 1
+
+    def set_baseline(self, averages):
+        self.baseline = averages
+        for tag, (attack_avg, defend_avg) in averages.items():
+            row = self.index.get(tag)
+            if row is not None:
+                self.attack_avg[row] = attack_avg
+                self.defend_avg[row] = defend_avg
+        self.version += 1
+
+# Per-player average attack gain and defense loss over the last BASELINE_DAYS days
+def load_baseline(end_date):
+    from .analytics import compute_season_stats, load_season
+    conn = connect_db()
+    events = load_season(conn, end_date - timedelta(days=BASELINE_DAYS), end_date - timedelta(days=1))
+    conn.close()
+    if events is None:
+        return {}
+    stats = compute_season_stats(events)
+    attack_avg = np.where(np.isnan(stats['attack_avg']), DEFAULT_ATTACK_AVG, stats['attack_avg'])
+    defend_avg = np.where(np.isnan(stats['defend_avg']), DEFAULT_DEFEND_AVG, stats['defend_avg'])
+    return {tag: (float(attack), float(defend)) for tag, attack, defend in zip(events.tags, attack_avg, defend_avg)}
+
+# Today's per-player counters as stored in the database
+def load_day_counts(day):
+    conn = connect_db()
+    rows = [(tag, name, attacks, defends, net) for _, tag, name, attacks, _, defends, _, net in day_summaries(conn, day, day)]
+    conn.close()
+    return rows
+
+# Projects every member's end-of-day trophies from the day state in one vectorized pass
+# and reuses the result until the day state changes
+class Projector:
+    def __init__(self, day_state):
+        self.day_state = day_state
+        self.cached_version = None
+        self.cached = None
+
+    def project(self):
+        state = self.day_state
+        if self.cached_version != state.version:
+            rows = np.flatnonzero(state.active[:state.size])
+            attacks = state.attacks[rows]
+            defends = state.defends[rows]
+            trophies = state.trophies[rows]
+            remaining_attacks = np.clip(ATTACKS_PER_DAY - attacks, 0, None)
+            remaining_defends = np.clip(DEFENSES_PER_DAY - defends, 0, None)
+            projected = trophies + remaining_attacks * state.attack_avg[rows] + remaining_defends * state.defend_avg[rows]
+            order = np.argsort(-projected, kind='stable')
+            self.cached = {
+                'names': [state.names[row] for row in rows[order]],
+                'trophies': trophies[order],
+                'attacks': attacks[order],
+                'defends': defends[order],
+                'projected': np.rint(projected[order]).astype(np.int32),
+            }
+            self.cached_version = state.version
+        return self.cached
+
+def format_projection(projection):
+    yield "#  Name          Now  A/D  Proj"
+    rows = zip(projection['names'], projection['trophies'], projection['attacks'], projection['defends'], projection['projected'])
+    for rank, (name, trophies, attacks, defends, projected) in enumerate(rows, start=1):
+        yield f"{rank:<2} {html.escape(name[:12]):<12} {trophies:>5} {attacks}/{defends} {projected:>5}"
@@ -0,0 +1,64 @@
+import logging
+import os
+import time
+from .coc_api import fetch_location, fetch_location_rankings
+
+logger = logging.getLogger(__name__)
+
+# Rankings to mirror: 'global' and/or numeric location ids, e.g. "global,32000249"
+RANKING_LOCATIONS = [location.strip() for location in os.getenv('RANKING_LOCATIONS', 'global').split(',') if location.strip()]
+RANKING_REFRESH_MINUTES = int(os.getenv('RANKING_REFRESH_MINUTES', '10'))
+
+# Local copy of the configured player rankings indexed by tag, so a rank query is a
+# dictionary lookup instead of an API call
+class RankingCache:
+    def __init__(self, locations=None):
+        self.locations = locations or RANKING_LOCATIONS
+        self.location_names = {'global': 'Global'}
+        self.by_location = {}
+        # When each location's ranking was last fetched successfully
+        self.fetched_at = {}
+
+    # Blocking; run it off the event loop
+    def refresh(self):
+        refreshed = dict(self.by_location)
+        failed = 0
+        for location in self.locations:
+            items = fetch_location_rankings(location)
+            if items is None:
+                # Keep serving the previous copy of a ranking that failed to refresh
+                failed += 1
+                continue
+            refreshed[location] = {item['tag']: item for item in items}
+            self.fetched_at[location] = time.time()
+            if location not in self.location_names:
+                details = fetch_location(location)
+                self.location_names[location] = details['name'] if details else location
+        self.by_location = refreshed
+        if failed:
+            logger.warning("Failed to refresh %d of %d rankings.", failed, len(self.locations))
+        else:
+            logger.info("Refreshed rankings for %d locations.", len(refreshed))
+
+    def lookup(self, tag):
+        return [
+            (self.location_names.get(location, location), ranking[tag])
+            for location, ranking in self.by_location.items()
+            if tag in ranking
+        ]
+
+    # Time of the oldest ranking being served, None until one was fetched
+    @property
+    def refreshed_at(self):
+        return min(self.fetched_at.values(), default=None)
+
+    @property
+    def age_seconds(self):
+        return None if self.refreshed_at is None else time.time() - self.refreshed_at
+
+def format_age(seconds):
+    if seconds < 90:
+        return f"{int(seconds)} s"
+    if seconds < 90 * 60:
+        return f"{int(seconds // 60)} min"
+    return f"{seconds / 3600:.1f} h"
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+# Legend league trophy ranges: an attack gains 5-40 trophies, a defense loses 0-40
+ATTACK_MIN = 5
+ATTACK_MAX = 40
+DEFENSE_MAX = 40
+# Typical legend league attack, used to pick a split when several are possible
+ATTACK_ESTIMATE = 30
+# A player gets at most 8 attacks and 8 defenses a day
+MAX_EVENTS = 8
+
+@dataclass
+class SplitEvent:
+    event_type: str
+    trophies: int
+    inferred: bool = False
+
+# Difference in (attackWins, defenseWins) between two player endpoint snapshots.
+# defenseWins only counts defenses the attacker failed, so it is a lower bound.
+def counter_delta(previous, current):
+    if previous is None or current is None:
+        return None, None
+    attacks = current[0] - previous[0]
+    defenses = current[1] - previous[1]
+    # A season reset zeroes the counters; the difference is meaningless then
+    if attacks < 0 or defenses < 0:
+        return None, None
+    return attacks, defenses
+
+def split_evenly(total, parts):
+    base, remainder = divmod(total, parts)
+    return [base + 1 if idx < remainder else base for idx in range(parts)]
+
+# Range of total attack gain that lets `attacks` attacks and `defenses` defenses add up to delta
+def feasible_gain(delta, attacks, defenses):
+    low = max(ATTACK_MIN * attacks, delta, 0)
+    high = min(ATTACK_MAX * attacks, delta + DEFENSE_MAX * defenses)
+    return low, high
+
+# Split the net trophy change seen in one poll window into the attacks and defenses
+# that produced it. `attacks` and `defenses` are counter increments when known; they
+# are widened until the legend league ranges can explain the delta. Amounts are only
+# estimates once more than one event is involved, so those events are marked inferred.
+def split_delta(delta, attacks=None, defenses=None, attack_estimate=ATTACK_ESTIMATE):
+    attacks = attacks or 0
+    defenses = defenses or 0
+    low, high = feasible_gain(delta, attacks, defenses)
+    while low > high:
+        if delta > ATTACK_MAX * attacks and attacks < MAX_EVENTS:
+            attacks += 1
+        elif defenses < MAX_EVENTS:
+            defenses += 1
+        else:
+            # Outside anything legend league can produce; keep the raw net change
+            attacks = defenses = 0
+            break
+        low, high = feasible_gain(delta, attacks, defenses)
+
+    if attacks + defenses <= 1:
+        return [SplitEvent('attack' if delta > 0 else 'defend', abs(delta))]
+
+    gained = min(max(attack_estimate * attacks, low), high)
+    events = [SplitEvent('attack', trophies, True) for trophies in split_evenly(gained, attacks)] if attacks else []
+    if defenses:
+        events += [SplitEvent('defend', trophies, True) for trophies in split_evenly(gained - delta, defenses)]
+    return events
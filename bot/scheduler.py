@@ -1,12 +1,57 @@
+import asyncio
+from datetime import datetime
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime, timedelta, timezone
-from .handlers import check_trophy
-from .database import reset_player_stats
+from .leader import LEASE_RENEW_SECONDS, renew_leases
+from .metrics import JOB_LATENESS, JOBS_SKIPPED, SCHEDULER_LAG
+from .rankings import RANKING_REFRESH_MINUTES
+from .tracker import refresh_projection_baseline, reset_player_stats, run_tenant_cycle
+from .utils import UTC_MINUS_5
 
-UTC_MINUS_5 = timezone(timedelta(hours=-5))
+# Seconds between polling cycles of a tenant
+POLL_INTERVAL_SECONDS = 45
+# A run starting later than this is dropped; the next one follows soon enough. Daily
+# jobs get DAILY_MISFIRE_GRACE_SECONDS, so a reset delayed by a busy loop still happens.
+MISFIRE_GRACE_SECONDS = 30
+DAILY_MISFIRE_GRACE_SECONDS = 3600
 
-def setup_scheduler(application):
-    scheduler = AsyncIOScheduler(timezone=UTC_MINUS_5)
-    scheduler.add_job(check_trophy, 'interval', seconds=45, args=[application])
-    scheduler.add_job(reset_player_stats, 'cron', hour=0, minute=0, args=[application])
+# Every job runs one instance at a time and runs it once after being held up, however
+# many of its run times passed in the meantime
+JOB_DEFAULTS = {'max_instances': 1, 'coalesce': True, 'misfire_grace_time': MISFIRE_GRACE_SECONDS}
+
+async def refresh_rankings(application):
+    await asyncio.to_thread(application.bot_data['rankings'].refresh)
+
+# How late the scheduler handed a job to its executor, e.g. because the event loop was busy
+def record_lag(event):
+    if event.scheduled_run_times:
+        scheduled = event.scheduled_run_times[-1]
+        lag = max((datetime.now(scheduled.tzinfo) - scheduled).total_seconds(), 0)
+        SCHEDULER_LAG.labels(event.job_id).set(lag)
+        JOB_LATENESS.labels(event.job_id).observe(lag)
+
+# Runs the scheduler did not start: the job's previous run was still going, or the loop
+# was held up past the misfire grace time
+def record_skipped(event):
+    reason = 'running' if event.code == EVENT_JOB_MAX_INSTANCES else 'missed'
+    JOBS_SKIPPED.labels(event.job_id, reason).inc()
+
+# One set of jobs per tenant on the shared scheduler: each tenant's cycle is its own job,
+# so a slow clan only delays itself, and daily jobs follow the tenant's own midnight
+def setup_scheduler(application, cycle=run_tenant_cycle, tenants=True, rankings=True):
+    scheduler = AsyncIOScheduler(timezone=UTC_MINUS_5, job_defaults=JOB_DEFAULTS)
+    for tenant in application.bot_data['tenants'] if tenants else ():
+        job_id = tenant.clan_tag
+        scheduler.add_job(cycle, 'interval', seconds=POLL_INTERVAL_SECONDS, args=[application, tenant], id=f"check_{job_id}")
+        scheduler.add_job(reset_player_stats, 'cron', hour=0, minute=0, timezone=tenant.timezone, args=[application, tenant], id=f"reset_{job_id}",
+                          misfire_grace_time=DAILY_MISFIRE_GRACE_SECONDS)
+        scheduler.add_job(refresh_projection_baseline, 'cron', hour=0, minute=1, timezone=tenant.timezone, args=[application, tenant],
+                          id=f"baseline_{job_id}", next_run_time=tenant.now(), misfire_grace_time=DAILY_MISFIRE_GRACE_SECONDS)
+    if tenants:
+        scheduler.add_job(renew_leases, 'interval', seconds=LEASE_RENEW_SECONDS, args=[application], next_run_time=datetime.now(UTC_MINUS_5))
+    if rankings:
+        scheduler.add_job(refresh_rankings, 'interval', minutes=RANKING_REFRESH_MINUTES, args=[application], next_run_time=datetime.now(UTC_MINUS_5))
+    scheduler.add_listener(record_lag, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(record_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
     scheduler.start()
+    return scheduler
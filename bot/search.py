@@ -0,0 +1,126 @@
+import heapq
+import unicodedata
+from datetime import timedelta
+from .database import connect_db, event_days_between
+from .diff import MemberJoined, MemberLeft, MemberRenamed
+
+SEARCH_LIMIT = 10
+# Days of recorded events old names are collected from at startup
+NAME_HISTORY_DAYS = 30
+
+# Fold a name into its search key: compatibility-decompose, drop combining marks and casefold,
+# so "Ñàmé", "NAME" and "ｎａｍｅ" all share the key "name"
+def fold(name):
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+# Keys a name is reachable under: the whole folded name and every word after the first,
+# so "king" finds both "King Arthur" and "The King"
+def name_keys(name):
+    folded = fold(name)
+    words = folded.split()
+    return {folded} | {' '.join(words[i:]) for i in range(1, len(words))} if folded else set()
+
+# Prefix trie over folded member names, current and previous. Every node keeps the set of
+# tags below it, so a lookup walks len(query) nodes and reads the answer off the last one.
+class NameIndex:
+    def __init__(self):
+        self.root = {}
+        self.names = {}
+        self.history = {}
+        self.keys = {}
+        self.current = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _insert(self, key, tag):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault('', set()).add(tag)
+
+    def _discard(self, key, tag):
+        path = [self.root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        # Walk back up, removing the tag and pruning nodes nobody else uses
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            node[''].discard(tag)
+            if not node['']:
+                del path[depth - 1][key[depth - 1]]
+
+    def add(self, tag, name):
+        previous = self.names.get(tag)
+        if previous == name:
+            return
+        if previous is not None:
+            # Old names stay searchable so renamed players can still be found
+            self.history.setdefault(tag, []).append(previous)
+        self.names[tag] = name
+        keys = name_keys(name)
+        self.current[tag] = (fold(name), keys)
+        for key in keys - self.keys.setdefault(tag, set()):
+            self.keys[tag].add(key)
+            self._insert(key, tag)
+
+    def remove(self, tag):
+        self.names.pop(tag, None)
+        self.history.pop(tag, None)
+        self.current.pop(tag, None)
+        for key in self.keys.pop(tag, ()):
+            self._discard(key, tag)
+
+    def rebuild(self, members):
+        self.__init__()
+        for member in members:
+            self.add(member.tag, member.name)
+
+    # Apply joins, renames and departures from a roster diff
+    def apply(self, records):
+        for record in records:
+            if isinstance(record, MemberLeft):
+                self.remove(record.member.tag)
+            elif isinstance(record, (MemberJoined, MemberRenamed)):
+                self.add(record.member.tag, record.member.name)
+
+    # Add names recorded in the event tables as history of members still in the clan
+    def load_history(self, rows):
+        for tag, name in rows:
+            current = self.names.get(tag)
+            if current is None or name == current or name in self.history.get(tag, ()):
+                continue
+            self.history.setdefault(tag, []).append(name)
+            for key in name_keys(name) - self.keys[tag]:
+                self.keys[tag].add(key)
+                self._insert(key, tag)
+
+    # Tags matching a partial name, best first: exact current names, then current-name
+    # prefixes, then matches on old names only; ties are broken alphabetically
+    def search(self, query, limit=SEARCH_LIMIT):
+        key = fold(query)
+        if not key:
+            return []
+        node = self.root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        def rank(tag):
+            folded, keys = self.current[tag]
+            return (folded != key, not any(k.startswith(key) for k in keys), folded)
+        return heapq.nsmallest(limit, node[''], key=rank)
+
+# Distinct (tag, name) pairs recorded in the NAME_HISTORY_DAYS days up to end_date
+def load_name_rows(end_date, days=NAME_HISTORY_DAYS):
+    rows = set()
+    conn = connect_db()
+    for _, date_str in event_days_between(conn, end_date - timedelta(days=days - 1), end_date):
+        rows.update(conn.execute(f"SELECT DISTINCT tag, name FROM player_events_{date_str}"))
+    conn.close()
+    return rows
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from .config import LOG_LEVEL
+from .logs import setup_logging
+from .metrics import METRICS_PORT, QUEUE_DEPTH, start_metrics_server, track_tenants
+from .notifier import send_photo_to_all, send_to_all
+from .projection import Projector
+from .scheduler import setup_scheduler
+from .subscriptions import load_subscriptions
+from .tenants import TenantRegistry, tenant_from_config
+from .tracker import run_tenant_cycle
+
+logger = logging.getLogger(__name__)
+
+# Worker processes tenants are spread over; 0 keeps every tenant in the bot process
+SHARDS = int(os.getenv('SHARDS', '0'))
+# Messages per second all shards together may send, below Telegram's global limit of ~30
+TELEGRAM_SEND_RATE = float(os.getenv('TELEGRAM_SEND_RATE', '25'))
+# A shard that crashes this often within RESTART_WINDOW_SECONDS is retired and its tenants
+# are moved to the remaining shards
+MAX_RESTARTS = 3
+RESTART_WINDOW_SECONDS = 300
+# Shard sends in flight at once in the bot process; the rate limiter sets the actual pace
+MAX_CONCURRENT_SENDS = 64
+SUPERVISE_INTERVAL_SECONDS = 5
+SUBSCRIPTION_RELOAD_SECONDS = 60
+
+# Rendezvous hashing: every tenant goes to the shard with the highest score for its clan tag.
+# Removing a shard only moves the tenants that were on it.
+def assign_shards(configs, shard_ids):
+    assignment = {shard_id: [] for shard_id in shard_ids}
+    for config in configs:
+        tag = config['clan_tag'].encode()
+        shard_id = max(shard_ids, key=lambda shard: zlib.crc32(b'%d:%s' % (shard, tag)))
+        assignment[shard_id].append(config)
+    return assignment
+
+# Stands in for the Telegram bot inside a shard: sends become items on the outbound queue
+# that the bot process delivers, so the global rate limit is enforced in one place
+class QueueBot:
+    def __init__(self, outbound):
+        self.outbound = outbound
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.outbound.put(('message', chat_id, text, parse_mode))
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        # Forward the chart's path; the returned "file id" is the same path, so follow-up
+        # sends of this chart through send_photo_to_all are forwarded by path as well
+        path = getattr(photo, 'name', photo)
+        self.outbound.put(('photo', chat_id, path, caption))
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=path)])
+
+    # Hand the tenant's in-memory view to the bot process for /status, /projection,
+    # /debug_last_cycles and inline queries
+    def publish(self, tenant):
+        self.outbound.put(('view', tenant.clan_tag, tenant.roster.members, tenant.names, tenant.day_state, tenant.cycles))
+
+async def reload_subscriptions(application):
+    application.bot_data['subscriptions'] = await asyncio.to_thread(load_subscriptions)
+
+async def run_and_publish(application, tenant):
+    await run_tenant_cycle(application, tenant)
+    application.bot.publish(tenant)
+
+async def run_shard(configs, outbound):
+    tenants = TenantRegistry([tenant_from_config(config) for config in configs])
+    application = SimpleNamespace(bot=QueueBot(outbound), bot_data={'tenants': tenants, 'subscriptions': load_subscriptions()})
+    scheduler = setup_scheduler(application, cycle=run_and_publish, rankings=False)
+    track_tenants(tenants)
+    scheduler.add_job(reload_subscriptions, 'interval', seconds=SUBSCRIPTION_RELOAD_SECONDS, args=[application])
+    await asyncio.Event().wait()
+
+# Entry point of a shard process
+def worker_main(shard_id, configs, outbound):
+    setup_logging(LOG_LEVEL, label=f"shard-{shard_id}")
+    logger.info("Shard %d tracking %s", shard_id, ', '.join(config['clan_tag'] for config in configs))
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT + 1 + shard_id)
+    asyncio.run(run_shard(configs, outbound))
+
+# Spaces sends out to at most `rate` per second
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        wait = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# Drains the shards' outbound queue in the bot process: messages and photos are delivered
+# through the real bot under one rate limit, tenant views replace the local copies
+class OutboundDispatcher:
+    def __init__(self, application, outbound, rate=TELEGRAM_SEND_RATE):
+        self.application = application
+        self.outbound = outbound
+        self.limiter = RateLimiter(rate)
+        self.slots = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+        self.in_flight = set()
+        self.sent = 0
+
+    def apply_view(self, clan_tag, members, names, day_state, cycles):
+        tenant = self.application.bot_data['tenants'].by_clan.get(clan_tag)
+        if tenant is not None:
+            tenant.roster.members = members
+            tenant.names = names
+            tenant.day_state = day_state
+            tenant.projector = Projector(day_state)
+            tenant.cycles = cycles
+
+    async def dispatch(self, item):
+        kind, *payload = item
+        if kind == 'view':
+            self.apply_view(*payload)
+            return
+        await self.limiter.acquire()
+        if kind == 'message':
+            chat_id, text, parse_mode = payload
+            delivered = await send_to_all(self.application.bot, [chat_id], text, parse_mode=parse_mode)
+        elif kind == 'photo':
+            chat_id, path, caption = payload
+            delivered = await send_photo_to_all(self.application.bot, [chat_id], path, caption=caption)
+        else:
+            return
+        # Added after the await: sends of other tasks finish in between
+        self.sent += delivered
+
+    async def deliver(self, item):
+        try:
+            await self.dispatch(item)
+        except Exception as e:
+            logger.error("Failed to deliver %s from a shard: %s", item[0], e)
+        finally:
+            self.slots.release()
+
+    # Views are applied in queue order; sends run concurrently, so one slow chat or a long
+    # send latency does not hold back the rest of the queue
+    async def run(self):
+        while True:
+            try:
+                item = await asyncio.to_thread(self.outbound.get, timeout=1)
+            except queue.Empty:
+                continue
+            if item[0] == 'view':
+                self.apply_view(*item[1:])
+                continue
+            await self.slots.acquire()
+            task = asyncio.create_task(self.deliver(item))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+# Starts one process per shard, restarts crashed ones and, when a shard keeps crashing,
+# retires it and moves its tenants to the remaining shards
+class ShardSupervisor:
+    def __init__(self, configs, shard_count, outbound, context=None):
+        self.configs = list(configs)
+        self.shard_ids = list(range(max(1, min(shard_count, len(self.configs)))))
+        self.outbound = outbound
+        self.context = context or multiprocessing.get_context('spawn')
+        self.workers = {}
+        self.crashes = defaultdict(deque)
+
+    def assignment(self):
+        return assign_shards(self.configs, self.shard_ids)
+
+    def spawn(self, shard_id, configs):
+        process = self.context.Process(target=worker_main, args=(shard_id, configs, self.outbound), name=f"shard-{shard_id}", daemon=True)
+        process.start()
+        self.workers[shard_id] = (process, configs)
+
+    def start(self):
+        for shard_id, configs in self.assignment().items():
+            if configs:
+                self.spawn(shard_id, configs)
+
+    def retire(self, shard_id):
+        logger.error("Shard %d crashed %d times in %ds, moving its tenants.", shard_id, MAX_RESTARTS, RESTART_WINDOW_SECONDS)
+        self.shard_ids.remove(shard_id)
+        self.workers.pop(shard_id, None)
+        for other_id, configs in self.assignment().items():
+            current = self.workers.get(other_id)
+            if current is not None and current[1] == configs:
+                continue
+            if current is not None:
+                current[0].terminate()
+                current[0].join()
+            if configs:
+                self.spawn(other_id, configs)
+
+    def check(self):
+        now = time.monotonic()
+        for shard_id, (process, configs) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            crashes = self.crashes[shard_id]
+            crashes.append(now)
+            while crashes and crashes[0] < now - RESTART_WINDOW_SECONDS:
+                crashes.popleft()
+            if len(crashes) >= MAX_RESTARTS and len(self.shard_ids) > 1:
+                # Retiring respawns other shards; look at them again on the next check
+                self.retire(shard_id)
+                return
+            logger.warning("Shard %d exited with code %s, restarting.", shard_id, process.exitcode)
+            self.spawn(shard_id, configs)
+
+    async def supervise(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL_SECONDS)
+            self.check()
+
+    def stop(self):
+        for process, _ in self.workers.values():
+            process.terminate()
+        for process, _ in self.workers.values():
+            process.join()
+        self.workers.clear()
+
+# Run the registry's tenants in SHARDS worker processes while this process serves updates
+# and delivers everything the shards send
+def attach_shards(application, tenants, shard_count):
+    context = multiprocessing.get_context('spawn')
+    outbound = context.Queue()
+    supervisor = ShardSupervisor([tenant.config for tenant in tenants], shard_count, outbound, context)
+    dispatcher = OutboundDispatcher(application, outbound)
+    QUEUE_DEPTH.labels('outbound').set_function(outbound.qsize)
+    tasks = []
+
+    async def post_init(application):
+        supervisor.start()
+        tasks.append(asyncio.create_task(dispatcher.run()))
+        tasks.append(asyncio.create_task(supervisor.supervise()))
+
+    async def post_shutdown(application):
+        for task in tasks:
+            task.cancel()
+        supervisor.stop()
+
+    application.post_init = post_init
+    application.post_shutdown = post_shutdown
+    application.bot_data['shards'] = supervisor
+    return supervisor
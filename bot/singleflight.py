@@ -0,0 +1,42 @@
+import asyncio
+import os
+import time
+from collections import Counter
+
+# Seconds a finished result keeps answering identical requests
+SINGLEFLIGHT_TTL_SECONDS = float(os.getenv('SINGLEFLIGHT_TTL_SECONDS', '5'))
+
+# Coalesces concurrent calls with the same key into one execution that every caller
+# awaits, and reuses the result for ttl seconds afterwards. Failed calls and None
+# results are not kept, so the next request tries again.
+class SingleFlight:
+    def __init__(self, ttl=SINGLEFLIGHT_TTL_SECONDS):
+        self.ttl = ttl
+        self.inflight = {}
+        self.results = {}
+        self.stats = Counter()
+
+    async def do(self, key, fn, *args):
+        self.stats['calls'] += 1
+        cached = self.results.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.stats['cached'] += 1
+            return cached[1]
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['executions'] += 1
+            task = self.inflight[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so one caller giving up does not cancel the work the others are awaiting
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self.inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.results[key] = (time.monotonic(), task.result())
+
+    def forget(self, key):
+        self.results.pop(key, None)
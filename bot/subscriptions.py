@@ -0,0 +1,89 @@
+import logging
+from .database import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+CLAN = 'clan'
+PLAYER = 'player'
+
+_NO_SUBSCRIBERS = frozenset()
+
+def normalize_tag(tag):
+    # Tags are case-insensitive and never contain the letter O, which players often type instead of 0
+    tag = tag.strip().upper().replace('O', '0')
+    return tag if tag.startswith('#') else f"#{tag}"
+
+# In-memory index from clan/player tag to the set of subscribed chat ids, so the
+# recipients of a changed player are resolved with two dictionary lookups
+class SubscriptionIndex:
+    def __init__(self):
+        self.by_clan = {}
+        self.by_player = {}
+        self.by_chat = {}
+
+    def _bucket(self, kind):
+        return self.by_clan if kind == CLAN else self.by_player
+
+    def add(self, chat_id, kind, tag):
+        self._bucket(kind).setdefault(tag, set()).add(chat_id)
+        self.by_chat.setdefault(chat_id, set()).add((kind, tag))
+
+    def remove(self, chat_id, kind, tag):
+        bucket = self._bucket(kind)
+        subscribers = bucket.get(tag)
+        if subscribers is None or chat_id not in subscribers:
+            return False
+        subscribers.discard(chat_id)
+        if not subscribers:
+            del bucket[tag]
+        self.by_chat[chat_id].discard((kind, tag))
+        if not self.by_chat[chat_id]:
+            del self.by_chat[chat_id]
+        return True
+
+    def clan_subscribers(self, clan_tag):
+        return self.by_clan.get(clan_tag, _NO_SUBSCRIBERS)
+
+    # Player subscribers always receive the change; clan subscribers only when include_clan is set
+    def recipients(self, clan_tag, player_tag, include_clan=True):
+        player_subscribers = self.by_player.get(player_tag, _NO_SUBSCRIBERS)
+        if not include_clan:
+            return player_subscribers
+        return self.by_clan.get(clan_tag, _NO_SUBSCRIBERS) | player_subscribers
+
+    def subscriptions_for(self, chat_id):
+        return sorted(self.by_chat.get(chat_id, ()))
+
+def init_subscriptions_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS subscriptions (
+        chat_id INTEGER, kind TEXT, tag TEXT,
+        PRIMARY KEY (chat_id, kind, tag)
+    )''')
+    conn.commit()
+
+def load_subscriptions():
+    index = SubscriptionIndex()
+    conn = connect_shared_db()
+    init_subscriptions_table(conn)
+    for chat_id, kind, tag in conn.execute('SELECT chat_id, kind, tag FROM subscriptions'):
+        index.add(chat_id, kind, tag)
+    conn.close()
+    logger.info("Loaded subscriptions for %d chats.", len(index.by_chat))
+    return index
+
+def subscribe(index, chat_id, kind, tag):
+    conn = connect_shared_db()
+    init_subscriptions_table(conn)
+    conn.execute('INSERT OR IGNORE INTO subscriptions (chat_id, kind, tag) VALUES (?, ?, ?)', (chat_id, kind, tag))
+    conn.commit()
+    conn.close()
+    index.add(chat_id, kind, tag)
+
+def unsubscribe(index, chat_id, kind, tag):
+    conn = connect_shared_db()
+    init_subscriptions_table(conn)
+    conn.execute('DELETE FROM subscriptions WHERE chat_id = ? AND kind = ? AND tag = ?', (chat_id, kind, tag))
+    conn.commit()
+    conn.close()
+    return index.remove(chat_id, kind, tag)
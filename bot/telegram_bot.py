@@ -1,11 +1,54 @@
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler
-from .handlers import start, check_trophy
+from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, InlineQueryHandler
+from .database import upgrade_event_tables
+from .leader import release_leases
+from .metrics import QUEUE_DEPTH, track_tenants
+from .profiling import timed_handler
+from .rankings import RankingCache
+from .handlers import start, check_trophy, button_handler, subscribe_command, unsubscribe_command, list_subscriptions, chart_command, history_command, season_command, check_player_global_ranking, projection_command, export_command, status_command, inline_status, stats_command, debug_last_cycles
 from .scheduler import setup_scheduler
+from .subscriptions import CLAN, load_subscriptions, subscribe
 
-def create_bot(token, chat_id):
-    application = ApplicationBuilder().token(token).build()
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("check_trophy", check_trophy, chat_id=chat_id))
-    application.add_handler(CallbackQueryHandler(check_trophy))
-    setup_scheduler(application, chat_id)
+COMMANDS = [
+    ("start", start),
+    ("check_trophy", check_trophy),
+    ("subscribe", subscribe_command),
+    ("unsubscribe", unsubscribe_command),
+    ("subscriptions", list_subscriptions),
+    ("chart", chart_command),
+    ("history", history_command),
+    ("season", season_command),
+    ("check_global_ranking", check_player_global_ranking),
+    ("projection", projection_command),
+    ("export", export_command),
+    ("status", status_command),
+    ("stats", stats_command),
+    ("debug_last_cycles", debug_last_cycles),
+]
+
+# Build one application serving every tenant in the registry from a shared event loop.
+# With run_tenants=False the tenants' polling jobs are left to shard processes.
+def create_bot(token, tenants, concurrent_updates=True, base_url=None, run_tenants=True):
+    builder = ApplicationBuilder().token(token).concurrent_updates(concurrent_updates)
+    if base_url:
+        # Point the bot at a local Bot API server instead of api.telegram.org
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    application.bot_data['tenants'] = tenants
+    application.bot_data['subscriptions'] = load_subscriptions()
+    application.bot_data['rankings'] = RankingCache()
+    for tenant in tenants:
+        tenant.call(upgrade_event_tables)
+        # A tenant's configured chats always follow its whole clan, as before subscriptions existed
+        for chat_id in tenant.chats:
+            subscribe(application.bot_data['subscriptions'], chat_id, CLAN, tenant.clan_tag)
+    for command, callback in COMMANDS:
+        application.add_handler(CommandHandler(command, timed_handler(command, callback)))
+    application.add_handler(CallbackQueryHandler(timed_handler('button', button_handler)))
+    application.add_handler(InlineQueryHandler(timed_handler('inline', inline_status)))
+    application.bot_data['scheduler'] = setup_scheduler(application, tenants=run_tenants)
+    track_tenants(tenants)
+    QUEUE_DEPTH.labels('updates').set_function(application.update_queue.qsize)
+    if run_tenants:
+        # Hand polling over to a standby replica as soon as this one stops
+        application.post_shutdown = release_leases
     return application
@@ -0,0 +1,142 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from .anomaly import AnomalyDetector
+from .coc_api import CLAN_TAG
+from .database import DB_PATH, tenant_db_path
+from .diff import RosterState
+from .keyboards import MemberKeyboardCache
+from .leader import Lease
+from .logs import log_tenant
+from .profiling import RECENT_CYCLES
+from .projection import DayState, Projector
+from .search import NameIndex
+from .singleflight import SingleFlight
+from .subscriptions import normalize_tag
+from .utils import UTC_MINUS_5
+
+logger = logging.getLogger(__name__)
+
+# JSON file listing the clans to track; without it a single tenant is built from CLAN_TAG
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+# Every member is tracked and recorded, but clan-wide notifications only cover the top
+# NOTIFY_TOP_N members plus the tags in WATCHLIST; player subscriptions always notify
+NOTIFY_TOP_N = int(os.getenv('NOTIFY_TOP_N', '25'))
+WATCHLIST = {tag.strip().upper() for tag in os.getenv('WATCHLIST', '').split(',') if tag.strip()}
+
+# One tracked clan: its configuration plus all in-memory state its polling cycle and
+# interactive handlers work on. Nothing in here is shared with other tenants.
+class Tenant:
+    def __init__(self, clan_tag, chats=(), tz=UTC_MINUS_5, notify_top_n=NOTIFY_TOP_N, watchlist=WATCHLIST,
+                 loss_threshold=None, db_path=None):
+        self.clan_tag = clan_tag
+        self.chats = list(chats)
+        self.timezone = tz
+        self.notify_top_n = notify_top_n
+        self.watchlist = set(watchlist)
+        self.db_path = db_path
+
+        # Last full clan roster, keyed by player tag
+        self.roster = RosterState()
+        # Last seen (attackWins, defenseWins) counters from the player endpoint
+        self.player_counters = {}
+        # Rolling per-player statistics for unusual activity alerts
+        self.detector = AnomalyDetector(loss_threshold)
+        # Today's attack/defense counters for end-of-day projections
+        self.day_state = DayState()
+        self.projector = Projector(self.day_state)
+        # Folded name search over current members and their previous names
+        self.names = NameIndex()
+        self.keyboards = MemberKeyboardCache()
+        self.singleflight = SingleFlight()
+        # Stage timings of the latest polling cycles and daily resets
+        self.cycles = deque(maxlen=RECENT_CYCLES)
+        # Only the replica holding this lease polls the clan and sends its notifications
+        self.lease = Lease(f"poller:{clan_tag}")
+        # Held by the running cycle or daily reset, so they never work on the state above at once
+        self.job_lock = asyncio.Lock()
+
+    def __repr__(self):
+        return f"Tenant({self.clan_tag})"
+
+    def now(self):
+        return datetime.now(self.timezone)
+
+    # Point database access and log records of the current task at this tenant
+    def activate(self):
+        tenant_db_path.set(self.db_path)
+        log_tenant.set(self.clan_tag)
+        return self
+
+    # Call fn against this tenant's store without changing the caller's context
+    def call(self, fn, *args):
+        def run():
+            self.activate()
+            return fn(*args)
+        return contextvars.copy_context().run(run)
+
+# Maps chats to the tenant whose clan they follow. Chats not configured for any tenant
+# get the first one, as the single-clan bot did.
+class TenantRegistry:
+    def __init__(self, tenants):
+        if not tenants:
+            raise ValueError("At least one tenant must be configured.")
+        self.tenants = list(tenants)
+        self.by_clan = {tenant.clan_tag: tenant for tenant in self.tenants}
+        self.by_chat = {chat_id: tenant for tenant in self.tenants for chat_id in tenant.chats}
+
+    def __iter__(self):
+        return iter(self.tenants)
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def for_chat(self, chat_id):
+        return self.by_chat.get(chat_id, self.tenants[0])
+
+# Accept an IANA zone name ("America/New_York") or a fixed offset in hours (-5)
+def parse_timezone(value):
+    if value is None:
+        return UTC_MINUS_5
+    if isinstance(value, (int, float)):
+        return timezone(timedelta(hours=value))
+    return ZoneInfo(value)
+
+def tenant_from_config(config):
+    if not config.get('clan_tag'):
+        raise ValueError(f"Tenant entry without clan_tag: {config}")
+    clan_tag = normalize_tag(config['clan_tag'])
+    default_db = os.path.join(os.path.dirname(DB_PATH), f"clan_{clan_tag.lstrip('#')}.db")
+    tenant = Tenant(
+        clan_tag,
+        chats=[int(chat_id) for chat_id in config.get('chats', [])],
+        tz=parse_timezone(config.get('timezone')),
+        notify_top_n=int(config.get('notify_top_n', NOTIFY_TOP_N)),
+        watchlist={normalize_tag(tag) for tag in config.get('watchlist', [])},
+        loss_threshold=config.get('anomaly_loss_threshold'),
+        db_path=config.get('db_path', default_db),
+    )
+    # Kept so the tenant can be rebuilt in another process
+    tenant.config = dict(config, db_path=tenant.db_path)
+    return tenant
+
+# Load the tenant list from TENANTS_FILE, or fall back to one tenant for CLAN_TAG that keeps
+# using DB_PATH and the configured chat
+def load_tenants(path=TENANTS_FILE, chat_id=None):
+    if not path:
+        if not CLAN_TAG:
+            raise ValueError("Set CLAN_TAG, or TENANTS_FILE to track several clans.")
+        return TenantRegistry([tenant_from_config({'clan_tag': CLAN_TAG, 'chats': [chat_id] if chat_id else [], 'db_path': None})])
+
+    with open(path, encoding='utf-8') as tenants_file:
+        configs = json.load(tenants_file)
+    tenants = [tenant_from_config(config) for config in configs]
+    if len({tenant.clan_tag for tenant in tenants}) != len(tenants):
+        raise ValueError(f"Duplicate clan_tag in {path}.")
+    logger.info("Loaded %d tenants from %s.", len(tenants), path)
+    return TenantRegistry(tenants)
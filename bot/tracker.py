@@ -0,0 +1,304 @@
+import asyncio
+import html
+import logging
+import os
+from datetime import timedelta
+from .coc_api import fetch_clan_members, fetch_players, fetch_top_clan_trophies
+from .database import init_db_for_date, record_events
+from .diff import MemberJoined, MemberLeft, MemberRenamed, RankChanged, TrophyChange
+from .metrics import CYCLE_SECONDS, CYCLE_TIMEOUTS, JOBS_SKIPPED
+from .notifier import send_to_all, send_photo_to_all
+from .profiling import CycleTimer, stage
+from .projection import load_baseline, load_day_counts
+from .reconcile import counter_delta, split_delta
+from .search import load_name_rows
+from .utils import format_trophy_table, create_status_table_html
+
+logger = logging.getLogger(__name__)
+
+# Seconds a tenant's polling cycle may take before it is abandoned, so one slow clan
+# cannot hold up the shared event loop's other work indefinitely
+TENANT_CYCLE_TIMEOUT = float(os.getenv('TENANT_CYCLE_TIMEOUT', '40'))
+
+# Run one tenant's polling cycle under its time budget. Without the lease the cycle only
+# refreshes the state commands read, see follow_tenant.
+async def run_tenant_cycle(application, tenant):
+    # The next poll comes 45 s later anyway, so a cycle due during the daily reset is dropped
+    if tenant.job_lock.locked():
+        JOBS_SKIPPED.labels(f"check_{tenant.clan_tag}", 'busy').inc()
+        logger.info("Skipping trophy check for %s: its previous job is still running.", tenant.clan_tag)
+        return
+    tenant.activate()
+    if not tenant.lease.held:
+        logger.debug("Following %s: another replica holds its lease.", tenant.clan_tag)
+        async with tenant.job_lock:
+            try:
+                await asyncio.wait_for(follow_tenant(tenant), TENANT_CYCLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Roster refresh for %s exceeded %.0fs and was abandoned.", tenant.clan_tag, TENANT_CYCLE_TIMEOUT)
+        return
+    async with tenant.job_lock:
+        with CycleTimer('cycle', tenant) as timer:
+            try:
+                await asyncio.wait_for(check_trophy_differences(application, tenant), TENANT_CYCLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                timer.outcome = 'timeout'
+                CYCLE_TIMEOUTS.labels(tenant.clan_tag).inc()
+                logger.warning("Trophy check for %s exceeded %.0fs and was abandoned.", tenant.clan_tag, TENANT_CYCLE_TIMEOUT)
+            finally:
+                CYCLE_SECONDS.labels(tenant.clan_tag).observe(timer.elapsed())
+
+# Keep a follower's roster, name index and today's counters current without recording or
+# notifying anything: the roster comes from a read-only fetch, the counters from what the
+# lease holder stored. Commands keep answering, and on takeover the first cycle diffs
+# against a recent roster instead of starting from scratch.
+async def follow_tenant(tenant):
+    members = await asyncio.to_thread(fetch_clan_members, tenant.clan_tag)
+    if members is None:
+        return
+    today = tenant.now().date()
+    day_counts = await asyncio.to_thread(load_day_counts, today)
+    name_rows = await asyncio.to_thread(load_name_rows, today) if not tenant.names else None
+
+    records = tenant.roster.apply(members)
+    if name_rows is not None:
+        tenant.names.rebuild(tenant.roster.members.values())
+        tenant.names.load_history(name_rows)
+    else:
+        tenant.names.apply([record for record in records if isinstance(record, (MemberJoined, MemberLeft, MemberRenamed))])
+    tenant.day_state.seed(today, day_counts)
+    tenant.day_state.set_trophies(tenant.roster.members.values())
+    tenant.day_state.commit_cycle()
+    # Counters seen before the lease moved away would span events this replica never saw
+    tenant.player_counters.clear()
+
+# Function to calculate trophy differences and record attack/defend outcomes
+async def check_trophy_differences(application, tenant):
+    logger.info("Checking for trophy changes in %s...", tenant.clan_tag)
+    tenant.activate()
+    subscriptions = application.bot_data['subscriptions']
+    roster, names, day_state = tenant.roster, tenant.names, tenant.day_state
+    player_counters, detector = tenant.player_counters, tenant.detector
+    current_datetime = tenant.now()
+    date_str = current_datetime.strftime('%m%d')
+    # The API call runs in a worker thread so other tenants keep running meanwhile
+    members = await asyncio.to_thread(fetch_clan_members, tenant.clan_tag)
+    if members is None:
+        logger.error("Failed to fetch data for trophy differences check.")
+        return
+
+    # Nothing on the tenant changes until the events are stored: a cycle abandoned at its
+    # deadline leaves the previous roster in place and the next cycle picks up its changes
+    with stage('diff'):
+        current, records = roster.diff(members)
+        changes = [record for record in records if isinstance(record, TrophyChange)]
+        membership = [record for record in records if isinstance(record, (MemberJoined, MemberLeft, MemberRenamed))]
+        # Clan subscribers hear when a member enters or drops out of the notified top N
+        window_moves = [record for record in records if isinstance(record, RankChanged) and record.crosses(tenant.notify_top_n)]
+    name_rows = await asyncio.to_thread(load_name_rows, current_datetime.date()) if not names else None
+
+    split_changes = []
+    defense_wins = {}
+    new_counters = {}
+    recipients = {}
+    messages = {}
+    if changes:
+        for change in changes:
+            member = change.member
+            notify_clan = member.rank <= tenant.notify_top_n or member.tag in tenant.watchlist
+            recipients[member.tag] = subscriptions.recipients(tenant.clan_tag, member.tag, include_clan=notify_clan)
+        # Counters are only looked up for changed members someone is notified about, so
+        # the requests per cycle follow NOTIFY_TOP_N, the watchlist and player
+        # subscriptions rather than the roster size. The rest are split by the legend
+        # league ranges alone.
+        with stage('fetch'):
+            players = await asyncio.to_thread(fetch_players, [tag for tag, chats in recipients.items() if chats])
+
+        with stage('diff'):
+            for change in changes:
+                member = change.member
+                player = players.get(member.tag)
+                counters = (player.get('attackWins', 0), player.get('defenseWins', 0)) if player else None
+                attacks, defenses = counter_delta(player_counters.get(member.tag), counters)
+                if counters is not None:
+                    new_counters[member.tag] = counters
+                elif not recipients[member.tag]:
+                    # Not looked up; a later lookup must not diff against counters this old
+                    new_counters[member.tag] = None
+                defense_wins[member.tag] = defenses or 0
+                split_changes.append((member, split_delta(change.delta, attacks, defenses)))
+
+    def commit():
+        with stage('diff'):
+            roster.commit(current)
+            for tag, counters in new_counters.items():
+                if counters is None:
+                    player_counters.pop(tag, None)
+                else:
+                    player_counters[tag] = counters
+            day_state.roll_over(current_datetime.date())
+            day_state.set_trophies(current.values())
+            for member, events in split_changes:
+                for event in events:
+                    day_state.add_event(member.tag, member.name, event.event_type, event.trophies if event.event_type == 'attack' else -event.trophies)
+            day_state.commit_cycle()
+            if name_rows is not None:
+                names.rebuild(current.values())
+                names.load_history(name_rows)
+            else:
+                names.apply(membership)
+            for record in membership:
+                if isinstance(record, MemberLeft):
+                    player_counters.pop(record.member.tag, None)
+                    detector.forget(record.member.tag)
+
+    if split_changes:
+        notified = {tag for tag, chats in recipients.items() if chats}
+        # The day table is written and read in a worker thread, so a slow or locked database
+        # file holds up only this tenant. Once the write has started the tenant's state must
+        # follow it, so a deadline hit meanwhile waits for the write and then cancels.
+        recording = asyncio.ensure_future(asyncio.to_thread(record_cycle, date_str, current_datetime, split_changes, notified))
+        try:
+            messages = await asyncio.shield(recording)
+        except asyncio.CancelledError:
+            await recording
+            commit()
+            raise
+    commit()
+
+    if membership or window_moves:
+        with stage('render'):
+            message = render_membership_changes(membership + window_moves, tenant.notify_top_n)
+        await send_to_all(application.bot, subscriptions.clan_subscribers(tenant.clan_tag), message)
+    if not changes:
+        logger.info("No changes detected, no message sent.")
+        return
+
+    for member, events in split_changes:
+        if member.tag in messages:
+            await send_to_all(application.bot, recipients[member.tag], messages[member.tag])
+
+    timestamp = current_datetime.timestamp()
+    for member, events in split_changes:
+        with stage('diff'):
+            alerts = [
+                alert
+                for event in events
+                for alert in detector.observe(member.tag, member.name, timestamp, event.event_type,
+                                              event.trophies if event.event_type == 'attack' else -event.trophies)
+            ]
+            losses = sum(1 for event in events if event.event_type == 'defend' and event.trophies)
+            alerts += detector.observe_defenses(member.tag, member.name, defense_wins[member.tag], losses)
+        if alerts:
+            with stage('render'):
+                message = render_alerts(alerts)
+            await send_to_all(application.bot, subscriptions.recipients(tenant.clan_tag, member.tag), message)
+
+# Store a cycle's events and render the trophy messages of the notified members, with one
+# connection to the tenant's day table
+def record_cycle(date_str, current_datetime, split_changes, notified):
+    with stage('record'):
+        conn = init_db_for_date(date_str)
+    try:
+        with stage('record'):
+            record_events(conn, date_str, [
+                (member.tag, member.name, current_datetime, event.event_type, event.trophies, event.inferred)
+                for member, events in split_changes for event in events
+            ])
+        # Each message is rendered once, however many chats it goes to
+        with stage('render'):
+            return {
+                member.tag: render_trophy_change(conn, date_str, current_datetime, member, events)
+                for member, events in split_changes if member.tag in notified
+            }
+    finally:
+        conn.close()
+
+def render_alerts(alerts):
+    return "\n".join(f"⚠️ <b>{html.escape(alert.name)}</b> (<code>{html.escape(alert.tag)}</code>): {alert.message}" for alert in alerts)
+
+def render_membership_changes(records, top_n):
+    lines = []
+    for record in records:
+        safe_name = html.escape(record.member.name)
+        safe_tag = html.escape(record.member.tag)
+        if isinstance(record, MemberJoined):
+            lines.append(f"➕ <b>{safe_name}</b> (<code>{safe_tag}</code>) joined the clan with {record.member.trophies} trophies")
+        elif isinstance(record, MemberLeft):
+            lines.append(f"➖ <b>{safe_name}</b> (<code>{safe_tag}</code>) left the clan")
+        elif isinstance(record, RankChanged):
+            if record.member.rank <= top_n:
+                lines.append(f"⬆️ <b>{safe_name}</b> (<code>{safe_tag}</code>) moved into the top {top_n} at rank {record.member.rank}")
+            else:
+                lines.append(f"⬇️ <b>{safe_name}</b> (<code>{safe_tag}</code>) dropped out of the top {top_n} to rank {record.member.rank}")
+        else:
+            lines.append(f"✏️ <b>{html.escape(record.previous_name)}</b> (<code>{safe_tag}</code>) is now <b>{safe_name}</b>")
+    return "\n".join(lines)
+
+def format_event(event):
+    marker = '*' if event.inferred else ''
+    if event.event_type == 'attack':
+        return f"ATK win: <i>{event.trophies}{marker}</i>"
+    return f"DEF lost: <i>{-event.trophies}{marker}</i>"
+
+def render_trophy_change(conn, date_str, current_datetime, member, events):
+    safe_name = html.escape(member.name)
+    safe_tag = html.escape(member.tag)
+    return (
+        f"<b>{member.rank}. {safe_name}</b> (Tag: <code>{safe_tag}</code>): <b>{member.trophies} trophies</b> "
+        f"({', '.join(format_event(event) for event in events)})\n"
+        f"<b>Status Table:</b>\n{create_status_table_html(conn, member.tag, current_datetime.date(), date_str)}"
+    )
+
+# Load per-player averages for projections and restore today's counters; runs at
+# startup and after each daily reset
+async def refresh_projection_baseline(application, tenant):
+    tenant.activate()
+    day_state = tenant.day_state
+    async with tenant.job_lock:
+        today = tenant.now().date()
+        baseline = await asyncio.to_thread(load_baseline, today)
+        day_counts = await asyncio.to_thread(load_day_counts, today)
+        day_state.seed(today, day_counts)
+        day_state.set_baseline(baseline)
+    logger.info("Loaded projection baseline for %d players of %s.", len(baseline), tenant.clan_tag)
+
+# Function to reset player stats daily at the tenant's midnight
+async def reset_player_stats(application, tenant):
+    if not tenant.lease.held:
+        return
+    tenant.activate()
+    # Waits for a cycle in progress rather than skipping, the reset only comes once a day
+    async with tenant.job_lock:
+        with CycleTimer('reset', tenant):
+            await start_new_day(application, tenant)
+
+# Create the new day's tables and send the day's closing table and chart
+async def start_new_day(application, tenant):
+    recipients = application.bot_data['subscriptions'].clan_subscribers(tenant.clan_tag)
+    # The job runs just after midnight, so the day that ended is yesterday
+    ended_day = tenant.now().date() - timedelta(days=1)
+    new_day_date = tenant.now() + timedelta(days=1)
+
+    # Initialize new tables for the new day
+    with stage('record'):
+        conn = init_db_for_date(new_day_date.strftime('%m%d'))
+        logger.info("Resetting player stats for a new day.")
+        conn.close()
+
+    await send_to_all(application.bot, recipients, f"NEW LEGEND LEAGUE DAY START: {new_day_date.strftime('%Y-%m-%d')}", parse_mode=None)
+
+    # Send the top 25 players' trophy at the end of each day
+    top_members = await asyncio.to_thread(fetch_top_clan_trophies, tenant.clan_tag)
+    if top_members:
+        with stage('render'):
+            table = format_trophy_table(top_members)
+        await send_to_all(application.bot, recipients, table)
+        with stage('render'):
+            from .charts import render_clan_chart  # loads matplotlib, which the polling path never needs
+            chart_path = await asyncio.to_thread(render_clan_chart, top_members[:15], ended_day)
+        if chart_path:
+            await send_photo_to_all(application.bot, recipients, chart_path, caption=f"Trophy progression {ended_day:%Y-%m-%d}")
+    else:
+        logger.error("Failed to fetch top clan members during daily reset.")
+        await send_to_all(application.bot, recipients, "Failed to fetch top clan members.", parse_mode=None)
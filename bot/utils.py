@@ -0,0 +1,56 @@
+from datetime import timedelta, timezone
+
+# Define the UTC-5 timezone
+UTC_MINUS_5 = timezone(timedelta(hours=-5))
+
+# Function to format the trophy list as a table with reordered columns
+def format_trophy_table(members):
+    table_message = "<pre>"
+    table_message += "╔═══╤════════╤═════════════════════\n"
+    table_message += "║ # │ Trophy │ Name                \n"
+    table_message += "╠═══╪════════╪═════════════════════\n"
+
+    for idx, member in enumerate(members, start=1):
+        name = member['name'][:25]  # Truncate names to fit within the table
+        trophies = member['trophies']
+        table_message += f"║{idx:<2} │ {trophies:^7}│ {name:<25}\n"
+
+    table_message += "╚═══╧════════╧═════════════════════\n"
+    table_message += "</pre>"
+
+    return table_message
+
+# Function to create a table-like message for player status with HTML formatting
+def create_status_table_html(conn, tag, date, date_str):
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT event_type, trophy_change, inferred FROM player_events_{date_str} WHERE tag = ? AND date = ?', (tag, date))
+    rows = cursor.fetchall()
+
+    # Separate attacks and defends
+    attack_rows = [row for row in rows if row[0] == 'attack']
+    defend_rows = [row for row in rows if row[0] == 'defend']
+
+    total_attack_trophies = sum(row[1] for row in attack_rows)
+    total_defend_trophies = sum(row[1] for row in defend_rows)
+    net_trophy_gain = total_attack_trophies + total_defend_trophies
+
+    table_message = "<pre>"
+    table_message += "╔════════════════╤════════════════\n"
+    table_message += f"║ Attacks: {total_attack_trophies:^6}│ Defends: {total_defend_trophies:^6} \n"
+    table_message += "╠════════════════╪════════════════\n"
+
+    # Dynamically add rows for each attack and defense; inferred values are marked with *
+    attack_lines = [f"{row[1]}*" if row[2] else str(row[1]) for row in attack_rows]
+    defend_lines = [f"{row[1]}*" if row[2] else str(row[1]) for row in defend_rows]
+    max_lines = max(len(attack_lines), len(defend_lines))
+    for i in range(max_lines):
+        attack_value = attack_lines[i] if i < len(attack_lines) else ''
+        defend_value = defend_lines[i] if i < len(defend_lines) else ''
+        table_message += f"║ {attack_value:^14} │ {defend_value:^14}\n"
+
+    table_message += "╠════════════════╧════════════════\n"
+    table_message += f"║ Net Gain: {net_trophy_gain:^15} \n"
+    table_message += "╚═════════════════════════════════\n"
+    table_message += "</pre>"
+
+    return table_message
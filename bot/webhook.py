@@ -0,0 +1,30 @@
+import os
+import re
+import secrets
+
+# Telegram only accepts 1-256 characters from A-Z, a-z, 0-9, _ and - as a secret token
+SECRET_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,256}$')
+
+def webhook_enabled():
+    return bool(os.getenv('WEBHOOK_URL'))
+
+# Collect the webhook settings from the environment as keyword arguments for
+# Application.run_webhook / Updater.start_webhook
+def webhook_settings():
+    base_url = os.getenv('WEBHOOK_URL')
+    if not base_url:
+        raise ValueError("WEBHOOK_URL must be set to run in webhook mode.")
+
+    url_path = os.getenv('WEBHOOK_PATH', 'telegram').strip('/')
+    # Without a configured secret a fresh one is generated, since the webhook is re-registered on every start
+    secret_token = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+    if not SECRET_TOKEN_PATTERN.match(secret_token):
+        raise ValueError("WEBHOOK_SECRET may only contain 1-256 characters from A-Z, a-z, 0-9, _ and -.")
+
+    return {
+        'listen': os.getenv('WEBHOOK_LISTEN', '127.0.0.1'),
+        'port': int(os.getenv('WEBHOOK_PORT', '8443')),
+        'url_path': url_path,
+        'webhook_url': f"{base_url.rstrip('/')}/{url_path}",
+        'secret_token': secret_token,
+    }
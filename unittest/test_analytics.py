@@ -0,0 +1,42 @@
+import numpy as np
+from datetime import date
+from bot.analytics import SeasonEvents, compute_season_stats, format_season_report, group_median
+
+def make_events():
+    # Player 0: day 0 +40, -10; day 1 +20, -40.  Player 1: day 1 +30 only.
+    return SeasonEvents(
+        tags=np.array(['#A', '#B']),
+        names=['Alice', 'Bob'],
+        days=[date(2024, 8, 1), date(2024, 8, 2)],
+        player=np.array([0, 0, 0, 0, 1], dtype=np.int32),
+        day=np.array([0, 0, 1, 1, 1], dtype=np.int32),
+        is_attack=np.array([True, False, True, False, True]),
+        change=np.array([40, -10, 20, -40, 30]),
+    )
+
+def test_group_median_handles_even_odd_and_empty_groups():
+    medians = group_median(np.array([0, 0, 2, 2, 2]), np.array([1, 3, 9, 5, 7]), 3)
+    assert medians[0] == 2
+    assert np.isnan(medians[1])
+    assert medians[2] == 7
+
+def test_season_stats():
+    stats = compute_season_stats(make_events())
+
+    assert list(stats['attack_count']) == [2, 1]
+    assert list(stats['net']) == [10, 30]
+    assert stats['attack_avg'][0] == 30
+    assert np.isnan(stats['defend_avg'][1])
+    assert stats['triple_rate'][0] == 0.5
+    assert stats['hold_rate'][0] == 0.5
+    assert list(stats['best_day']) == [0, 1]
+    assert list(stats['worst_day']) == [1, 1]
+    assert stats['daily_net'].tolist() == [[30, -20], [0, 30]]
+    assert stats['clan']['attacks'] == 3
+    assert stats['clan']['best_day'] == 0
+
+def test_report_orders_players_by_net():
+    events = make_events()
+    lines = list(format_season_report(events, compute_season_stats(events)))
+    assert lines[-2].startswith('Bob')
+    assert lines[-1].startswith('Alice')
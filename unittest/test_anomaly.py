@@ -0,0 +1,48 @@
+from bot import anomaly
+from bot.anomaly import AnomalyDetector
+
+def test_rolling_loss_alerts_once_per_streak():
+    detector = AnomalyDetector()
+    kinds = []
+    for minute in range(0, 60, 10):
+        kinds += [alert.kind for alert in detector.observe('#A', 'A', minute * 60, 'defend', -40)]
+
+    assert kinds.count('rolling_loss') == 1
+
+def test_rolling_window_expires_old_events():
+    detector = AnomalyDetector()
+    for hour in range(6):
+        alerts = detector.observe('#A', 'A', hour * 3600, 'defend', -40)
+        assert not [alert for alert in alerts if alert.kind == 'rolling_loss']
+    assert detector.streams['#A'].window_sum == -40
+
+def test_zscore_flags_outliers_after_warmup():
+    detector = AnomalyDetector()
+    for idx in range(anomaly.WARMUP_EVENTS):
+        assert detector.observe('#A', 'A', idx, 'attack', 30 + idx % 3) == []
+
+    alerts = detector.observe('#A', 'A', 100, 'attack', 5)
+    assert [alert.kind for alert in alerts] == ['zscore']
+
+def test_attacks_and_defenses_keep_separate_statistics():
+    detector = AnomalyDetector(loss_threshold=10_000)
+    for idx in range(anomaly.WARMUP_EVENTS):
+        detector.observe('#A', 'A', idx, 'attack', 30 + idx % 3)
+        detector.observe('#A', 'A', idx, 'defend', -(20 + idx % 5))
+
+    assert detector.observe('#A', 'A', 100, 'defend', -24) == []
+    assert detector.observe('#A', 'A', 101, 'attack', 31) == []
+    assert [alert.kind for alert in detector.observe('#A', 'A', 102, 'defend', -2)] == ['zscore']
+
+def test_perfect_defense_streak_follows_defense_wins_and_forget():
+    detector = AnomalyDetector()
+
+    assert detector.observe_defenses('#A', 'A', wins=2, losses=0) == []
+    assert [alert.kind for alert in detector.observe_defenses('#A', 'A', wins=1, losses=0)] == ['perfect_defenses']
+    # Alerts once per streak, and a defense that costs trophies starts a new one
+    assert detector.observe_defenses('#A', 'A', wins=1, losses=0) == []
+    assert detector.observe_defenses('#A', 'A', wins=2, losses=1) == []
+    assert [alert.message for alert in detector.observe_defenses('#A', 'A', wins=2, losses=0)] == ["4 perfect defenses in a row"]
+
+    detector.forget('#A')
+    assert detector.streams == {}
@@ -0,0 +1,61 @@
+import os
+from datetime import date, datetime
+from unittest.mock import patch
+import pytest
+from bot import charts, database
+from bot.charts import render_clan_chart, render_player_chart
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'charts.db'))
+    monkeypatch.setattr(charts, 'CHART_CACHE_DIR', str(tmp_path / 'cache'))
+
+    def record(day, events):
+        date_str = day.strftime('%m%d')
+        database.init_db_for_date(date_str).close()
+        conn = database.connect_db()
+        database.record_events(conn, date_str, events)
+        conn.close()
+    record(date(2024, 8, 1), [
+        ('#A', 'Alice', datetime(2024, 8, 1, 10, 0), 'attack', 32, False),
+        ('#B', 'Bob', datetime(2024, 8, 1, 10, 5), 'defend', 20, False),
+        ('#A', 'Alice', datetime(2024, 8, 1, 11, 0), 'defend', 12, False),
+    ])
+    record(date(2024, 8, 2), [('#A', 'Alice', datetime(2024, 8, 2, 9, 0), 'attack', 30, False)])
+    return record
+
+def test_player_chart_spans_days_and_is_rendered_once(store):
+    path = render_player_chart('#A', 'Alice', date(2024, 8, 1), date(2024, 8, 2), 5050)
+
+    assert path and os.path.getsize(path) > 0
+    with open(path, 'rb') as image:
+        assert image.read(8) == b'\x89PNG\r\n\x1a\n'
+    with patch.object(charts, 'save_figure') as save_figure:
+        assert render_player_chart('#A', 'Alice', date(2024, 8, 1), date(2024, 8, 2), 5050) == path
+    save_figure.assert_not_called()
+
+def test_new_events_change_the_cache_key(store):
+    first = render_player_chart('#A', 'Alice', date(2024, 8, 1), date(2024, 8, 2))
+    store(date(2024, 8, 2), [('#A', 'Alice', datetime(2024, 8, 2, 12, 0), 'defend', 8, False)])
+
+    second = render_player_chart('#A', 'Alice', date(2024, 8, 1), date(2024, 8, 2))
+
+    assert second != first and os.path.exists(first) and os.path.exists(second)
+
+def test_clan_chart_and_players_without_events(store):
+    members = [{'tag': '#A', 'name': 'Alice'}, {'tag': '#B', 'name': 'Bob'}]
+
+    path = render_clan_chart(members, date(2024, 8, 1))
+
+    assert path and os.path.exists(path)
+    assert render_clan_chart(members, date(2024, 8, 5)) is None
+    assert render_player_chart('#C', 'Carol', date(2024, 8, 1), date(2024, 8, 2)) is None
+
+def test_cache_keeps_the_newest_files(store, monkeypatch):
+    paths = [render_player_chart('#A', 'Alice', date(2024, 8, 1), date(2024, 8, 2), trophies) for trophies in (5000, 5001, 5002)]
+    for offset, path in enumerate(paths):
+        os.utime(path, (offset, offset))
+    monkeypatch.setattr(charts, 'CHART_CACHE_MAX_FILES', 2)
+    charts.prune_chart_cache()
+
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
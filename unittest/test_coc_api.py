@@ -0,0 +1,64 @@
+import time
+import pytest
+from bot import coc_api
+from benchmarks.fake_coc_api import ClanSimulator, FakeCocAPI
+
+@pytest.fixture
+def simulated_api(monkeypatch):
+    clan = ClanSimulator('#SIM', 30, activity=0.5)
+    api = FakeCocAPI([clan]).start()
+    monkeypatch.setattr(coc_api, 'API_BASE_URL', api.base_url)
+    yield api, clan
+    api.stop()
+
+def test_members_and_players_come_from_the_configured_base(simulated_api):
+    api, clan = simulated_api
+
+    members = coc_api.fetch_clan_members('#SIM')
+    players = coc_api.fetch_players([member['tag'] for member in members[:5]])
+
+    assert len(members) == len(clan.members)
+    assert [member['trophies'] for member in members] == sorted((member['trophies'] for member in members), reverse=True)
+    assert set(players) == {member['tag'] for member in members[:5]}
+    assert all('attackWins' in player for player in players.values())
+    assert api.requests['clans'] == 1 and api.requests['players'] == 5
+
+def test_every_fetch_advances_the_simulation(simulated_api):
+    _, clan = simulated_api
+
+    first = {member['tag']: member['trophies'] for member in coc_api.fetch_clan_members('#SIM')}
+    second = {member['tag']: member['trophies'] for member in coc_api.fetch_clan_members('#SIM')}
+
+    assert clan.steps == 2
+    assert any(first.get(tag) != trophies for tag, trophies in second.items())
+
+def test_failed_requests_return_none(simulated_api):
+    api, _ = simulated_api
+    assert coc_api.fetch_clan_members('#MISSING') is None
+
+    api.error_rate = 1
+    assert coc_api.fetch_clan_members('#SIM') is None
+    assert coc_api.fetch_player('#SIMP0001') is None
+
+def test_players_who_left_are_not_found(simulated_api):
+    api, clan = simulated_api
+    tag = next(iter(clan.members))
+    assert api.player_clans[tag] is clan
+
+    clan.leave(tag)
+
+    assert coc_api.fetch_player(tag) is None
+    assert tag not in api.player_clans
+
+def test_hung_requests_give_up_at_the_timeout(simulated_api, monkeypatch):
+    api, clan = simulated_api
+    tags = list(clan.members)[:3]
+    api.latency = 2
+    monkeypatch.setattr(coc_api, 'API_TIMEOUT', (1, 0.2))
+    monkeypatch.setattr(coc_api, 'PLAYER_BATCH_TIMEOUT', 0.3)
+
+    started = time.perf_counter()
+    assert coc_api.fetch_clan_members('#SIM') is None
+    assert coc_api.fetch_players(tags) == {}
+
+    assert time.perf_counter() - started < 1
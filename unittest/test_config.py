@@ -0,0 +1,32 @@
+import json
+import pytest
+from bot.config import validate_config
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ('TENANTS_FILE', 'CLAN_TAG', 'CONCURRENT_UPDATES', 'LEASE_TTL_SECONDS', 'LEASE_RENEW_SECONDS'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('TELEGRAM_TEST_TOKEN', '123:abc')
+    monkeypatch.setenv('API_KEY', 'key')
+    return monkeypatch
+
+def test_valid_single_clan_config(env):
+    env.setenv('CLAN_TAG', '#CLAN')
+    assert validate_config() == []
+
+def test_reports_every_problem_at_once(env):
+    env.delenv('API_KEY')
+    env.setenv('CONCURRENT_UPDATES', 'many')
+    env.setenv('LEASE_RENEW_SECONDS', '60')
+
+    errors = validate_config()
+
+    assert len(errors) == 4
+    assert "API_KEY is not set." in errors
+    assert any('CONCURRENT_UPDATES' in error for error in errors)
+
+def test_tenants_file_entries_need_a_clan_tag(env, tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([{'clan_tag': '#A'}, {'chats': [1]}]))
+    env.setenv('TENANTS_FILE', str(path))
+    assert validate_config() == ["TENANTS_FILE entry 2 needs a clan_tag."]
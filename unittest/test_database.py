@@ -0,0 +1,42 @@
+import sqlite3
+from datetime import datetime
+from bot import database
+
+def stats_rows(path, date_str):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(f"SELECT tag, name, date, total_attacks, total_defends, net_gain FROM player_stats_{date_str} ORDER BY tag").fetchall()
+    conn.close()
+    return rows
+
+def test_a_batch_is_recorded_with_one_stats_row_per_player(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'events.db'))
+    conn = database.init_db_for_date('0801')
+    database.record_events(conn, '0801', [
+        ('#A', 'Alice', datetime(2024, 8, 1, 10, 0), 'attack', 32, False),
+        ('#A', 'Alice', datetime(2024, 8, 1, 10, 0), 'defend', 12, True),
+        ('#B', 'Bob', datetime(2024, 8, 1, 10, 0), 'defend', 40, False),
+    ])
+
+    events = conn.execute("SELECT tag, time, event_type, trophy_change, inferred FROM player_events_0801 ORDER BY id").fetchall()
+    assert events == [('#A', '10:00:00', 'attack', 32, 0), ('#A', '10:00:00', 'defend', -12, 1), ('#B', '10:00:00', 'defend', -40, 0)]
+    assert stats_rows(database.DB_PATH, '0801') == [('#A', 'Alice', '2024-08-01', 1, 1, 20), ('#B', 'Bob', '2024-08-01', 0, 1, -40)]
+
+    # A later batch rebuilds the touched players' rows instead of adding more
+    database.record_events(conn, '0801', [
+        ('#A', 'Alice', datetime(2024, 8, 1, 11, 0), 'attack', 28, False),
+        ('#C', 'Cara', datetime(2024, 8, 1, 11, 0), 'attack', 35, False),
+    ])
+    conn.close()
+
+    assert stats_rows(database.DB_PATH, '0801') == [
+        ('#A', 'Alice', '2024-08-01', 2, 1, 48), ('#B', 'Bob', '2024-08-01', 0, 1, -40), ('#C', 'Cara', '2024-08-01', 1, 0, 35),
+    ]
+
+def test_an_empty_batch_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'events.db'))
+    conn = database.init_db_for_date('0801')
+
+    database.record_events(conn, '0801', [])
+
+    assert conn.execute("SELECT COUNT(*) FROM player_events_0801").fetchone() == (0,)
+    conn.close()
@@ -0,0 +1,27 @@
+from bot.diff import MemberJoined, MemberLeft, MemberRenamed, RankChanged, RosterState, TrophyChange, diff_rosters, snapshot_roster
+
+def member(tag, name, trophies):
+    return {'tag': tag, 'name': name, 'trophies': trophies}
+
+def test_diff_detects_every_change_type():
+    previous = snapshot_roster([member('#A', 'Alice', 5100), member('#B', 'Bob', 5000), member('#C', 'Carl', 4900)])
+    current = snapshot_roster([member('#B', 'Bobby', 5200), member('#A', 'Alice', 5100), member('#D', 'Dana', 4800)])
+
+    records = diff_rosters(previous, current)
+    by_type = {type(record): [r for r in records if type(r) is type(record)] for record in records}
+
+    assert [r.member.tag for r in by_type[MemberJoined]] == ['#D']
+    assert [r.member.tag for r in by_type[MemberLeft]] == ['#C']
+    assert by_type[MemberRenamed][0].previous_name == 'Bob'
+    assert by_type[TrophyChange][0].delta == 200
+    assert sorted((r.member.tag, r.previous_rank, r.member.rank) for r in by_type[RankChanged]) == [('#A', 1, 2), ('#B', 2, 1)]
+    assert [r.member.tag for r in by_type[RankChanged] if r.crosses(1)] == ['#B', '#A']
+
+def test_roster_state_uses_first_snapshot_as_baseline_and_evicts_departed():
+    roster = RosterState()
+    assert roster.apply([member('#A', 'Alice', 5100), member('#B', 'Bob', 5000)]) == []
+
+    records = roster.apply([member('#A', 'Alice', 5120)])
+
+    assert [type(r) for r in records] == [TrophyChange, MemberLeft]
+    assert list(roster.members) == ['#A']
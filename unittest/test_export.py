@@ -0,0 +1,41 @@
+import csv
+import gzip
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from bot import database
+from bot.export import export_range
+
+def seed(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'export.db'))
+    database.init_db_for_date('0801')
+    conn = database.connect_db()
+    database.record_events(conn, '0801', [
+        ('#A', 'Alice', datetime(2024, 8, 1, 10, 0), 'attack', 32, False),
+        ('#A', 'Alice', datetime(2024, 8, 1, 11, 0), 'defend', 12, True),
+    ])
+    conn.close()
+
+def test_zip_export_contains_events_and_stats(tmp_path, monkeypatch):
+    seed(tmp_path, monkeypatch)
+    path = str(tmp_path / 'out.zip')
+
+    counts = export_range(path, date(2024, 8, 1), date(2024, 8, 3), clan_tag='#CLAN')
+
+    assert counts == {'events': 2, 'stats': 1}
+    with zipfile.ZipFile(path) as archive:
+        events = list(csv.DictReader(io.TextIOWrapper(archive.open('events.csv'), encoding='utf-8')))
+        stats = list(csv.DictReader(io.TextIOWrapper(archive.open('stats.csv'), encoding='utf-8')))
+    assert [(e['event_type'], e['trophy_change'], e['inferred']) for e in events] == [('attack', '32', '0'), ('defend', '-12', '1')]
+    assert events[0]['clan'] == '#CLAN'
+    assert stats[0]['net_gain'] == '20'
+
+def test_gzip_json_export_of_single_table(tmp_path, monkeypatch):
+    seed(tmp_path, monkeypatch)
+    path = str(tmp_path / 'stats.jsonl.gz')
+
+    assert export_range(path, date(2024, 8, 1), date(2024, 8, 1), fmt='json', table='stats') == {'stats': 1}
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+        rows = [json.loads(line) for line in stream]
+    assert rows[0]['tag'] == '#A' and rows[0]['total_attacks'] == 1
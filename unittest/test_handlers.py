@@ -0,0 +1,127 @@
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import pytest
+from bot import database, handlers, tracker
+from bot.tenants import Tenant, TenantRegistry
+
+def make_update(chat_id=1, user_id=1):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_user=SimpleNamespace(id=user_id),
+        message=SimpleNamespace(reply_text=AsyncMock()),
+    )
+
+def make_context(tenants, *args):
+    return SimpleNamespace(args=list(args), bot=None, bot_data={'tenants': tenants})
+
+def replies(update):
+    return [call.args[0] for call in update.message.reply_text.await_args_list]
+
+@pytest.fixture
+def tenant(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'shared.db'))
+    tenant = Tenant('#CLAN', chats=[1], db_path=str(tmp_path / 'clan.db'))
+    today = tenant.now().replace(hour=10, minute=0, second=0, microsecond=0, tzinfo=None)
+    for when, events in ((today - timedelta(days=1), [('#A', 'Alice', 'attack', 32), ('#B', 'Bob', 'defend', 18)]),
+                         (today, [('#A', 'Alice', 'defend', 12), ('#A', 'Alice', 'attack', 30)])):
+        def record(when=when, events=events):
+            date_str = when.strftime('%m%d')
+            database.init_db_for_date(date_str).close()
+            conn = database.connect_db()
+            database.record_events(conn, date_str, [(tag, name, when, kind, trophies, False) for tag, name, kind, trophies in events])
+            conn.close()
+        tenant.call(record)
+    return tenant
+
+# Records the threads the wrapped function runs on, to check work is kept off the event loop
+def on_thread(monkeypatch, name):
+    threads = []
+    original = getattr(handlers, name)
+
+    def wrapper(*args):
+        threads.append(threading.current_thread())
+        return original(*args)
+    monkeypatch.setattr(handlers, name, wrapper)
+    return threads
+
+@pytest.mark.asyncio
+async def test_history_for_a_player_and_the_clan(tenant, monkeypatch):
+    threads = on_thread(monkeypatch, 'history_pages')
+    tenants = TenantRegistry([tenant])
+
+    player, clan = make_update(), make_update()
+    await handlers.history_command(player, make_context(tenants, '#a', '3'))
+    await handlers.history_command(clan, make_context(tenants))
+
+    [page] = replies(player)
+    assert page.startswith("<b>History for Alice (#A), last 3 days</b>")
+    assert "1x   +30 │ 1x   -12 │   +18" in page
+    [page] = replies(clan)
+    assert "Bob" in page and page.count("── ") == 2
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+
+@pytest.mark.asyncio
+async def test_history_without_events(tenant):
+    update = make_update()
+
+    await handlers.history_command(update, make_context(TenantRegistry([tenant]), '#QQQ'))
+
+    assert replies(update) == ["No events recorded for #QQQ in the last 7 days."]
+
+@pytest.mark.asyncio
+async def test_season_report_is_built_off_the_event_loop(tenant, monkeypatch):
+    threads = on_thread(monkeypatch, 'season_pages')
+    update = make_update()
+
+    await handlers.season_command(update, make_context(TenantRegistry([tenant]), '7'))
+
+    [page] = replies(update)
+    assert page.startswith("<b>Season report ")
+    assert "Days: 2  Events: 4" in page and "Alice" in page and "Bob" in page
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+
+@pytest.mark.asyncio
+async def test_season_without_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'empty.db'))
+    update = make_update()
+
+    await handlers.season_command(update, make_context(TenantRegistry([Tenant('#CLAN', chats=[1])])))
+
+    assert replies(update) == ["No events recorded in the last 30 days."]
+
+@pytest.mark.asyncio
+async def test_followers_answer_from_the_stored_data(tenant, monkeypatch):
+    members = [{'tag': '#A', 'name': 'Alice', 'trophies': 5318}, {'tag': '#B', 'name': 'Bob', 'trophies': 5100}]
+    monkeypatch.setattr(tracker, 'fetch_clan_members', lambda clan_tag: members)
+    tenants = TenantRegistry([tenant])
+    assert not tenant.lease.held
+
+    await tracker.run_tenant_cycle(None, tenant)
+
+    status = make_update()
+    await handlers.status_command(status, make_context(tenants, 'ali'))
+    assert "Net Gain:       18" in replies(status)[0]
+    projection = make_update()
+    await handlers.projection_command(projection, make_context(tenants))
+    assert "Alice" in replies(projection)[0] and "Bob" in replies(projection)[0]
+    inline = SimpleNamespace(inline_query=SimpleNamespace(query='ali', answer=AsyncMock()))
+    await handlers.inline_status(inline, make_context(tenants))
+    [result] = inline.inline_query.answer.await_args.args[0]
+    assert "#1 with 5318 trophies, today 1 attacks / 1 defenses (+18)" in result.input_message_content.message_text
+    # Nothing was recorded or sent by the follower
+    assert tenant.player_counters == {} and not tenant.cycles
+
+@pytest.mark.asyncio
+async def test_debug_cycles_needs_an_admin_user(monkeypatch):
+    monkeypatch.setattr(handlers, 'ADMIN_USER_IDS', {42})
+    tenants = TenantRegistry([Tenant('#CLAN', chats=[1])])
+    anonymous, admin = make_update(), make_update(user_id=42)
+    anonymous.effective_user = None
+
+    await handlers.debug_last_cycles(anonymous, make_context(tenants))
+    await handlers.debug_last_cycles(admin, make_context(tenants))
+
+    assert replies(anonymous) == ["This command is only available to bot admins."]
+    assert replies(admin) == ["<pre>No cycles recorded yet.</pre>"]
@@ -0,0 +1,34 @@
+from bot.keyboards import MemberKeyboardCache
+
+def make_members(count):
+    return [{'tag': f"#TAG{idx:05d}", 'name': f"Player {idx}", 'trophies': 6000 - idx} for idx in range(count)]
+
+def test_pages_are_cached_until_order_changes():
+    cache = MemberKeyboardCache(page_size=10)
+    members = make_members(25)
+    cache.update(members)
+    first = cache.markup(0)
+
+    # Trophy changes that keep the order reuse the cached markup
+    cache.update([dict(member, trophies=member['trophies'] + 5) for member in members])
+    assert cache.markup(0) is first
+
+    cache.update(list(reversed(members)))
+    assert cache.markup(0) is not first
+
+def test_navigation_and_page_bounds():
+    cache = MemberKeyboardCache(page_size=10)
+    cache.update(make_members(25))
+
+    assert cache.page_count == 3
+    last_page = cache.markup(99).inline_keyboard
+    assert len(last_page) == 6  # 5 members plus the navigation row
+    assert [button.callback_data for button in last_page[-1]] == ['members_1', 'members_2']
+
+def test_callback_data_fits_telegram_limit():
+    cache = MemberKeyboardCache()
+    cache.update(make_members(50))
+    for page in range(cache.page_count):
+        for row in cache.markup(page).inline_keyboard:
+            for button in row:
+                assert len(button.callback_data.encode('utf-8')) <= 64
@@ -0,0 +1,43 @@
+import pytest
+from bot import database, tracker
+from bot.leader import Lease
+from bot.tenants import Tenant
+
+@pytest.fixture
+def shared_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'shared.db'))
+
+def test_only_one_replica_holds_a_lease(shared_db):
+    first = Lease('poller:#CLAN', holder='replica-1')
+    second = Lease('poller:#CLAN', holder='replica-2')
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.acquire()  # renewal by the holder
+    assert not second.held
+
+def test_expired_or_released_lease_is_taken_over(shared_db):
+    first = Lease('poller:#CLAN', holder='replica-1', ttl=-1)
+    second = Lease('poller:#CLAN', holder='replica-2')
+
+    first.acquire()
+    assert second.acquire()
+    assert not Lease('poller:#CLAN', holder='replica-1').acquire()
+    second.release()
+    assert Lease('poller:#CLAN', holder='replica-1').acquire()
+
+@pytest.mark.asyncio
+async def test_follower_refreshes_its_roster_but_does_not_poll(shared_db, monkeypatch):
+    tenant = Tenant('#CLAN')
+    tenant.lease = Lease('poller:#CLAN', holder='replica-2')
+    Lease('poller:#CLAN', holder='replica-1').acquire()
+    tenant.lease.acquire()
+
+    def fail(*args):
+        raise AssertionError("follower polled")
+    monkeypatch.setattr(tracker, 'check_trophy_differences', fail)
+    monkeypatch.setattr(tracker, 'fetch_clan_members', lambda clan_tag: [{'tag': '#A', 'name': 'Alice', 'trophies': 5000}])
+    await tracker.run_tenant_cycle(None, tenant)
+
+    assert tenant.roster.members['#A'].trophies == 5000
+    assert tenant.names.search('alice') == ['#A']
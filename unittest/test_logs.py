@@ -0,0 +1,89 @@
+import atexit
+import io
+import json
+import logging
+import pytest
+from bot import logs
+from bot.logs import SamplingFilter, parse_sampling, setup_logging
+from bot.profiling import CycleTimer
+from bot.tenants import Tenant
+
+@pytest.fixture
+def captured():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stream = io.StringIO()
+    listener = setup_logging(logging.INFO, fmt='json', label='shard-0', stream=stream)
+
+    def records():
+        atexit.unregister(listener.stop)
+        listener.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+    yield records
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def test_records_carry_tenant_and_cycle_ids(captured):
+    logger = logging.getLogger('bot.test')
+    tenant = Tenant('#LOGS')
+
+    def run():
+        tenant.activate()
+        with CycleTimer('cycle', tenant) as timer:
+            logger.info("Checking %s", tenant.clan_tag)
+        return timer.id
+    cycle_id = tenant.call(run)
+    logger.info("Outside")
+
+    inside, outside = captured()
+    assert inside['message'] == "Checking #LOGS"
+    assert inside['tenant'] == '#LOGS' and inside['cycle'] == cycle_id
+    assert inside['process'] == 'shard-0' and inside['logger'] == 'bot.test'
+    assert 'tenant' not in outside and 'cycle' not in outside
+
+def test_messages_are_not_formatted_below_the_level(captured):
+    formatted = []
+
+    class Table:
+        def __init__(self, level):
+            self.level = level
+
+        def __str__(self):
+            formatted.append(self.level)
+            return "<pre>table</pre>"
+
+    logging.getLogger('bot.test').debug("Sending message: %s", Table('debug'))
+    logging.getLogger('bot.test').info("Sending message: %s", Table('info'))
+
+    [record] = captured()
+    assert record['message'] == "Sending message: <pre>table</pre>"
+    assert 'debug' not in formatted
+
+def test_exceptions_are_kept_apart_from_the_message(captured):
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logging.getLogger('bot.test').exception("Cycle failed")
+
+    [record] = captured()
+    assert record['message'] == "Cycle failed"
+    assert 'RuntimeError: boom' in record['exception']
+
+def test_sampling_keeps_one_in_n_debug_records_per_logger():
+    sampler = SamplingFilter(parse_sampling('bot.coc_api=10,telegram=3'))
+
+    def kept(name, level, count):
+        return sum(sampler.filter(logging.LogRecord(name, level, __file__, 1, "msg", None, None)) for _ in range(count))
+
+    assert kept('bot.coc_api', logging.DEBUG, 100) == 10
+    assert kept('telegram.ext.Application', logging.DEBUG, 9) == 3
+    assert kept('bot.coc_api', logging.INFO, 5) == 5
+    assert kept('bot.tracker', logging.DEBUG, 5) == 5
+
+def test_invalid_sampling_rate_is_rejected():
+    with pytest.raises(ValueError):
+        parse_sampling('bot.coc_api=often')
+    assert logs.parse_sampling('') == {}
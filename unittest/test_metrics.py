@@ -0,0 +1,80 @@
+import urllib.request
+import pytest
+from bot import metrics
+from bot.metrics import Counter, Gauge, Histogram, timed_send
+
+@pytest.fixture(autouse=True)
+def isolated_registry(monkeypatch):
+    monkeypatch.setattr(metrics, 'REGISTRY', [])
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram('test_seconds', "Test latency.", ['endpoint'], buckets=(0.1, 1))
+    child = latency.labels('clan')
+    for value in (0.05, 0.5, 0.5, 3):
+        child.observe(value)
+
+    lines = metrics.render().splitlines()
+
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{endpoint="clan",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{endpoint="clan",le="1"} 3' in lines
+    assert 'test_seconds_bucket{endpoint="clan",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{endpoint="clan"} 4.05' in lines
+    assert 'test_seconds_count{endpoint="clan"} 4' in lines
+
+def test_counters_and_gauges_render_with_escaped_labels():
+    responses = Counter('test_total', "Test responses.", ['status'])
+    responses.labels('5"03').inc()
+    responses.labels('5"03').inc(2)
+    depth = Gauge('test_depth', "Test depth.", ['queue'])
+    depth.labels('updates').set_function(lambda: 7)
+    depth.labels('broken').set_function(lambda: 1 / 0)
+
+    lines = metrics.render().splitlines()
+
+    assert 'test_total{status="5\\"03"} 3' in lines
+    assert 'test_depth{queue="updates"} 7' in lines
+    assert not any('broken' in line for line in lines)
+
+def test_bad_gauge_values_only_drop_their_series():
+    depth = Gauge('test_depth', "Test depth.", ['queue'])
+    depth.labels('nan').set(float('nan'))
+    depth.labels('low').set(float('-inf'))
+    depth.labels('text').set_function(lambda: 'seven')
+    depth.labels('ok').set(3)
+
+    lines = metrics.render().splitlines()
+
+    assert 'test_depth{queue="nan"} NaN' in lines
+    assert 'test_depth{queue="low"} -Inf' in lines
+    assert 'test_depth{queue="ok"} 3' in lines
+    assert not any('text' in line for line in lines)
+
+@pytest.mark.asyncio
+async def test_timed_send_counts_failures():
+    metrics.SEND_FAILURES.labels('test').value = 0
+
+    async def fail():
+        raise RuntimeError("blocked")
+
+    with pytest.raises(RuntimeError):
+        await timed_send('test', fail())
+    assert await timed_send('test', _ok()) == 'sent'
+    assert metrics.SEND_FAILURES.labels('test').value == 1
+
+async def _ok():
+    return 'sent'
+
+def test_server_exposes_metrics():
+    Counter('test_scrapes_total', "Test scrapes.").labels().inc()
+    server = metrics.start_metrics_server(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other")
+    finally:
+        server.shutdown()
+    assert 'test_scrapes_total 1' in body
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+import pytest
+from bot import profiling, tracker
+from bot.profiling import CycleTimer, format_recent_cycles, stage
+from bot.tenants import Tenant
+
+def busy(seconds):
+    with stage('parse'):
+        time.sleep(seconds)
+
+@pytest.mark.asyncio
+async def test_stages_accumulate_across_tasks_and_threads():
+    tenant = Tenant('#PROFILE')
+    with CycleTimer('cycle', tenant) as timer:
+        with stage('fetch'):
+            await asyncio.sleep(0.02)
+        await asyncio.to_thread(busy, 0.02)
+        with stage('fetch'):
+            await asyncio.sleep(0.01)
+
+    assert timer.stages['fetch'] >= 0.03
+    assert timer.stages['parse'] >= 0.02
+    assert timer.stages['record'] == 0
+    assert tenant.cycles[-1]['outcome'] == 'ok'
+    assert tenant.cycles[-1]['duration'] >= 0.05
+
+def test_stage_outside_a_job_is_a_no_op():
+    with stage('send'):
+        pass
+    assert profiling.current_cycle.get() is None
+
+@pytest.mark.asyncio
+async def test_slow_cycle_saves_breakdown_and_samples(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'SLOW_CYCLE_SECONDS', 0.05)
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'sampler', profiling.StackSampler(0.01))
+    tenant = Tenant('#SLOW')
+    with CycleTimer('cycle', tenant):
+        await asyncio.to_thread(busy, 0.1)
+    for _ in range(100):
+        if list(tmp_path.glob('*.folded')):
+            break
+        await asyncio.sleep(0.01)
+
+    [profile] = tmp_path.glob('cycle-SLOW-*.json')
+    saved = json.loads(profile.read_text())
+    assert saved['clan'] == '#SLOW' and saved['stages']['parse'] >= 0.1
+    folded = profile.with_suffix('.folded').read_text()
+    assert 'busy (test_profiling.py' in folded
+
+@pytest.mark.asyncio
+async def test_timed_out_cycle_is_recorded(monkeypatch):
+    tenant = Tenant('#HANG')
+    tenant.lease.expires_at = float('inf')
+
+    async def hang(application, tenant):
+        with stage('fetch'):
+            await asyncio.sleep(1)
+
+    monkeypatch.setattr(tracker, 'check_trophy_differences', hang)
+    monkeypatch.setattr(tracker, 'TENANT_CYCLE_TIMEOUT', 0.02)
+    await tracker.run_tenant_cycle(None, tenant)
+
+    cycle = tenant.cycles[-1]
+    assert cycle['outcome'] == 'timeout'
+    assert cycle['stages']['fetch'] >= 0.02
+    assert '#HANG' in format_recent_cycles([tenant])
+
+@pytest.mark.asyncio
+async def test_failed_profile_writes_are_logged(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, 'SLOW_CYCLE_SECONDS', 0)
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(blocker / 'profiles'))
+    with CycleTimer('cycle', Tenant('#FAIL')):
+        pass
+    for _ in range(100):
+        if 'Failed to save slow job profile' in caplog.text:
+            break
+        await asyncio.sleep(0.01)
+
+    assert 'Failed to save slow job profile' in caplog.text
+
+def test_a_zero_interval_never_starts_the_sampler():
+    sampler = profiling.StackSampler(0)
+    sampler.begin('job', time.perf_counter())
+    sampler.end('job')
+    assert sampler.thread is None and sampler.samples.maxlen == 0
+
+@pytest.mark.asyncio
+async def test_sampling_starts_once_a_job_runs_long(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'SLOW_CYCLE_SECONDS', 0.1)
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'sampler', profiling.StackSampler(0.01, arm_after=0.05))
+    with CycleTimer('cycle', Tenant('#QUICK')):
+        await asyncio.to_thread(busy, 0.02)
+    with CycleTimer('cycle', Tenant('#LONG')) as timer:
+        await asyncio.to_thread(busy, 0.15)
+    for _ in range(100):
+        if list(tmp_path.glob('*.folded')):
+            break
+        await asyncio.sleep(0.01)
+
+    assert min(when for when, _ in profiling.sampler.samples) >= timer.started + 0.05
+    assert [path.name.split('-')[1] for path in tmp_path.glob('*.folded')] == ['LONG']
+
+def test_a_profile_without_samples_has_no_folded_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'SLOW_CYCLE_SECONDS', 0)
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'sampler', profiling.StackSampler(0))
+    with CycleTimer('cycle', Tenant('#BARE')):
+        pass
+
+    [profile] = tmp_path.glob('cycle-BARE-*.json')
+    assert json.loads(profile.read_text())['samples'] == 0
+    assert not list(tmp_path.glob('*.folded'))
@@ -0,0 +1,31 @@
+from datetime import date
+from bot.diff import MemberSnapshot
+from bot.projection import DayState, Projector
+
+def test_projection_uses_remaining_events_and_baseline():
+    state = DayState(capacity=1)
+    state.roll_over(date(2024, 8, 1))
+    state.set_baseline({'#A': (30.0, -20.0)})
+    state.set_trophies([MemberSnapshot('#A', 'Alice', 5000, 1), MemberSnapshot('#B', 'Bob', 5100, 2)])
+    for _ in range(6):
+        state.add_event('#A', 'Alice', 'attack', 30)
+    for _ in range(8):
+        state.add_event('#B', 'Bob', 'defend', -20)
+    state.commit_cycle()
+
+    projection = Projector(state).project()
+
+    # Alice: 2 attacks and 8 defenses left; Bob: default 30 per attack, no defenses left
+    assert projection['names'] == ['Bob', 'Alice']
+    assert list(projection['projected']) == [5340, 4900]
+
+def test_projection_is_cached_until_the_next_cycle():
+    state = DayState()
+    state.set_trophies([MemberSnapshot('#A', 'Alice', 5000, 1)])
+    projector = Projector(state)
+    first = projector.project()
+    assert projector.project() is first
+
+    state.set_trophies([MemberSnapshot('#B', 'Bob', 5000, 1)])
+    state.commit_cycle()
+    assert projector.project()['names'] == ['Bob']
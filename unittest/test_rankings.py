@@ -0,0 +1,52 @@
+from unittest.mock import patch
+import pytest
+from bot import rankings
+from bot.rankings import RankingCache, format_age
+
+def ranking(*tags):
+    return [{'tag': tag, 'name': tag.lstrip('#'), 'rank': rank, 'trophies': 6000 - rank} for rank, tag in enumerate(tags, start=1)]
+
+@pytest.fixture
+def api():
+    responses = {'global': ranking('#A', '#B'), '32000249': ranking('#B')}
+    clock = [1000.0]
+    with patch.object(rankings, 'fetch_location_rankings', lambda location: responses[location]), \
+         patch.object(rankings, 'fetch_location', lambda location: {'name': 'Vietnam'}), \
+         patch.object(rankings.time, 'time', lambda: clock[0]):
+        yield responses, clock
+
+def test_lookup_across_locations(api):
+    cache = RankingCache(['global', '32000249'])
+    cache.refresh()
+
+    assert [(location, entry['rank']) for location, entry in cache.lookup('#B')] == [('Global', 2), ('Vietnam', 1)]
+    assert cache.lookup('#C') == []
+    assert cache.refreshed_at == 1000.0
+
+def test_failed_refresh_keeps_the_data_and_its_age(api):
+    responses, clock = api
+    cache = RankingCache(['global', '32000249'])
+    responses['global'] = responses['32000249'] = None
+    cache.refresh()
+    assert cache.refreshed_at is None and cache.age_seconds is None and cache.lookup('#A') == []
+
+    responses['global'], responses['32000249'] = ranking('#A'), ranking('#B')
+    cache.refresh()
+    clock[0] = 1600.0
+    responses['global'] = responses['32000249'] = None
+    cache.refresh()
+
+    assert cache.lookup('#A')[0][1]['rank'] == 1
+    assert cache.age_seconds == 600.0
+
+def test_partial_failure_reports_the_oldest_ranking(api):
+    responses, clock = api
+    cache = RankingCache(['global', '32000249'])
+    cache.refresh()
+    clock[0] = 1300.0
+    responses['32000249'] = None
+    cache.refresh()
+
+    assert cache.fetched_at == {'global': 1300.0, '32000249': 1000.0}
+    assert cache.age_seconds == 300.0 and format_age(cache.age_seconds) == "5 min"
+    assert [location for location, _ in cache.lookup('#B')] == ['Global', 'Vietnam']
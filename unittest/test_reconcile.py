@@ -0,0 +1,31 @@
+from bot.reconcile import SplitEvent, counter_delta, split_delta
+
+def as_tuples(events):
+    return [(event.event_type, event.trophies, event.inferred) for event in events]
+
+def test_single_event_is_kept_as_observed():
+    assert as_tuples(split_delta(38, attacks=1, defenses=0)) == [('attack', 38, False)]
+    assert as_tuples(split_delta(-30)) == [('defend', 30, False)]
+
+def test_merged_attack_and_defense_are_split_with_counters():
+    events = split_delta(8, attacks=1, defenses=1)
+    assert as_tuples(events) == [('attack', 30, True), ('defend', 22, True)]
+    assert sum(e.trophies if e.event_type == 'attack' else -e.trophies for e in events) == 8
+
+def test_loss_with_an_attack_needs_a_defense():
+    # An attack happened, yet the player lost trophies: at least one defense is implied
+    events = split_delta(-22, attacks=1, defenses=0)
+    assert [e.event_type for e in events] == ['attack', 'defend']
+    assert all(e.inferred for e in events)
+
+def test_ranges_alone_split_oversized_deltas():
+    assert as_tuples(split_delta(75)) == [('attack', 38, True), ('attack', 37, True)]
+    assert [e.event_type for e in split_delta(-70)] == ['defend', 'defend']
+
+def test_impossible_delta_falls_back_to_net_change():
+    assert split_delta(1000) == [SplitEvent('attack', 1000)]
+
+def test_counter_delta_ignores_season_reset():
+    assert counter_delta((10, 4), (12, 5)) == (2, 1)
+    assert counter_delta((120, 40), (1, 0)) == (None, None)
+    assert counter_delta(None, (1, 0)) == (None, None)
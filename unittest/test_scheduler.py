@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobSubmissionEvent
+from bot import database, scheduler, tracker
+from bot.metrics import JOBS_SKIPPED
+from bot.subscriptions import SubscriptionIndex
+from bot.tenants import Tenant, TenantRegistry
+
+@pytest.mark.asyncio
+async def test_jobs_run_one_instance_and_coalesce(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'jobs.db'))
+    tenant = Tenant('#JOBS')
+    application = SimpleNamespace(bot_data={'tenants': TenantRegistry([tenant])})
+    jobs = scheduler.setup_scheduler(application, rankings=False)
+    try:
+        check, reset = jobs.get_job('check_#JOBS'), jobs.get_job('reset_#JOBS')
+        assert check.max_instances == 1 and check.coalesce
+        assert check.misfire_grace_time == scheduler.MISFIRE_GRACE_SECONDS
+        assert reset.misfire_grace_time == scheduler.DAILY_MISFIRE_GRACE_SECONDS
+    finally:
+        jobs.shutdown(wait=False)
+
+def test_skipped_and_missed_runs_are_counted():
+    running = JOBS_SKIPPED.labels('check_#COUNT', 'running')
+    missed = JOBS_SKIPPED.labels('check_#COUNT', 'missed')
+    before = running.value, missed.value
+
+    scheduler.record_skipped(JobSubmissionEvent(EVENT_JOB_MAX_INSTANCES, 'check_#COUNT', 'default', []))
+    scheduler.record_skipped(JobSubmissionEvent(EVENT_JOB_MISSED, 'check_#COUNT', 'default', []))
+    scheduler.record_skipped(JobSubmissionEvent(EVENT_JOB_MAX_INSTANCES, 'check_#COUNT', 'default', []))
+
+    assert (running.value, missed.value) == (before[0] + 2, before[1] + 1)
+
+@pytest.mark.asyncio
+async def test_cycle_is_skipped_while_the_reset_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'busy.db'))
+    tenant = Tenant('#BUSY', chats=[1])
+    tenant.lease.acquire()
+    application = SimpleNamespace(bot=None, bot_data={'subscriptions': SubscriptionIndex()})
+    reset_started, finish_reset = asyncio.Event(), asyncio.Event()
+    cycles = []
+
+    async def start_new_day(application, tenant):
+        reset_started.set()
+        await finish_reset.wait()
+
+    async def check_trophy_differences(application, tenant):
+        cycles.append(tenant.clan_tag)
+
+    monkeypatch.setattr(tracker, 'start_new_day', start_new_day)
+    monkeypatch.setattr(tracker, 'check_trophy_differences', check_trophy_differences)
+    busy = JOBS_SKIPPED.labels('check_#BUSY', 'busy')
+    before = busy.value
+
+    reset = asyncio.create_task(tracker.reset_player_stats(application, tenant))
+    await reset_started.wait()
+    await tracker.run_tenant_cycle(application, tenant)
+    assert cycles == [] and busy.value == before + 1
+
+    finish_reset.set()
+    await reset
+    await tracker.run_tenant_cycle(application, tenant)
+    assert cycles == ['#BUSY']
+    assert [cycle['job'] for cycle in tenant.cycles] == ['reset', 'cycle']
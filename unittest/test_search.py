@@ -0,0 +1,42 @@
+from bot.diff import MemberJoined, MemberLeft, MemberRenamed, MemberSnapshot
+from bot.search import NameIndex, fold
+
+def make_index():
+    index = NameIndex()
+    index.rebuild([
+        MemberSnapshot('#A', 'Ñàmé Killer', 5000, 1),
+        MemberSnapshot('#B', 'The King', 4900, 2),
+        MemberSnapshot('#C', 'kingslayer', 4800, 3),
+    ])
+    return index
+
+def test_fold_drops_case_diacritics_and_width():
+    assert fold('Ñàmé') == fold('NAME') == fold('ｎａｍｅ') == 'name'
+
+def test_search_matches_prefixes_of_any_word():
+    index = make_index()
+    assert index.search('name') == ['#A']
+    assert index.search('KING') == ['#C', '#B']
+    assert index.search('killer') == ['#A']
+    assert index.search('zz') == []
+
+def test_exact_names_rank_first():
+    index = make_index()
+    index.add('#D', 'King')
+    assert index.search('king')[0] == '#D'
+
+def test_renames_keep_old_names_searchable_and_rank_them_last():
+    index = make_index()
+    index.apply([MemberRenamed(MemberSnapshot('#A', 'Kingpin', 5000, 1), 'Ñàmé Killer')])
+    assert index.search('name') == ['#A']
+    assert index.history['#A'] == ['Ñàmé Killer']
+    assert index.search('king') == ['#A', '#C', '#B']
+    index.add('#F', 'Namely')
+    assert index.search('nam') == ['#F', '#A']
+
+def test_departures_are_pruned_from_the_trie():
+    index = make_index()
+    index.apply([MemberLeft(MemberSnapshot('#B', 'The King', 4900, 2)), MemberJoined(MemberSnapshot('#E', 'Zed', 1, 4))])
+    assert index.search('king') == ['#C']
+    assert 't' not in index.root
+    assert index.search('z') == ['#E']
@@ -0,0 +1,77 @@
+import asyncio
+import queue
+from types import SimpleNamespace
+import pytest
+from bot.diff import MemberSnapshot
+from bot.notifier import send_to_all
+from bot.sharding import OutboundDispatcher, QueueBot, assign_shards
+from bot.tenants import Tenant, TenantRegistry
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+def test_retiring_a_shard_only_moves_its_tenants():
+    configs = [{'clan_tag': f'#CLAN{idx}'} for idx in range(40)]
+    before = assign_shards(configs, [0, 1, 2, 3])
+    after = assign_shards(configs, [0, 1, 3])
+
+    assert sum(len(tenants) for tenants in before.values()) == 40
+    assert all(before[2]) and all(len(tenants) > 0 for tenants in before.values())
+    for shard_id in (0, 1, 3):
+        assert all(config in after[shard_id] for config in before[shard_id])
+
+@pytest.mark.asyncio
+async def test_shard_sends_and_views_are_delivered_by_the_dispatcher():
+    outbound = queue.Queue()
+    shard_bot = QueueBot(outbound)
+    shard_tenant = Tenant('#CLAN')
+    shard_tenant.roster.members = {'#A': MemberSnapshot('#A', 'Alice', 5000, 1)}
+    shard_tenant.names.add('#A', 'Alice')
+
+    await send_to_all(shard_bot, [1, 2], 'hello')
+    shard_bot.publish(shard_tenant)
+
+    bot = RecordingBot()
+    local = Tenant('#CLAN')
+    dispatcher = OutboundDispatcher(SimpleNamespace(bot=bot, bot_data={'tenants': TenantRegistry([local])}), outbound, rate=1000)
+    while not outbound.empty():
+        await dispatcher.dispatch(outbound.get())
+
+    assert bot.sent == [(1, 'hello'), (2, 'hello')]
+    assert local.names.search('ali') == ['#A']
+    assert local.roster.members['#A'].trophies == 5000
+
+@pytest.mark.asyncio
+async def test_a_slow_chat_does_not_hold_back_other_sends():
+    outbound = queue.Queue()
+    release = asyncio.Event()
+
+    class SlowChatBot(RecordingBot):
+        async def send_message(self, chat_id, text, parse_mode=None):
+            if chat_id == 1:
+                await release.wait()
+            await super().send_message(chat_id, text, parse_mode)
+
+    bot = SlowChatBot()
+    dispatcher = OutboundDispatcher(SimpleNamespace(bot=bot, bot_data={'tenants': TenantRegistry([Tenant('#CLAN')])}), outbound, rate=1000)
+    for chat_id in (1, 2, 3):
+        outbound.put(('message', chat_id, 'hello', None))
+    runner = asyncio.create_task(dispatcher.run())
+    try:
+        for _ in range(200):
+            if len(bot.sent) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert bot.sent == [(2, 'hello'), (3, 'hello')]
+        release.set()
+        for _ in range(200):
+            if len(bot.sent) == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert bot.sent[-1] == (1, 'hello') and dispatcher.sent == 3
+    finally:
+        runner.cancel()
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from bot.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(ttl=0)
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return 'table'
+
+    results = await asyncio.gather(*(flight.do('overview', work) for _ in range(5)))
+
+    assert results == ['table'] * 5
+    assert len(runs) == 1
+    assert flight.stats['executions'] == 1 and flight.stats['coalesced'] == 4
+
+@pytest.mark.asyncio
+async def test_results_are_reused_within_ttl_but_failures_are_not():
+    flight = SingleFlight(ttl=60)
+    results = iter([None, 'table', 'newer'])
+
+    async def work():
+        return next(results)
+
+    assert await flight.do('overview', work) is None
+    assert await flight.do('overview', work) == 'table'
+    assert await flight.do('overview', work) == 'table'
+    assert flight.stats['cached'] == 1
+    flight.forget('overview')
+    assert await flight.do('overview', work) == 'newer'
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight(ttl=0)
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return 'table'
+
+    first = asyncio.ensure_future(flight.do('overview', work))
+    second = asyncio.ensure_future(flight.do('overview', work))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 'table'
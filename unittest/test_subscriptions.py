@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import AsyncMock
+from bot import database
+from bot.notifier import send_to_all
+from bot.subscriptions import CLAN, PLAYER, SubscriptionIndex, load_subscriptions, normalize_tag, subscribe, unsubscribe
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the bot database at a temporary file."""
+    path = tmp_path / 'test.db'
+    monkeypatch.setattr(database, 'DB_PATH', str(path))
+    return path
+
+def test_recipients_combine_clan_and_player_subscribers():
+    index = SubscriptionIndex()
+    index.add(1, CLAN, '#CLAN')
+    index.add(2, PLAYER, '#P1')
+    index.add(3, PLAYER, '#P2')
+
+    assert index.recipients('#CLAN', '#P1') == {1, 2}
+    assert index.recipients('#CLAN', '#P9') == {1}
+    assert index.recipients('#OTHER', '#P2') == {3}
+
+def test_remove_cleans_up_empty_buckets():
+    index = SubscriptionIndex()
+    index.add(1, PLAYER, '#P1')
+
+    assert index.remove(1, PLAYER, '#P1')
+    assert not index.remove(1, PLAYER, '#P1')
+    assert index.by_player == {}
+    assert index.subscriptions_for(1) == []
+
+def test_normalize_tag():
+    assert normalize_tag(' 2pp0oq ') == '#2PP00Q'
+    assert normalize_tag('#abc') == '#ABC'
+
+def test_subscriptions_survive_reload(db_path):
+    index = load_subscriptions()
+    subscribe(index, 1, CLAN, '#CLAN')
+    subscribe(index, 2, PLAYER, '#P1')
+    unsubscribe(index, 1, CLAN, '#CLAN')
+
+    reloaded = load_subscriptions()
+    assert reloaded.recipients('#CLAN', '#P1') == {2}
+
+@pytest.mark.asyncio
+async def test_send_to_all_reports_delivered_count():
+    bot = AsyncMock()
+    bot.send_message.side_effect = [None, RuntimeError("blocked"), None]
+
+    delivered = await send_to_all(bot, [1, 2, 3], "hello")
+
+    assert delivered == 2
+    assert bot.send_message.await_count == 3
@@ -1,44 +1,46 @@
+import importlib
 import pytest
-import asyncio
-from unittest.mock import patch
-from datetime import datetime, timedelta, timezone
 import sqlite3
-from telegram_bot_1308_create_daily_table import init_db_for_date, reset_player_stats
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from datetime import datetime, timedelta, timezone
 
 # Define the UTC-5 timezone
 UTC_MINUS_5 = timezone(timedelta(hours=-5))
 
 @pytest.fixture
-def setup_db():
-    """Fixture to set up a temporary database for testing."""
-    conn = sqlite3.connect(':memory:')  # Use an in-memory database for testing
-    yield conn
-    conn.close()
+def script(monkeypatch):
+    """The daily-table script, which exits at import time without its settings, imported with placeholders."""
+    for name in ('API_KEY', 'CLAN_TAG', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+        monkeypatch.setenv(name, 'test')
+    return importlib.import_module('telegram_bot_1308_create_daily_table')
+
+@pytest.fixture
+def fake_application(tmp_path, monkeypatch):
+    """Fake application whose bot records sends; the script's database lands in a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    return SimpleNamespace(bot=SimpleNamespace(send_message=AsyncMock()))
 
 @pytest.mark.asyncio
-async def test_reset_player_stats(setup_db):
+async def test_reset_player_stats(script, fake_application):
     """Test that the reset_player_stats function creates new tables for the next day."""
-    conn = setup_db
-
-    with patch('telegram_bot_1308_create_daily_table.datetime') as mock_datetime:
+    with patch.object(script, 'datetime') as mock_datetime:
         mock_datetime.now.return_value = datetime(2024, 8, 12, 23, 0, 0, tzinfo=UTC_MINUS_5)
 
-        # Determine the string for the new day's tables
-        new_day_str = (mock_datetime.now() + timedelta(days=1)).strftime('%m%d')
-
-        # Initialize the database with tables for the next day
-        init_db_for_date(new_day_str)
-
         # Await the asynchronous function
-        await reset_player_stats(conn)
+        await script.reset_player_stats(fake_application)
 
-        # Check if new tables for the next day were created
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='player_events_{new_day_str}'")
-        new_events_table_exists = cursor.fetchone()
+    # Check if new tables for the next day were created
+    conn = sqlite3.connect('clash_of_clans.db')
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='player_events_0813'")
+    new_events_table_exists = cursor.fetchone()
 
-        cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='player_stats_{new_day_str}'")
-        new_stats_table_exists = cursor.fetchone()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='player_stats_0813'")
+    new_stats_table_exists = cursor.fetchone()
+    conn.close()
 
-        assert new_events_table_exists is not None, "New player_events table should be created for the next day."
-        assert new_stats_table_exists is not None, "New player_stats table should be created for the next day."
+    assert new_events_table_exists is not None, "New player_events table should be created for the next day."
+    assert new_stats_table_exists is not None, "New player_stats table should be created for the next day."
+    fake_application.bot.send_message.assert_awaited_once()
+    assert "2024-08-13" in fake_application.bot.send_message.call_args.kwargs['text']
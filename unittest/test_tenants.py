@@ -0,0 +1,74 @@
+import asyncio
+import json
+import sqlite3
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from bot import database, tracker
+from bot.subscriptions import CLAN, SubscriptionIndex
+from bot.tenants import Tenant, TenantRegistry, load_tenants
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(chat_id)
+
+def members(prefix, trophies):
+    return [{'tag': f'#{prefix}{idx}', 'name': f'{prefix} {idx}', 'trophies': trophies + idx} for idx in range(3)]
+
+def test_load_tenants_from_file(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([
+        {'clan_tag': '#aaa', 'chats': [1, 2], 'timezone': 'Europe/Berlin', 'notify_top_n': 5},
+        {'clan_tag': 'bbb', 'chats': [3], 'timezone': -5, 'watchlist': ['#p1'], 'db_path': str(tmp_path / 'b.db')},
+    ]))
+
+    tenants = load_tenants(str(path))
+
+    first, second = tenants
+    assert (first.clan_tag, first.notify_top_n, str(first.timezone)) == ('#AAA', 5, 'Europe/Berlin')
+    assert second.watchlist == {'#P1'} and second.db_path == str(tmp_path / 'b.db')
+    assert tenants.for_chat(3) is second
+    assert tenants.for_chat(99) is first
+
+def test_duplicate_clans_are_rejected(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([{'clan_tag': '#AAA'}, {'clan_tag': 'aaa'}]))
+    with pytest.raises(ValueError):
+        load_tenants(str(path))
+
+@pytest.mark.asyncio
+async def test_tenants_record_into_their_own_store_and_slow_ones_time_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'shared.db'))
+    fast = Tenant('#FAST', chats=[1], db_path=str(tmp_path / 'fast.db'))
+    other = Tenant('#OTHER', chats=[2], db_path=str(tmp_path / 'other.db'))
+    slow = Tenant('#SLOW', chats=[3], db_path=str(tmp_path / 'slow.db'))
+    subscriptions = SubscriptionIndex()
+    for tenant in (fast, other, slow):
+        subscriptions.add(tenant.chats[0], CLAN, tenant.clan_tag)
+        tenant.lease.acquire()
+    bot = RecordingBot()
+    application = SimpleNamespace(bot=bot, bot_data={'subscriptions': subscriptions, 'tenants': TenantRegistry([fast, other, slow])})
+    rosters = {'#FAST': members('F', 5000), '#OTHER': members('O', 4000), '#SLOW': members('S', 3000)}
+
+    def fetch_clan_members(clan_tag):
+        if clan_tag == '#SLOW':
+            time.sleep(0.3)
+        return rosters[clan_tag]
+
+    monkeypatch.setattr(tracker, 'TENANT_CYCLE_TIMEOUT', 0.1)
+    with patch.object(tracker, 'fetch_clan_members', fetch_clan_members), patch.object(tracker, 'fetch_players', lambda tags: {}):
+        await asyncio.gather(*(tracker.run_tenant_cycle(application, tenant) for tenant in (fast, other)))
+        rosters['#FAST'] = members('F', 5030)
+        rosters['#OTHER'] = members('O', 3990)
+        await asyncio.gather(*(tracker.run_tenant_cycle(application, tenant) for tenant in (fast, other, slow)))
+
+    assert sorted(set(bot.sent)) == [1, 2]
+    fast_tags = {row[0] for row in sqlite3.connect(fast.db_path).execute(f"SELECT tag FROM player_events_{fast.now():%m%d}")}
+    other_tags = {row[0] for row in sqlite3.connect(other.db_path).execute(f"SELECT tag FROM player_events_{other.now():%m%d}")}
+    assert fast_tags == {'#F0', '#F1', '#F2'}
+    assert other_tags == {'#O0', '#O1', '#O2'}
+    assert not slow.roster.members
@@ -0,0 +1,170 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from bot import charts, database, tracker
+from bot.subscriptions import CLAN, PLAYER, SubscriptionIndex
+from bot.tenants import Tenant
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        self.sent.append((chat_id, caption))
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f'photo-{len(self.sent)}')])
+
+def roster(*trophies):
+    return [{'tag': f'#P{idx}', 'name': f'Player {idx}', 'trophies': value} for idx, value in enumerate(trophies)]
+
+@pytest.fixture
+def clan(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'shared.db'))
+    tenant = Tenant('#CLAN', db_path=str(tmp_path / 'clan.db'), notify_top_n=1, watchlist={'#P1'})
+    subscriptions = SubscriptionIndex()
+    subscriptions.add(1, CLAN, '#CLAN')
+    subscriptions.add(2, PLAYER, '#P2')
+    bot = RecordingBot()
+    return tenant, SimpleNamespace(bot=bot, bot_data={'subscriptions': subscriptions}), bot
+
+@pytest.mark.asyncio
+async def test_clan_subscribers_only_hear_about_the_top_and_the_watchlist(clan):
+    tenant, application, bot = clan
+    rosters = [roster(5300, 5200, 5100), roster(5330, 5230, 5130)]
+
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', lambda tags: {}):
+        await tracker.check_trophy_differences(application, tenant)
+        await tracker.check_trophy_differences(application, tenant)
+
+    sent = {(chat_id, text.split('</b>')[0]) for chat_id, text in bot.sent}
+    assert sent == {(1, '<b>1. Player 0'), (1, '<b>2. Player 1'), (2, '<b>3. Player 2')}
+    # Every member is recorded, whether or not anyone was notified
+    conn = tenant.call(database.connect_db)
+    assert sorted(row[0] for row in conn.execute(f"SELECT tag FROM player_events_{tenant.now():%m%d}")) == ['#P0', '#P1', '#P2']
+    conn.close()
+
+@pytest.mark.asyncio
+async def test_perfect_defenses_are_counted_from_defense_wins(clan):
+    tenant, application, bot = clan
+    rosters = [roster(5300, 5200, 5100), roster(5330, 5200, 5100), roster(5360, 5200, 5100)]
+    counters = [{'#P0': {'attackWins': 10, 'defenseWins': 5}}, {'#P0': {'attackWins': 11, 'defenseWins': 8}}]
+
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', lambda tags: counters.pop(0)):
+        for _ in range(3):
+            await tracker.check_trophy_differences(application, tenant)
+
+    alerts = [text for chat_id, text in bot.sent if text.startswith('⚠️')]
+    assert len(alerts) == 1 and "3 perfect defenses in a row" in alerts[0]
+
+@pytest.mark.asyncio
+async def test_changes_of_an_abandoned_cycle_are_recorded_by_the_next(clan, monkeypatch):
+    tenant, application, bot = clan
+    tenant.lease.acquire()
+    rosters = [roster(5300, 5200, 5100), roster(5330, 5200, 5100), roster(5330, 5200, 5100)]
+    delays = [0.3, 0]
+
+    def fetch_players(tags):
+        time.sleep(delays.pop(0))
+        return {}
+
+    monkeypatch.setattr(tracker, 'TENANT_CYCLE_TIMEOUT', 0.1)
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', fetch_players):
+        for _ in range(3):
+            await tracker.run_tenant_cycle(application, tenant)
+
+    assert [cycle['outcome'] for cycle in tenant.cycles] == ['ok', 'timeout', 'ok']
+    conn = tenant.call(database.connect_db)
+    assert list(conn.execute(f"SELECT tag, trophy_change FROM player_events_{tenant.now():%m%d}")) == [('#P0', 30)]
+    conn.close()
+    assert [chat_id for chat_id, _ in bot.sent] == [1]
+
+@pytest.mark.asyncio
+async def test_the_reset_charts_the_day_that_ended(clan, monkeypatch):
+    tenant, application, bot = clan
+    monkeypatch.setattr(charts, 'CHART_CACHE_DIR', str(tenant.db_path) + '.charts')
+    tenant.lease.acquire()
+
+    def record():
+        database.init_db_for_date('0812').close()
+        conn = database.connect_db()
+        database.record_events(conn, '0812', [('#P0', 'Player 0', datetime(2024, 8, 12, 10, 0), 'attack', 32, False)])
+        conn.close()
+    tenant.call(record)
+    monkeypatch.setattr(tenant, 'now', lambda: datetime(2024, 8, 13, 0, 0, 1, tzinfo=tenant.timezone))
+
+    with patch.object(tracker, 'fetch_top_clan_trophies', lambda clan_tag: roster(5332, 5200)):
+        await tracker.reset_player_stats(application, tenant)
+
+    assert [text for _, text in bot.sent][-1] == "Trophy progression 2024-08-12"
+
+@pytest.mark.asyncio
+async def test_counters_are_only_looked_up_for_notified_members(clan):
+    tenant, application, bot = clan
+    rosters = [roster(5300, 5200, 5100, 5000), roster(5330, 5230, 5130, 5030)]
+    lookups = []
+
+    def fetch_players(tags):
+        lookups.append(sorted(tags))
+        return {}
+
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', fetch_players):
+        await tracker.check_trophy_differences(application, tenant)
+        await tracker.check_trophy_differences(application, tenant)
+
+    assert lookups == [['#P0', '#P1', '#P2']]
+    conn = tenant.call(database.connect_db)
+    assert ('#P3', 30) in conn.execute(f"SELECT tag, trophy_change FROM player_events_{tenant.now():%m%d}").fetchall()
+    conn.close()
+
+@pytest.mark.asyncio
+async def test_moves_across_the_top_n_are_announced(clan):
+    tenant, application, bot = clan
+    # The API lists members by trophies, which sets their ranks
+    rosters = [roster(5300, 5200, 5100), sorted(roster(5300, 5340, 5100), key=lambda member: -member['trophies'])]
+
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', lambda tags: {}):
+        await tracker.check_trophy_differences(application, tenant)
+        await tracker.check_trophy_differences(application, tenant)
+
+    [announcement] = [text for chat_id, text in bot.sent if text.startswith('⬆️')]
+    assert announcement.splitlines() == [
+        "⬆️ <b>Player 1</b> (<code>#P1</code>) moved into the top 1 at rank 1",
+        "⬇️ <b>Player 0</b> (<code>#P0</code>) dropped out of the top 1 to rank 2",
+    ]
+
+@pytest.mark.asyncio
+async def test_a_deadline_during_the_write_still_advances_the_roster(clan, monkeypatch):
+    tenant, application, bot = clan
+    tenant.lease.acquire()
+    rosters = [roster(5300, 5200, 5100), roster(5330, 5200, 5100), roster(5330, 5200, 5100)]
+    threads = []
+    original = tracker.record_events
+
+    def slow_record_events(*args):
+        threads.append(threading.current_thread())
+        time.sleep(0.3)
+        return original(*args)
+
+    monkeypatch.setattr(tracker, 'TENANT_CYCLE_TIMEOUT', 0.1)
+    monkeypatch.setattr(tracker, 'record_events', slow_record_events)
+    with patch.object(tracker, 'fetch_clan_members', lambda clan_tag: rosters.pop(0)), \
+         patch.object(tracker, 'fetch_players', lambda tags: {}):
+        for _ in range(3):
+            await tracker.run_tenant_cycle(application, tenant)
+
+    assert [cycle['outcome'] for cycle in tenant.cycles] == ['ok', 'timeout', 'ok']
+    assert threads and threading.main_thread() not in threads
+    conn = tenant.call(database.connect_db)
+    assert list(conn.execute(f"SELECT tag, trophy_change FROM player_events_{tenant.now():%m%d}")) == [('#P0', 30)]
+    conn.close()
+    assert tenant.roster.members['#P0'].trophies == 5330
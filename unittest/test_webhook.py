@@ -0,0 +1,78 @@
+import json
+import socket
+import pytest
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot import database
+from bot.telegram_bot import create_bot
+from bot.tenants import Tenant, TenantRegistry
+from bot.webhook import webhook_settings
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ('WEBHOOK_PATH', 'WEBHOOK_SECRET', 'WEBHOOK_LISTEN', 'WEBHOOK_PORT'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('WEBHOOK_URL', 'https://bot.example.com/')
+    return monkeypatch
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_settings_come_from_the_environment(env):
+    env.setenv('WEBHOOK_PATH', '/hooks/clan/')
+    env.setenv('WEBHOOK_SECRET', 's3cret_token-1')
+    env.setenv('WEBHOOK_PORT', '8081')
+
+    settings = webhook_settings()
+
+    assert settings == {
+        'listen': '127.0.0.1',
+        'port': 8081,
+        'url_path': 'hooks/clan',
+        'webhook_url': 'https://bot.example.com/hooks/clan',
+        'secret_token': 's3cret_token-1',
+    }
+
+def test_a_secret_is_generated_and_invalid_ones_are_rejected(env):
+    first, second = webhook_settings()['secret_token'], webhook_settings()['secret_token']
+    assert first != second and len(first) >= 32
+
+    env.setenv('WEBHOOK_SECRET', 'not allowed!')
+    with pytest.raises(ValueError):
+        webhook_settings()
+    env.delenv('WEBHOOK_URL')
+    with pytest.raises(ValueError):
+        webhook_settings()
+
+@pytest.mark.asyncio
+async def test_updates_posted_to_the_webhook_are_answered(env, tmp_path):
+    env.setattr(database, 'DB_PATH', str(tmp_path / 'webhook.db'))
+    port = free_port()
+    env.setenv('WEBHOOK_URL', f"http://127.0.0.1:{port}")
+    env.setenv('WEBHOOK_PORT', str(port))
+    api = FakeBotAPI()
+    await api.start()
+    application = create_bot('123456:test', TenantRegistry([Tenant('#HOOK', chats=[1])]), concurrent_updates=4, base_url=api.base_url)
+    application.bot_data['scheduler'].pause()
+    await application.initialize()
+    await application.updater.start_webhook(drop_pending_updates=True, **webhook_settings())
+    await application.start()
+    try:
+        assert api.webhook_url == f"http://127.0.0.1:{port}/telegram"
+        await api.request_reply(7)
+        assert [(chat_id, text.startswith('Welcome')) for _, chat_id, text in api.sent_messages] == [(7, True)]
+
+        # Posts without the registered secret never reach the handlers
+        request = HTTPRequest(api.webhook_url, method='POST', headers={'Content-Type': 'application/json'},
+                              body=json.dumps(api.make_command_update(8, '/start')))
+        with pytest.raises(HTTPClientError) as rejected:
+            await AsyncHTTPClient().fetch(request)
+        assert rejected.value.code == 403
+    finally:
+        application.bot_data['scheduler'].shutdown(wait=False)
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await api.stop()